@@ -0,0 +1,83 @@
+"""Compares writing submission rows through the ORM unit of work with bulk_insert.
+
+Run with bytegrader installed: python benchmarks/bulk_insert.py [--cells 300] [--repeat 20]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bytegrader.core.database.bulk import bulk_insert
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import upgrade_database
+from bytegrader.core.models import (Assignment, Cell, CellSubmission, Course, Notebook, NotebookSubmission,
+                                    Submission)
+from bytegrader.core.models.enum import CellType, SubmissionStatus
+from bytegrader.core.models.base import new_uuid
+
+
+def setup(db_mgr, cells: int):
+    with db_mgr.get_session() as session:
+        session.add(Course(label="C1", title="Course 1"))
+        session.add(Assignment(id="A1", course_id="C1", name="A1"))
+        session.add(Notebook(id="N1", assignment_id="A1", name="nb.ipynb", idx=0))
+        bulk_insert(session, Cell, [
+            {"id": f"cell-{i}", "notebook_id": "N1", "idx": i, "cell_type": CellType.CODE} for i in range(cells)
+        ])
+
+
+def new_notebook_submission(session) -> str:
+    submission_id, notebook_submission_id = new_uuid(), new_uuid()
+    session.add(Submission(id=submission_id, assignment_id="A1", user_id="u1", status=SubmissionStatus.SUBMITTED))
+    session.add(NotebookSubmission(id=notebook_submission_id, submission_id=submission_id, notebook_id="N1"))
+    session.flush()
+    return notebook_submission_id
+
+
+def write_orm(session, notebook_submission_id: str, cells: int):
+    session.add_all([CellSubmission(notebook_submission_id=notebook_submission_id, cell_id=f"cell-{i}")
+                     for i in range(cells)])
+
+
+def write_bulk(session, notebook_submission_id: str, cells: int):
+    bulk_insert(session, CellSubmission, [
+        {"notebook_submission_id": notebook_submission_id, "cell_id": f"cell-{i}"} for i in range(cells)
+    ])
+
+
+def measure(db_mgr, write, cells: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with db_mgr.get_session() as session:
+            notebook_submission_id = new_notebook_submission(session)
+            start = time.perf_counter()
+            write(session, notebook_submission_id, cells)
+            session.flush()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_mgr = DatabaseManager(f"sqlite:///{Path(tmp) / 'bytegrader.db'}")
+        upgrade_database(db_mgr)
+        setup(db_mgr, args.cells)
+        try:
+            orm = measure(db_mgr, write_orm, args.cells, args.repeat)
+            bulk = measure(db_mgr, write_bulk, args.cells, args.repeat)
+        finally:
+            db_mgr.close()
+
+    print(f"{args.cells} cell submissions, median of {args.repeat}:")
+    print(f"  ORM unit of work: {orm * 1000:7.2f} ms")
+    print(f"  bulk_insert:      {bulk * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
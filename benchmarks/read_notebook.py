@@ -0,0 +1,71 @@
+"""Compares read_notebook with nbformat.reads plus validate on generated notebooks.
+
+Run with bytegrader installed: python benchmarks/read_notebook.py [--cells 20 200 1000] [--repeat 30]
+"""
+import argparse
+import base64
+import random
+import statistics
+import time
+
+import nbformat
+
+from bytegrader.core.utils.notebook import read_notebook
+
+
+def make_notebook(cells: int, seed: int = 1) -> bytes:
+    # Code cells with stream outputs and an image every tenth cell, every third cell markdown
+    rnd = random.Random(seed)
+    nb = nbformat.v4.new_notebook()
+    nb.metadata.kernelspec = {"name": "python3", "display_name": "Python 3", "language": "python"}
+    for i in range(cells):
+        if i % 3 == 2:
+            cell = nbformat.v4.new_markdown_cell(f"## Section {i}\n" + "Some explanatory text. " * 20)
+        else:
+            source = "\n".join(f"x_{i}_{j} = np.linspace({j}, {rnd.random():.4f}, 100)" for j in range(12))
+            cell = nbformat.v4.new_code_cell(source, execution_count=i)
+            cell.metadata.nbgrader = {"schema_version": 3, "grade": i % 5 == 0, "solution": i % 4 == 0,
+                                      "locked": False, "task": False, "points": 1.0, "grade_id": f"cell-{i}"}
+            cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text=f"value {i}\n" * 30)]
+            if i % 10 == 0:
+                png = base64.b64encode(rnd.randbytes(20000)).decode()
+                cell.outputs.append(nbformat.v4.new_output("display_data", data={"image/png": png}))
+        cell.id = f"cell-{i:04d}"
+        nb.cells.append(cell)
+    return nbformat.writes(nb).encode("utf-8")
+
+
+def read_nbformat(data: bytes):
+    # The previous upload path
+    nb = nbformat.reads(data.decode("utf-8"), nbformat.current_nbformat)
+    nbformat.validate(nb)
+    return nb
+
+
+def measure(read, data: bytes, repeat: int) -> float:
+    read(data)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read(data)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, nargs="+", default=[20, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"median of {args.repeat}:")
+    for cells in args.cells:
+        data = make_notebook(cells)
+        before = measure(read_nbformat, data, args.repeat)
+        after = measure(read_notebook, data, args.repeat)
+        print(f"  {cells:5} cells, {len(data) // 1024:5} KiB: nbformat {before * 1000:7.1f} ms, "
+              f"read_notebook {after * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import json
 from pathlib import Path
 from typing import List, Dict
 
-from .extensions.lab import load_jupyter_server_extension as load_lab_extension
+from .extensions.lab import BYTEGraderLabExtension, load_jupyter_server_extension as load_lab_extension
 
 __version__ = '0.0.1'
 
@@ -23,6 +23,7 @@ if not (HERE / "extensions" / "labextension").exists():
 def _jupyter_server_extension_points() -> List[Dict[str, str]]:
     return [{
         "module": "bytegrader",
+        "app": BYTEGraderLabExtension,
     }]
 
 
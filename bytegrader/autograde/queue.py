@@ -1,28 +1,312 @@
+import asyncio
+import itertools
 import logging
-from asyncio import Queue
+import os
+import socket
+from asyncio import PriorityQueue
+from collections import deque
+from datetime import timedelta
+from typing import Iterable, List, Optional
 
-from bytegrader.autograde.worker import AutogradingJob
+from cachetools import LRUCache
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import selectinload
+
+from bytegrader.autograde.regrade import RegradeProgress
+from bytegrader.autograde.worker import AutogradingJob, JobPriority
+from bytegrader.core.database.bulk import bulk_insert
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.exceptions import DatabaseError
+from bytegrader.core.models import Assignment, GradingJob, Notebook, NotebookSubmission, Submission
+from bytegrader.core.models.base import new_uuid
+from bytegrader.core.models.enum import GradingJobStatus
+from bytegrader.core.utils import utc_now
 
 
 class JobQueue:
 
     def __init__(self, max_size: int = 100):
-        self.queue = Queue(maxsize=max_size)
+        self.max_size = max_size
+        self.queue = PriorityQueue(maxsize=max_size)
+        # Tie-breaker so jobs of equal priority keep FIFO order and jobs are never compared
+        self._counter = itertools.count()
         self.log = logging.getLogger("JobQueue")
 
     async def add_job(self, job: AutogradingJob):
-        await self.queue.put(job)
-        self.log.debug(f"Added job {job}. Queue size: {self.queue.qsize()}")
+        await self.queue.put((job.priority, next(self._counter), job))
+        self.log.debug(f"Added job {job} (priority {job.priority.name}). Queue size: {self.queue.qsize()}")
 
     async def get_job(self) -> AutogradingJob:
-        job = await self.queue.get()
+        _, _, job = await self.queue.get()
         self.log.debug(f"Retrieved job {job}. Queue size: {self.queue.qsize()}")
         return job
 
-    def task_done(self):
+    async def qsize(self) -> int:
+        return self.queue.qsize()
+
+    async def task_done(self, job: AutogradingJob = None, error: Exception = None):
         self.queue.task_done()
         self.log.debug(f"Job completed. Queue size: {self.queue.qsize()}")
 
     async def wait_empty(self):
         await self.queue.join()
-        self.log.debug("All jobs in the queue have been processed.")
\ No newline at end of file
+        self.log.debug("All jobs in the queue have been processed.")
+
+    async def close(self):
+        pass
+
+
+class DatabaseJobQueue:
+    # Jobs are rows of grading_jobs, so every process can enqueue and every 'bytegrader grader'
+    # process can take them. A job is claimed with a compare-and-set on its status and attempts;
+    # a claim that is not finished within the lease (the grader died) is handed out again.
+    # Finished jobs are deleted, except those of a regrade run, whose counts are its progress.
+    # A job that fails is queued again until it has been claimed max_attempts times.
+    # The sessions are synchronous; every database call runs in a worker thread (asyncio.to_thread)
+    # so a waiting writer lock or a slow query does not stall the event loop.
+
+    # Extra candidates read per poll, in case other graders take some of them first
+    CLAIM_SLACK = 8
+
+    def __init__(self, db_mgr: DatabaseManager, poll_interval: float = 1.0, lease: float = 3600.0,
+                 max_attempts: int = 3):
+        self.db_mgr = db_mgr
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max(max_attempts, 1)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.log = logging.getLogger("DatabaseJobQueue")
+        # Jobs claimed by this process and not finished yet
+        self._claimed = set()
+        # Workers poll one at a time instead of each hitting the database
+        self._poll_lock = asyncio.Lock()
+        self._waiting = 0
+        self._ready = deque()
+        # Assignments do not change after creation; regrade jobs share one object and its sources
+        self._assignments = LRUCache(maxsize=32)
+
+    async def add_job(self, job: AutogradingJob):
+        job.id = new_uuid()
+        await asyncio.to_thread(self._insert, job)
+        self.log.debug(f"Added job {job.id} for submission {job.submission_id} (priority {job.priority.name})")
+
+    def _insert(self, job: AutogradingJob):
+        with self.db_mgr.get_session() as session:
+            session.add(GradingJob(id=job.id, submission_id=job.submission_id, assignment_id=job.assignment.id,
+                                   priority=int(job.priority)))
+
+    async def add_batch(self, assignment_id: str, submission_ids: Iterable[str], priority: JobPriority) -> str:
+        return await asyncio.to_thread(self._insert_batch, assignment_id, list(submission_ids), priority)
+
+    def _insert_batch(self, assignment_id: str, submission_ids: List[str], priority: JobPriority) -> str:
+        batch_id = new_uuid()
+        with self.db_mgr.get_session() as session:
+            # Earlier runs of the assignment are only kept for their progress
+            session.execute(
+                delete(GradingJob).where(
+                    GradingJob.assignment_id == assignment_id,
+                    GradingJob.batch_id.isnot(None),
+                    GradingJob.status.in_([GradingJobStatus.DONE, GradingJobStatus.FAILED]),
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            now = utc_now()
+            bulk_insert(session, GradingJob, [
+                {
+                    "id": new_uuid(),
+                    "submission_id": submission_id,
+                    "assignment_id": assignment_id,
+                    "priority": int(priority),
+                    "batch_id": batch_id,
+                    "status": GradingJobStatus.QUEUED,
+                    "attempts": 0,
+                    "created_at": now,
+                }
+                for submission_id in submission_ids
+            ])
+        return batch_id
+
+    async def get_job(self) -> AutogradingJob:
+        # One poll claims a job for every worker waiting at that moment
+        self._waiting += 1
+        try:
+            async with self._poll_lock:
+                while not self._ready:
+                    try:
+                        rows = await asyncio.to_thread(self._claim, self._waiting)
+                        self._ready.extend(await asyncio.to_thread(self._load, rows))
+                    except DatabaseError as e:
+                        self.log.error(f"Failed to take jobs from the database queue: {e}")
+                        rows = []
+                    if not rows:
+                        await asyncio.sleep(self.poll_interval)
+                job = self._ready.popleft()
+                self.log.debug(f"Claimed job {job.id} for submission {job.submission_id}")
+                return job
+        finally:
+            self._waiting -= 1
+
+    def _claim(self, limit: int) -> list:
+        now = utc_now()
+        stale = now - timedelta(seconds=self.lease)
+        claimed = []
+        with self.db_mgr.get_session() as session:
+            candidates = session.execute(
+                select(GradingJob.id, GradingJob.status, GradingJob.attempts, GradingJob.submission_id,
+                       GradingJob.assignment_id, GradingJob.priority)
+                .where(or_(
+                    GradingJob.status == GradingJobStatus.QUEUED,
+                    and_(GradingJob.status == GradingJobStatus.RUNNING, GradingJob.claimed_at < stale),
+                ))
+                .order_by(GradingJob.priority, GradingJob.created_at)
+                .limit(limit + self.CLAIM_SLACK)
+            ).all()
+
+            for row in candidates:
+                if len(claimed) >= limit:
+                    break
+                claim = update(GradingJob).where(
+                    GradingJob.id == row.id,
+                    GradingJob.status == row.status,
+                    GradingJob.attempts == row.attempts,
+                )
+                if row.attempts >= self.max_attempts:
+                    session.execute(claim.values(status=GradingJobStatus.FAILED, finished_at=now,
+                                                 error=f"Abandoned after {row.attempts} attempts"),
+                                    execution_options={"synchronize_session": False})
+                    continue
+                # Taken by another grader since the select if no row matches
+                result = session.execute(
+                    claim.values(status=GradingJobStatus.RUNNING, claimed_by=self.owner, claimed_at=now,
+                                 attempts=row.attempts + 1),
+                    execution_options={"synchronize_session": False},
+                )
+                if result.rowcount == 1:
+                    claimed.append(row)
+        self._claimed.update(row.id for row in claimed)
+        return claimed
+
+    def _load(self, rows: list) -> List[AutogradingJob]:
+        if not rows:
+            return []
+        with self.db_mgr.get_session() as session:
+            missing = {row.assignment_id for row in rows} - set(self._assignments.keys())
+            if missing:
+                for assignment in session.query(Assignment).filter(Assignment.id.in_(missing)).options(
+                    selectinload(Assignment.course),
+                    selectinload(Assignment.notebooks).selectinload(Notebook.cells),
+                ):
+                    self._assignments[assignment.id] = assignment
+            submissions = {
+                submission.id: submission
+                for submission in session.query(Submission).filter(
+                    Submission.id.in_([row.submission_id for row in rows])
+                ).options(
+                    selectinload(Submission.notebook_submissions).selectinload(NotebookSubmission.cell_submissions),
+                )
+            }
+            session.expunge_all()
+
+        jobs = []
+        for row in rows:
+            assignment = self._assignments.get(row.assignment_id)
+            submission = submissions.get(row.submission_id)
+            if assignment is None or submission is None:
+                self._finish(row.id, GradingJobStatus.FAILED, "Submission or assignment no longer exists")
+                continue
+            job = AutogradingJob(row.submission_id, assignment, submission, priority=JobPriority(row.priority))
+            job.id = row.id
+            jobs.append(job)
+        return jobs
+
+    async def qsize(self) -> int:
+        return await asyncio.to_thread(self._count_queued)
+
+    def _count_queued(self) -> int:
+        with self.db_mgr.get_session(readonly=True) as session:
+            return session.scalar(
+                select(func.count()).select_from(GradingJob).where(GradingJob.status == GradingJobStatus.QUEUED)
+            )
+
+    async def task_done(self, job: AutogradingJob = None, error: Exception = None):
+        if job is None:
+            return
+        if error is None:
+            await asyncio.to_thread(self._finish, job.id, GradingJobStatus.DONE)
+        else:
+            await asyncio.to_thread(self._finish, job.id, GradingJobStatus.FAILED, str(error), True)
+
+    def _finish(self, job_id: str, status: GradingJobStatus, error: str = None, retry: bool = False):
+        self._claimed.discard(job_id)
+        with self.db_mgr.get_session() as session:
+            owned = and_(GradingJob.id == job_id, GradingJob.claimed_by == self.owner,
+                         GradingJob.status == GradingJobStatus.RUNNING)
+            if status == GradingJobStatus.DONE:
+                session.execute(delete(GradingJob).where(owned, GradingJob.batch_id.is_(None)),
+                                execution_options={"synchronize_session": False})
+            elif retry:
+                # Queued again (keeping the error of the last attempt) unless this was the last one
+                session.execute(
+                    update(GradingJob).where(owned, GradingJob.attempts < self.max_attempts)
+                    .values(status=GradingJobStatus.QUEUED, claimed_by=None, claimed_at=None, error=error),
+                    execution_options={"synchronize_session": False},
+                )
+            session.execute(update(GradingJob).where(owned).values(status=status, error=error,
+                                                                   finished_at=utc_now()),
+                            execution_options={"synchronize_session": False})
+
+    async def close(self):
+        # Jobs interrupted by a shutdown go back to the queue without counting as an attempt
+        if not self._claimed:
+            return
+        await asyncio.to_thread(self._release_claimed)
+        self.log.info(f"Returned {len(self._claimed)} unfinished jobs to the queue")
+        self._claimed.clear()
+
+    def _release_claimed(self):
+        with self.db_mgr.get_session() as session:
+            session.execute(
+                update(GradingJob).where(
+                    GradingJob.id.in_(list(self._claimed)),
+                    GradingJob.claimed_by == self.owner,
+                    GradingJob.status == GradingJobStatus.RUNNING,
+                ).values(status=GradingJobStatus.QUEUED, claimed_by=None, claimed_at=None,
+                         attempts=GradingJob.attempts - 1),
+                execution_options={"synchronize_session": False},
+            )
+
+    async def regrade_progress(self, assignment_id: str) -> Optional[RegradeProgress]:
+        return await asyncio.to_thread(self._regrade_progress, assignment_id)
+
+    def _regrade_progress(self, assignment_id: str) -> Optional[RegradeProgress]:
+        # Progress of the latest regrade run of the assignment. Read from the primary so a
+        # regrade that was just started is visible.
+        with self.db_mgr.get_session() as session:
+            batch = session.execute(
+                select(GradingJob.batch_id, func.min(GradingJob.created_at).label("started_at"))
+                .where(GradingJob.assignment_id == assignment_id, GradingJob.batch_id.isnot(None))
+                .group_by(GradingJob.batch_id)
+                .order_by(func.min(GradingJob.created_at).desc())
+                .limit(1)
+            ).first()
+            if batch is None:
+                return None
+            counts = {
+                status: (count, finished_at)
+                for status, count, finished_at in session.execute(
+                    select(GradingJob.status, func.count(), func.max(GradingJob.finished_at))
+                    .where(GradingJob.batch_id == batch.batch_id)
+                    .group_by(GradingJob.status)
+                )
+            }
+
+        completed, completed_at = counts.get(GradingJobStatus.DONE, (0, None))
+        failed, failed_at = counts.get(GradingJobStatus.FAILED, (0, None))
+        return RegradeProgress.restore(
+            assignment_id,
+            total=sum(count for count, _ in counts.values()),
+            completed=completed,
+            failed=failed,
+            started_at=batch.started_at,
+            finished_at=max(filter(None, (completed_at, failed_at)), default=None),
+        )
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from bytegrader.core.utils.datetime import ensure_aware
+
+
+class RegradeProgress:
+
+    def __init__(self, assignment_id: str, total: int):
+        self.assignment_id = assignment_id
+        self.total = total
+        self.enqueued = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self._started = time.monotonic()
+        self._check_finished()
+
+    @classmethod
+    def restore(cls, assignment_id: str, total: int, completed: int, failed: int,
+                started_at: datetime, finished_at: Optional[datetime] = None) -> 'RegradeProgress':
+        # Rebuilt from the grading_jobs of a run, see autograde.queue.DatabaseJobQueue
+        progress = cls(assignment_id, total)
+        progress.enqueued = total
+        progress.completed = completed
+        progress.failed = failed
+        progress.started_at = ensure_aware(started_at)
+        progress._started -= max((datetime.now(timezone.utc) - progress.started_at).total_seconds(), 0.0)
+        progress.finished_at = ensure_aware(finished_at) if progress.done and finished_at else None
+        progress._check_finished()
+        return progress
+
+    @property
+    def processed(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def done(self) -> bool:
+        return self.processed >= self.total
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if self.done:
+            return 0.0
+        if self.processed == 0:
+            return None
+        rate = self.processed / max(time.monotonic() - self._started, 1e-6)
+        return (self.total - self.processed) / rate
+
+    def mark_enqueued(self, count: int = 1):
+        self.enqueued += count
+
+    def mark_completed(self):
+        self.completed += 1
+        self._check_finished()
+
+    def mark_failed(self):
+        self.failed += 1
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.done and self.finished_at is None:
+            self.finished_at = datetime.now(timezone.utc)
+
+    def __repr__(self):
+        eta = self.eta_seconds
+        eta_str = f"{eta:.0f}s" if eta is not None else "unknown"
+        return (f"RegradeProgress(assignment='{self.assignment_id}', "
+                f"{self.processed}/{self.total} processed, failed={self.failed}, eta={eta_str})")
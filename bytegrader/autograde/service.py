@@ -1,31 +1,57 @@
 import asyncio
 import importlib
 import logging
+from datetime import timedelta
 from typing import List
 
 from apscheduler.job import Job
+from sqlalchemy import exists, or_
+from sqlalchemy.orm import selectinload
 
-from bytegrader.autograde.queue import JobQueue
-from bytegrader.autograde.worker import AutogradingWorker, AutogradingJob
+from bytegrader.autograde.queue import DatabaseJobQueue, JobQueue
+from bytegrader.autograde.regrade import RegradeProgress
+from bytegrader.autograde.worker import AutogradingWorker, AutogradingJob, JobPriority
 from bytegrader.config.config import BYTEGraderConfig
+from bytegrader.core.database.blobs import load_texts
 from bytegrader.core.database.connection import DatabaseManager
-from bytegrader.core.models import Submission, Assignment
-from bytegrader.core.models.enum import SubmissionStatus
+from bytegrader.core.database.scores import refresh_submission_scores
+from bytegrader.core.models import Submission, Assignment, Grade, GradingJob, Notebook, NotebookSubmission
+from bytegrader.core.models.enum import GradingJobStatus, SubmissionStatus
+from bytegrader.core.utils import utc_now
+from bytegrader.core.utils.datetime import parse_duration
 from bytegrader.core.utils.lti import LTIClient
 from bytegrader.core.observability import capture_exception, set_span_attributes
 
 
 class AutogradingService:
 
-    def __init__(self, config: BYTEGraderConfig, db_mgr: DatabaseManager, lti_client: LTIClient =None):
+    def __init__(self, config: BYTEGraderConfig, db_mgr: DatabaseManager, lti_client: LTIClient =None,
+                 run_workers: bool = True):
+        # Without workers the service only enqueues, for the HTTP processes in front of a database queue
         self.config = config
         self.db_mgr = db_mgr
         self.lti_client = lti_client
         self.log = logging.getLogger(__name__)
 
-        self.queue = JobQueue(max_size=128)
+        if self.config.autograde.queue == "database":
+            self.queue = DatabaseJobQueue(
+                db_mgr,
+                poll_interval=self.config.autograde.poll_interval,
+                lease=parse_duration(self.config.autograde.job_lease),
+                max_attempts=self.config.autograde.max_attempts,
+            )
+        else:
+            self.queue = JobQueue(max_size=128)
 
         self.workers: List[AutogradingWorker] = []
+        self.running = False
+        self.worker_tasks = []
+        self.regrades: dict[str, RegradeProgress] = {}
+        self._regrade_tasks: dict[str, asyncio.Task] = {}
+        self._requeue_task = None
+        if not run_workers:
+            return
+
         executor_class_path = self.config.autograde.executor_class
         if not executor_class_path:
             raise ValueError("No executor_class specified in AutogradeConfig")
@@ -53,9 +79,6 @@ class AutogradingService:
             worker = AutogradingWorker(f"worker-{i}", executor)
             self.workers.append(worker)
 
-        self.running = False
-        self.worker_tasks = []
-
         set_span_attributes(
             {
                 "component": "autograde_service",
@@ -72,6 +95,8 @@ class AutogradingService:
         set_span_attributes({"component": "autograde_service", "autograde.service.running": True})
 
         self.worker_tasks = [asyncio.create_task(self._worker_loop(worker)) for worker in self.workers]
+        if self.workers:
+            self._requeue_task = asyncio.create_task(self._requeue_loop(utc_now()))
 
     async def stop(self):
         if not self.running:
@@ -81,15 +106,21 @@ class AutogradingService:
         self.log.info("Stopping autograding service")
         set_span_attributes({"component": "autograde_service", "autograde.service.running": False})
 
-        for task in self.worker_tasks:
+        tasks = self.worker_tasks + list(self._regrade_tasks.values())
+        if self._requeue_task:
+            tasks.append(self._requeue_task)
+        for task in tasks:
             task.cancel()
 
         try:
-            await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+            await asyncio.gather(*tasks, return_exceptions=True)
         except asyncio.CancelledError:
             pass
 
         self.worker_tasks = []
+        self._regrade_tasks = {}
+        self._requeue_task = None
+        await self.queue.close()
 
     async def _worker_loop(self, worker: AutogradingWorker):
         self.log.info(f"Worker {worker.id} started")
@@ -99,6 +130,9 @@ class AutogradingService:
                 job = None
                 try:
                     job = await self.queue.get_job()
+                    # The worker task outlives its jobs; a write of the previous job must not keep
+                    # this one's reads on the primary
+                    self.db_mgr.reset_primary_pin()
 
                     set_span_attributes(
                         {
@@ -108,11 +142,15 @@ class AutogradingService:
                         }
                     )
 
+                    await self._load_sources(job)
                     await worker.process_job(job)
 
                     await self._save_results(job)
 
-                    self.queue.task_done()
+                    if job.progress:
+                        job.progress.mark_completed()
+
+                    await self.queue.task_done(job)
 
                 except asyncio.CancelledError:
                     self.log.info(f"Worker {worker.id} cancelled")
@@ -120,6 +158,10 @@ class AutogradingService:
                 except Exception as e:
                     self.log.error(f"Worker {worker.id} encountered an error: {e}")
                     job_id = job.id if job else None
+                    if job and job.progress:
+                        job.progress.mark_failed()
+                    if job:
+                        await self.queue.task_done(job, error=e)
                     capture_exception(
                         e,
                         tags={
@@ -130,11 +172,19 @@ class AutogradingService:
                             "job_id": job_id,
                         }
                     )
-                    self.queue.task_done()
 
         finally:
             self.log.info(f"Worker {worker.id} stopped")
 
+    async def _load_sources(self, job: AutogradingJob):
+        # Cell sources live in the blob store; attach them before the worker rebuilds the notebooks.
+        # Regrade jobs share one assignment, so its cells are only resolved for the first job.
+        # Read from the primary: a live submission's blobs may not have reached the replica yet.
+        objects = [cell for notebook in job.assignment.notebooks for cell in notebook.cells]
+        objects += [cs for ns in job.submission.notebook_submissions for cs in ns.cell_submissions]
+        async with self.db_mgr.get_async_session() as session:
+            await session.run_sync(load_texts, objects)
+
     async def _save_results(self, job: AutogradingJob):
         try:
             set_span_attributes(
@@ -151,30 +201,41 @@ class AutogradingService:
                     for cell_id, grade in cells.items():
                         grades.append(grade)
 
-                sess.add_all(grades)
+                # Upsert: a submission that is graded again (e.g. regrade) already has grade rows
+                existing = {
+                    (g.notebook_submission_id, g.cell_id): g
+                    for g in sess.query(Grade).filter(
+                        Grade.notebook_submission_id.in_(list(job.grades.keys()))
+                    )
+                } if job.grades else {}
+
+                for grade in grades:
+                    current = existing.get((grade.notebook_submission_id, grade.cell_id))
+                    if current is None:
+                        sess.add(grade)
+                        continue
+                    current.auto_score = grade.auto_score
+                    current.execution_error = grade.execution_error
+                    if current.manual_score is None:
+                        current.needs_manual_grading = grade.needs_manual_grading
+
+                sess.flush()
+                refresh_submission_scores(sess, [job.submission_id])
 
                 submission = sess.query(Submission).filter(
                     Submission.id == job.submission_id
                 ).one()
-                submission.status = SubmissionStatus.GRADED
+                # A resubmission may have archived this submission while it was being (re)graded
+                archived = submission.status == SubmissionStatus.ARCHIVED
+                if not archived:
+                    submission.status = SubmissionStatus.GRADED
 
                 sess.commit()
 
                 self.log.info(f"Submission {submission.id} added to database")
-                if job.assignment.lti_id and self.lti_client:
-                    submission = sess.get(Submission, submission.id)
-                    all_grades = []
-                    for notebook_sub in submission.notebook_submissions:
-                        for grade in notebook_sub.grades:
-                            all_grades.append(grade)
-
-                    achieved = sum(g.final_score for g in all_grades)
-
-                    max_possible = 0.0
-                    for nb in job.assignment.notebooks:
-                        for cell in nb.cells:
-                            if cell.is_grade:
-                                max_possible += cell.max_score
+                if job.assignment.lti_id and self.lti_client and not archived:
+                    achieved = submission.total_score
+                    max_possible = job.assignment.max_score
 
                     if max_possible <= 0:
                         self.log.warning("Assignment has no gradable points. Sending score 0.0 to LTI")
@@ -263,3 +324,173 @@ class AutogradingService:
         await self.queue.add_job(job)
 
         return job.id
+
+    async def _requeue_loop(self, started_at):
+        # The in-memory queue starts out empty, so every submission from before the start still
+        # waiting for a grade is lost and queued once. The database queue keeps its jobs; only
+        # submissions that never got one are queued, after a grace period for the request that
+        # stored them to enqueue them itself.
+        interval = parse_duration(self.config.autograde.requeue_interval)
+        if isinstance(self.queue, DatabaseJobQueue):
+            if not interval:
+                return
+            while self.running:
+                self.db_mgr.reset_primary_pin()
+                await self.requeue_pending(utc_now() - timedelta(seconds=max(interval, 60.0)))
+                await asyncio.sleep(interval)
+        else:
+            await self.requeue_pending(started_at)
+
+    async def requeue_pending(self, submitted_before) -> int:
+        loop = asyncio.get_running_loop()
+        try:
+            pending = await loop.run_in_executor(None, self._load_pending, submitted_before)
+            for assignment, submissions in pending:
+                for submission in submissions:
+                    await self.queue.add_job(AutogradingJob(submission.id, assignment, submission))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log.error(f"Failed to queue pending submissions: {e}")
+            capture_exception(e, tags={"component": "autograde_service", "stage": "requeue_pending"})
+            return 0
+
+        count = sum(len(submissions) for _, submissions in pending)
+        if count:
+            self.log.info(f"Queued {count} submissions that were waiting without a grading job")
+        return count
+
+    def _load_pending(self, submitted_before) -> list:
+        with self.db_mgr.get_session() as sess:
+            query = sess.query(Submission).filter(
+                Submission.status == SubmissionStatus.SUBMITTED,
+                Submission.submitted_at < submitted_before,
+            )
+            if isinstance(self.queue, DatabaseJobQueue):
+                # A live job of its own (in any state) or an unfinished regrade job covers it
+                query = query.filter(~exists().where(
+                    GradingJob.submission_id == Submission.id,
+                    or_(GradingJob.batch_id.is_(None),
+                        GradingJob.status.in_([GradingJobStatus.QUEUED, GradingJobStatus.RUNNING])),
+                ))
+            submissions = query.options(
+                selectinload(Submission.notebook_submissions).selectinload(NotebookSubmission.cell_submissions),
+            ).order_by(Submission.submitted_at).all()
+            if not submissions:
+                return []
+
+            assignments = sess.query(Assignment).filter(
+                Assignment.id.in_({submission.assignment_id for submission in submissions})
+            ).options(
+                selectinload(Assignment.course),
+                selectinload(Assignment.notebooks).selectinload(Notebook.cells),
+            ).all()
+            sess.expunge_all()
+
+        return [
+            (assignment, [submission for submission in submissions if submission.assignment_id == assignment.id])
+            for assignment in assignments
+        ]
+
+    async def get_regrade_progress(self, assignment_id: str) -> RegradeProgress | None:
+        if isinstance(self.queue, DatabaseJobQueue):
+            return await self.queue.regrade_progress(assignment_id)
+        return self.regrades.get(assignment_id)
+
+    async def regrade_assignment(self, assignment_id: str, chunk_size: int | None = None) -> RegradeProgress:
+        if not self.running:
+            raise RuntimeError("Autograding service is not running")
+
+        current = await self.get_regrade_progress(assignment_id)
+        if current and not current.done:
+            return current
+
+        with self.db_mgr.get_session(readonly=True) as sess:
+            submission_ids = [
+                row.id for row in sess.query(Submission.id).filter(
+                    Submission.assignment_id == assignment_id,
+                    Submission.status != SubmissionStatus.ARCHIVED,
+                ).order_by(Submission.submitted_at)
+            ]
+
+        progress = RegradeProgress(assignment_id, len(submission_ids))
+        if isinstance(self.queue, DatabaseJobQueue):
+            # The graders work through the run; its progress is read back from the queued jobs
+            if submission_ids:
+                await self.queue.add_batch(assignment_id, submission_ids, JobPriority.BACKGROUND)
+            self.log.info(f"Queued regrade of {progress.total} submissions of assignment {assignment_id}")
+            return await self.queue.regrade_progress(assignment_id) or progress
+
+        self.regrades[assignment_id] = progress
+        set_span_attributes(
+            {
+                "component": "autograde_service",
+                "autograde.assignment.id": assignment_id,
+                "autograde.regrade.total": progress.total,
+            }
+        )
+        self.log.info(f"Regrading {progress.total} submissions of assignment {assignment_id}")
+
+        if submission_ids:
+            chunk_size = chunk_size or self.config.autograde.regrade_chunk_size
+            self._regrade_tasks[assignment_id] = asyncio.create_task(
+                self._enqueue_regrade(progress, submission_ids, max(chunk_size, 1))
+            )
+        return progress
+
+    async def _enqueue_regrade(self, progress: RegradeProgress, submission_ids: list[str], chunk_size: int):
+        # Regrade jobs may only fill half of the queue so live submissions can always be enqueued
+        background_capacity = max(self.queue.max_size // 2, 1)
+        chunk_size = min(chunk_size, background_capacity)
+        skipped = 0
+        try:
+            with self.db_mgr.get_session(readonly=True) as sess:
+                assignment = sess.query(Assignment).filter(Assignment.id == progress.assignment_id).options(
+                    selectinload(Assignment.course),
+                    selectinload(Assignment.notebooks).selectinload(Notebook.cells),
+                ).one()
+                sess.expunge_all()
+
+            for start in range(0, len(submission_ids), chunk_size):
+                chunk = submission_ids[start:start + chunk_size]
+                while await self.queue.qsize() + len(chunk) > background_capacity:
+                    await asyncio.sleep(0.5)
+
+                with self.db_mgr.get_session(readonly=True) as sess:
+                    submissions = sess.query(Submission).filter(Submission.id.in_(chunk)).options(
+                        selectinload(Submission.notebook_submissions).selectinload(NotebookSubmission.cell_submissions),
+                    ).all()
+                    sess.expunge_all()
+
+                found = {s.id for s in submissions}
+                for _ in set(chunk) - found:
+                    # Deleted since the regrade was requested
+                    skipped += 1
+                    progress.mark_failed()
+
+                for submission in submissions:
+                    job = AutogradingJob(submission.id, assignment, submission,
+                                         priority=JobPriority.BACKGROUND, progress=progress)
+                    await self.queue.add_job(job)
+                    progress.mark_enqueued()
+
+                self.log.debug(f"Enqueued regrade chunk for assignment {progress.assignment_id}: {progress}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.log.error(f"Failed to enqueue regrade for assignment {progress.assignment_id}: {e}")
+            for _ in range(progress.total - progress.enqueued - skipped):
+                progress.mark_failed()
+            capture_exception(
+                e,
+                tags={
+                    "component": "autograde_service",
+                    "stage": "enqueue_regrade",
+                },
+                extra={
+                    "assignment_id": progress.assignment_id,
+                    "enqueued": progress.enqueued,
+                }
+            )
+        finally:
+            self._regrade_tasks.pop(progress.assignment_id, None)
@@ -22,13 +22,22 @@ class WorkerStatus(enum.Enum):
     ERROR = "error"
 
 
+class JobPriority(enum.IntEnum):
+    # Lower values are dequeued first
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
 class AutogradingJob:
 
-    def __init__(self, submission_id: str, assignment: Assignment, submission: Submission):
+    def __init__(self, submission_id: str, assignment: Assignment, submission: Submission,
+                 priority: JobPriority = JobPriority.INTERACTIVE, progress=None):
         self.id = f"job-{submission_id}"
         self.submission_id = submission_id
         self.assignment: Assignment = assignment
         self.submission: Submission = submission
+        self.priority = priority
+        self.progress = progress
         self.created_at = datetime.now()
         self.started_at = None
         self.completed_at = None
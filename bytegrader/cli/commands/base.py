@@ -0,0 +1,42 @@
+from typing import Optional, Any
+
+from traitlets.config import Application, PyFileConfigLoader
+from traitlets import Unicode
+
+from bytegrader.config.config import BYTEGraderConfig
+from bytegrader.core.observability import capture_exception
+
+
+class BaseCommand(Application):
+
+    config_file = Unicode(
+        "bytegrader_config.py",
+        help="Path to the BYTE Grader service configuration file."
+    ).tag(config=True)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.bgconfig = None
+
+    def initialize(self, argv: Optional[list] = None):
+        super().initialize(argv)
+
+        try:
+            config_loader = PyFileConfigLoader(self.config_file)
+            config = config_loader.load_config()
+            self.update_config(config)
+        except Exception as e:
+            self.log.error(f"Failed to load configuration file '{self.config_file}': {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": f"{self.name.split()[-1]}_command",
+                    "stage": "load_config",
+                },
+                extra={
+                    "config_file": self.config_file,
+                }
+            )
+            raise
+
+        self.bgconfig = BYTEGraderConfig(parent=self)
@@ -0,0 +1,197 @@
+import asyncio
+import sys
+
+from traitlets import Unicode
+from traitlets.config import Application
+
+from bytegrader.cli.commands.base import BaseCommand
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import upgrade_database, current_revision, head_revision
+from bytegrader.core.database.scores import refresh_max_scores, refresh_submission_scores
+from bytegrader.core.observability import capture_exception
+from bytegrader.repositories.submission import SubmissionRepository
+from bytegrader.tasks.archive import SubmissionArchiveTask
+
+
+class DatabaseUpgradeCommand(BaseCommand):
+    name = "bytegrader db upgrade"
+    description = "Apply pending schema migrations to the configured database."
+
+    revision = Unicode(
+        "head",
+        help="Revision to upgrade to."
+    ).tag(config=True)
+
+    aliases = {
+        "config": "DatabaseUpgradeCommand.config_file",
+        "revision": "DatabaseUpgradeCommand.revision",
+    }
+
+    def start(self) -> None:
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            before = current_revision(db_mgr)
+            upgrade_database(db_mgr, self.revision)
+            after = current_revision(db_mgr)
+        except Exception as e:
+            self.log.error(f"Database upgrade failed: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "db_command",
+                    "stage": "upgrade",
+                },
+                extra={
+                    "revision": self.revision,
+                }
+            )
+            sys.exit(-1)
+        finally:
+            db_mgr.close()
+
+        if before == after:
+            self.log.info(f"Database is already at revision {after}.")
+        else:
+            self.log.info(f"Database upgraded from {before or 'empty'} to {after}.")
+
+
+class DatabaseCurrentCommand(BaseCommand):
+    name = "bytegrader db current"
+    description = "Show the schema revision of the configured database."
+
+    aliases = {
+        "config": "DatabaseCurrentCommand.config_file",
+    }
+
+    def start(self) -> None:
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            current = current_revision(db_mgr)
+        finally:
+            db_mgr.close()
+
+        head = head_revision(db_mgr)
+        print(f"current: {current or 'none'}")
+        print(f"head:    {head}")
+        if current != head:
+            sys.exit(1)
+
+
+class DatabaseRepairScoresCommand(BaseCommand):
+    name = "bytegrader db repair-scores"
+    description = ("Recompute the stored score and max-score columns of all submissions and assignments "
+                   "from their grades and cells.")
+
+    aliases = {
+        "config": "DatabaseRepairScoresCommand.config_file",
+    }
+
+    def start(self) -> None:
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            with db_mgr.get_session() as session:
+                refresh_max_scores(session)
+                refresh_submission_scores(session)
+        except Exception as e:
+            self.log.error(f"Score repair failed: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "db_command",
+                    "stage": "repair_scores",
+                }
+            )
+            sys.exit(-1)
+        finally:
+            db_mgr.close()
+
+        self.log.info("Recomputed stored scores of all assignments and submissions.")
+
+
+class DatabaseArchiveCommand(BaseCommand):
+    name = "bytegrader db archive-submissions"
+    description = ("Move archived submissions older than ArchiveTaskConfig.min_age_days into the "
+                   "compressed archived_submissions table and delete source blobs nothing references.")
+
+    aliases = {
+        "config": "DatabaseArchiveCommand.config_file",
+    }
+
+    def start(self) -> None:
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            moved = asyncio.run(SubmissionArchiveTask(self.bgconfig, db_mgr).run())
+        except Exception as e:
+            self.log.error(f"Archiving submissions failed: {e}")
+            sys.exit(-1)
+        finally:
+            db_mgr.close()
+
+        self.log.info(f"Moved {moved} archived submissions to cold storage.")
+
+
+class DatabaseRestoreCommand(BaseCommand):
+    name = "bytegrader db restore-submission"
+    description = "Move an archived submission from cold storage back into the submission tables."
+
+    submission_id = Unicode(
+        "",
+        help="ID of the submission to restore."
+    ).tag(config=True)
+
+    aliases = {
+        "config": "DatabaseRestoreCommand.config_file",
+        "id": "DatabaseRestoreCommand.submission_id",
+    }
+
+    def start(self) -> None:
+        if not self.submission_id:
+            self.log.error("Missing --id")
+            sys.exit(-1)
+
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            submission = SubmissionRepository(db_mgr).restore_from_cold_storage(self.submission_id)
+        except Exception as e:
+            self.log.error(f"Restoring submission {self.submission_id} failed: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "db_command",
+                    "stage": "restore_submission",
+                },
+                extra={
+                    "submission_id": self.submission_id,
+                }
+            )
+            sys.exit(-1)
+        finally:
+            db_mgr.close()
+
+        if submission is None:
+            self.log.error(f"Submission {self.submission_id} is not in cold storage.")
+            sys.exit(1)
+        self.log.info(f"Restored submission {self.submission_id}.")
+
+
+class DatabaseCommand(Application):
+    name = "bytegrader db"
+    description = "Manage the BYTE Grader database schema."
+
+    subcommands = {
+        'upgrade': (DatabaseUpgradeCommand, "Apply pending schema migrations."),
+        'current': (DatabaseCurrentCommand, "Show the current schema revision."),
+        'repair-scores': (DatabaseRepairScoresCommand, "Recompute stored submission and assignment scores."),
+        'archive-submissions': (DatabaseArchiveCommand, "Move old archived submissions to cold storage."),
+        'restore-submission': (DatabaseRestoreCommand, "Restore a submission from cold storage."),
+    }
+
+    def start(self) -> None:
+        if self.subapp is None:
+            self.print_help()
+            return
+
+        self.subapp.log.setLevel(self.log.level)
+        for handler in self.subapp.log.handlers:
+            handler.setLevel(self.log.level)
+        self.subapp.start()
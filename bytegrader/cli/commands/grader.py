@@ -0,0 +1,73 @@
+import asyncio
+import signal
+import sys
+
+from bytegrader.autograde.service import AutogradingService
+from bytegrader.cli.commands.base import BaseCommand
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import is_up_to_date, upgrade_database
+from bytegrader.core.exceptions.config import ConfigurationError
+from bytegrader.core.observability import capture_exception, init_observability
+from bytegrader.hub import BYTEGraderHubApp, create_lti_client
+
+
+class GraderCommand(BaseCommand):
+    name = "bytegrader grader"
+    description = ("Grade the submissions queued in the database by 'bytegrader serve' and run the "
+                   "scheduled tasks. Requires AutogradeConfig.queue = 'database'; several graders may run "
+                   "against one database.")
+
+    aliases = {
+        "config": "GraderCommand.config_file",
+    }
+
+    def start(self) -> None:
+        if self.bgconfig.autograde.queue != "database":
+            self.log.error("The grader takes its jobs from the database queue. "
+                           "Set AutogradeConfig.queue = 'database' for it and for 'bytegrader serve'.")
+            sys.exit(-1)
+
+        try:
+            init_observability(self.log)
+        except Exception as e:
+            self.log.warning("Observability initialisation failed: %s", e)
+
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        hub_app = BYTEGraderHubApp(config=self.bgconfig)
+        try:
+            if self.bgconfig.database.auto_migrate:
+                upgrade_database(db_mgr)
+            elif not is_up_to_date(db_mgr):
+                raise ConfigurationError("Database schema is out of date. Run 'bytegrader db upgrade' first.")
+            service = AutogradingService(self.bgconfig, db_mgr, create_lti_client(self.bgconfig))
+            hub_app.start_tasks(db_mgr)
+            asyncio.get_event_loop().run_until_complete(self._run(service))
+        except Exception as e:
+            self.log.error(f"An error occurred while running the grader: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "grader_command",
+                    "stage": "run",
+                }
+            )
+            sys.exit(-1)
+        finally:
+            if hub_app.scheduler:
+                hub_app.scheduler.shutdown()
+            db_mgr.close()
+
+    async def _run(self, service: AutogradingService):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await service.start()
+        self.log.info(f"Grader started with {len(service.workers)} workers")
+        try:
+            await stop.wait()
+        finally:
+            # Jobs still running go back to the queue for the next grader
+            self.log.info("Stopping grader...")
+            await service.stop()
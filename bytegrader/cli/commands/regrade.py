@@ -0,0 +1,87 @@
+import asyncio
+import sys
+
+from traitlets import Unicode, Int, Float
+
+from bytegrader.autograde.service import AutogradingService
+from bytegrader.cli.commands.base import BaseCommand
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.observability import capture_exception
+from bytegrader.hub import create_lti_client
+
+
+class RegradeCommand(BaseCommand):
+    name = "bytegrader regrade"
+    description = ("Regrade every non-archived submission of an assignment. "
+                   "Grading runs in this process with the configured executor, next to any "
+                   "'bytegrader grader' working on the same database queue.")
+
+    assignment_id = Unicode(
+        "",
+        help="ID of the assignment to regrade."
+    ).tag(config=True)
+
+    chunk_size = Int(
+        0,
+        help="Number of submissions enqueued at once. Defaults to AutogradeConfig.regrade_chunk_size."
+    ).tag(config=True)
+
+    report_interval = Float(
+        5.0,
+        help="Seconds between progress reports."
+    ).tag(config=True)
+
+    aliases = {
+        "config": "RegradeCommand.config_file",
+        "assignment": "RegradeCommand.assignment_id",
+        "chunk-size": "RegradeCommand.chunk_size",
+        "report-interval": "RegradeCommand.report_interval",
+    }
+
+    def start(self) -> None:
+        if not self.assignment_id:
+            self.log.error("No assignment specified. Use --assignment=<id>.")
+            sys.exit(-1)
+
+        db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+        try:
+            service = AutogradingService(self.bgconfig, db_mgr, create_lti_client(self.bgconfig))
+            progress = asyncio.run(self._regrade(service))
+        except Exception as e:
+            self.log.error(f"Regrade of assignment {self.assignment_id} failed: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "regrade_command",
+                    "stage": "run",
+                },
+                extra={
+                    "assignment_id": self.assignment_id,
+                }
+            )
+            sys.exit(-1)
+        finally:
+            db_mgr.close()
+
+        self.log.info(
+            f"Regrade finished: {progress.completed} graded, {progress.failed} failed of {progress.total}"
+        )
+        if progress.failed:
+            sys.exit(1)
+
+    async def _regrade(self, service: AutogradingService):
+        await service.start()
+        try:
+            progress = await service.regrade_assignment(self.assignment_id, chunk_size=self.chunk_size or None)
+            while not progress.done:
+                await asyncio.sleep(self.report_interval)
+                # With the database queue the progress is read back from the jobs each time
+                progress = await service.get_regrade_progress(self.assignment_id) or progress
+                eta = progress.eta_seconds
+                self.log.info(
+                    f"{progress.processed}/{progress.total} submissions regraded "
+                    f"({progress.failed} failed), ETA: {f'{eta:.0f}s' if eta is not None else 'unknown'}"
+                )
+            return progress
+        finally:
+            await service.stop()
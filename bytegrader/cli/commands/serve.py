@@ -1,14 +1,16 @@
 import os
 import sys
-from typing import Optional, Any
 from urllib.parse import urlparse
 
 from tornado.httpserver import HTTPServer
 from tornado.ioloop import IOLoop
-from traitlets.config import Application, PyFileConfigLoader
+from tornado.netutil import bind_sockets
+from tornado.process import fork_processes
 from traitlets import Unicode, Int
 
-from bytegrader.config.config import BYTEGraderConfig
+from bytegrader.cli.commands.base import BaseCommand
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import upgrade_database
 from bytegrader.hub import BYTEGraderHubApp
 from bytegrader.core.observability import (
     capture_exception,
@@ -17,15 +19,10 @@ from bytegrader.core.observability import (
 )
 
 
-class ServeCommand(Application):
+class ServeCommand(BaseCommand):
     name = "bytegrader serve"
     description = "Start the BYTE Grader JupyterHub service."
 
-    config_file = Unicode(
-        "bytegrader_config.py",
-        help="Path to the BYTE Grader service configuration file."
-    ).tag(config=True)
-
     host = Unicode(
         "localhost",
         help="Host to bind the server to."
@@ -36,41 +33,52 @@ class ServeCommand(Application):
         help="Port to bind the server to."
     ).tag(config=True)
 
+    processes = Int(
+        1,
+        help="Number of server processes accepting on the port; 0 starts one per CPU core. More than "
+             "one requires AutogradeConfig.queue = 'database', grading then runs in 'bytegrader grader'."
+    ).tag(config=True)
+
     aliases = {
         "config": "ServeCommand.config_file",
         "host": "ServeCommand.host",
-        "port": "ServeCommand.port"
+        "port": "ServeCommand.port",
+        "processes": "ServeCommand.processes",
     }
 
-    def __init__(self, **kwargs: Any):
-        super().__init__(**kwargs)
-        self.bgconfig = None
-
-    def initialize(self, argv: Optional[list] = None):
-        super().initialize(argv)
+    def start(self) -> None:
+        tornado_app = None
 
-        try:
-            config_loader = PyFileConfigLoader(self.config_file)
-            config = config_loader.load_config()
-            self.update_config(config)
-        except Exception as e:
-            self.log.error(f"Failed to load configuration file '{self.config_file}': {e}")
-            capture_exception(
-                e,
-                tags={
-                    "component": "serve_command",
-                    "stage": "load_config",
-                },
-                extra={
-                    "config_file": self.config_file,
-                }
-            )
-            raise
+        if self.processes != 1 and self.bgconfig.autograde.queue != "database":
+            self.log.error("Serving with several processes requires AutogradeConfig.queue = 'database' "
+                           "and a separate 'bytegrader grader' process.")
+            sys.exit(-1)
 
-        self.bgconfig = BYTEGraderConfig(parent=self)
+        service_url = os.environ.get("JUPYTERHUB_SERVICE_URL")
+        if service_url:
+            url = urlparse(service_url)
+            host, port = url.hostname, url.port
+        else:
+            host, port = self.host, self.port
+            service_url = f"http://{host}:{port}"
 
-    def start(self) -> None:
-        tornado_app = None
+        try:
+            # Bound before forking: the processes share the listening sockets and the kernel
+            # spreads the connections over them. Everything else is created per process.
+            sockets = bind_sockets(port, address=host)
+        except OSError as e:
+            self.log.error(f"Failed to bind {service_url}: {e}")
+            sys.exit(-1)
+        if self.processes != 1:
+            if self.bgconfig.database.auto_migrate:
+                # Once, instead of racing in every process; the engine must not outlive the fork
+                db_mgr = DatabaseManager(self.bgconfig.database.uri, self.bgconfig)
+                try:
+                    upgrade_database(db_mgr)
+                finally:
+                    db_mgr.close()
+            task_id = fork_processes(self.processes)
+            self.log.info(f"Server process {task_id} started (pid {os.getpid()})")
 
         try:
             observability_state = init_observability(self.log)
@@ -104,18 +112,12 @@ class ServeCommand(Application):
 
             srv_prefix = os.environ.get("JUPYTERHUB_SERVICE_PREFIX", "")
 
-            tornado_app = hub_app.create_tornado_app(srv_prefix)
+            # With several processes the schema was upgraded before forking; they only check it
+            tornado_app = hub_app.create_tornado_app(srv_prefix, migrate=self.processes == 1)
 
-            service_url = os.environ.get("JUPYTERHUB_SERVICE_URL")
-            if service_url:
-                url = urlparse(service_url)
-                http_server = HTTPServer(tornado_app)
-                http_server.listen(url.port, address=url.hostname)
-                self.log.info(f"ByteGrader server starting at {service_url}")
-            else:
-                http_server = HTTPServer(tornado_app)
-                http_server.listen(self.port, address=self.host)
-                self.log.info(f"ByteGrader server starting at http://{self.host}:{self.port}")
+            http_server = HTTPServer(tornado_app)
+            http_server.add_sockets(sockets)
+            self.log.info(f"ByteGrader server starting at {service_url}")
 
             IOLoop.current().start()
 
@@ -4,6 +4,9 @@ import sys
 from traitlets import Unicode
 from traitlets.config import Application
 
+from bytegrader.cli.commands.db import DatabaseCommand
+from bytegrader.cli.commands.grader import GraderCommand
+from bytegrader.cli.commands.regrade import RegradeCommand
 from bytegrader.cli.commands.serve import ServeCommand
 
 
@@ -13,6 +16,9 @@ class BYTEGraderCLI(Application):
 
     subcommands = {
         'serve': (ServeCommand, "Start the BYTE Grader JupyterHub service."),
+        'grader': (GraderCommand, "Run the autograding workers for the database job queue."),
+        'regrade': (RegradeCommand, "Regrade all submissions of an assignment."),
+        'db': (DatabaseCommand, "Manage the database schema (migrations)."),
     }
 
     log_level = Unicode('DEBUG', help="Logging level").tag(config=True)
@@ -47,6 +53,7 @@ class BYTEGraderCLI(Application):
         app.log.setLevel(log_level)
         if app.log.handlers:
             for handler in app.log.handlers:
+                handler.setLevel(log_level)
                 handler.setFormatter(logging.Formatter(self.log_format))
 
 
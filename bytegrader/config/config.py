@@ -1,4 +1,4 @@
-from traitlets import Instance, Bool, Enum, Integer
+from traitlets import Instance, Bool, Enum, Integer, Float
 from traitlets.config import Configurable, Unicode
 
 
@@ -7,12 +7,71 @@ class DatabaseConfig(Configurable):
         "sqlite:///bytegrader.db",
         help="Database URI for BYTE Grader."
     ).tag(config=True)
+    async_uri = Unicode(
+        "",
+        help="Database URI used by the async engine. Derived from 'uri' when empty, "
+             "e.g. sqlite:// -> sqlite+aiosqlite://, postgresql:// -> postgresql+asyncpg:// "
+             "(the 'postgres' extra), mysql:// -> mysql+aiomysql:// (the 'mysql' extra). "
+             "In-memory SQLite databases are not supported."
+    ).tag(config=True)
     echo = Bool(False, help="Echo queries to the console for debugging.").tag(config=True)
+    pool_size = Integer(
+        5,
+        help="Number of connections kept open in the connection pool. "
+             "For SQLite this applies to the reader pool; writes use a single dedicated connection."
+    ).tag(config=True)
+    max_overflow = Integer(
+        10,
+        help="Number of connections allowed beyond pool_size under load."
+    ).tag(config=True)
+    pool_timeout = Float(
+        30.0,
+        help="Seconds to wait for a free connection before giving up."
+    ).tag(config=True)
+    pool_recycle = Integer(
+        1800,
+        help="Recycle connections after this many seconds. -1 disables recycling."
+    ).tag(config=True)
+    replica_uri = Unicode(
+        "",
+        help="Optional URI of a read replica. Read-only sessions use it unless the replica lags behind "
+             "by more than replica_max_lag or the current request has already written."
+    ).tag(config=True)
+    replica_async_uri = Unicode(
+        "",
+        help="Read replica URI used by the async engine. Derived from 'replica_uri' when empty."
+    ).tag(config=True)
+    replica_max_lag = Float(
+        5.0,
+        help="Maximum replication lag in seconds before reads fall back to the primary."
+    ).tag(config=True)
+    replica_check_interval = Float(
+        5.0,
+        help="Seconds between replica lag checks."
+    ).tag(config=True)
+    sqlite_busy_timeout = Integer(
+        5000,
+        help="SQLite busy_timeout in milliseconds, i.e. how long a connection waits for a lock."
+    ).tag(config=True)
+    auto_migrate = Bool(
+        True,
+        help="Apply pending schema migrations on startup. When disabled, run 'bytegrader db upgrade' "
+             "before starting the service; startup fails if the schema is out of date."
+    ).tag(config=True)
     asset_path = Unicode(
         "assets",
         help="Path to store assets for the assignments.",
         allow_none=True,
     ).tag(config=True)
+    blob_codec = Enum(
+        values=["none", "zlib", "zstd"],
+        default_value="zlib",
+        help="Compression codec for stored notebook sources. 'zstd' requires the zstandard package."
+    ).tag(config=True)
+    blob_compress_min_size = Integer(
+        256,
+        help="Sources smaller than this many bytes are stored uncompressed."
+    ).tag(config=True)
 
     
     """
@@ -86,22 +145,179 @@ class AutogradeConfig(Configurable):
         help="Number of workers for autograding tasks. "
              "More workers can speed up processing but may require more resources."
     ).tag(config=True)
-    cooldown_period = Unicode(  # ! TBD
-        "1h",
-        help="Cooldown period for autograding after a submission. "
-             "Format: <number><unit>, e.g., '1h' for 1 hour, '30m' for 30 minutes."
+    cooldown_period = Unicode(
+        "0",
+        help="Time a student waits between two submissions of the same assignment. Assignments can "
+             "override it. Format: <number><unit>, e.g., '1h' for 1 hour, '30m' for 30 minutes; "
+             "'0' disables it."
     ).tag(config=True)
     executor_class = Unicode(
         "",
         help="Class to handle the execution of autograding tasks. ",
         allow_none=True
     ).tag(config=True)
+    regrade_chunk_size = Integer(
+        50,
+        help="Number of submissions loaded and enqueued at once when regrading an assignment. "
+             "Regrade jobs run with background priority behind live submissions."
+    ).tag(config=True)
+    queue = Enum(
+        values=["memory", "database"],
+        default_value="memory",
+        help="Where autograding jobs are queued. 'memory' grades inside the 'bytegrader serve' process. "
+             "'database' queues them in the database for separate 'bytegrader grader' processes, which "
+             "also run the scheduled tasks; required for 'bytegrader serve --processes'."
+    ).tag(config=True)
+    poll_interval = Float(
+        1.0,
+        help="Seconds a grader waits before it looks for new jobs again when the database queue is empty."
+    ).tag(config=True)
+    job_lease = Unicode(
+        "1h",
+        help="Time after which a job claimed by a grader that never finished it, e.g. because the "
+             "process died, is handed out again."
+    ).tag(config=True)
+    max_attempts = Integer(
+        3,
+        help="Number of times a job of the database queue is handed out before it is marked as failed."
+    ).tag(config=True)
+    requeue_interval = Unicode(
+        "5m",
+        help="How often the grading process looks for submissions that were stored without a grading "
+             "job, e.g. because enqueueing failed, and queues them. The in-memory queue only does so "
+             "once at startup. '0' disables it."
+    ).tag(config=True)
+
+
+class CacheConfig(Configurable):
+    user_ttl = Float(
+        60.0,
+        help="Seconds a resolved user and its enrollments are cached. 0 disables the cache. Changes "
+             "made through a server process invalidate its cache at once. Changes made elsewhere, by "
+             "the LTI sync of 'bytegrader grader' or by another process of 'bytegrader serve "
+             "--processes', are seen after at most user_ttl seconds, or user_shared_ttl with the "
+             "database queue."
+    ).tag(config=True)
+    user_shared_ttl = Float(
+        5.0,
+        help="Upper bound of user_ttl with AutogradeConfig.queue = 'database', where other processes "
+             "change enrollments without invalidating the cache: an unenrolled student keeps access "
+             "for at most this many seconds. 0 disables the cache in that deployment."
+    ).tag(config=True)
+    user_maxsize = Integer(
+        1024,
+        help="Maximum number of users kept in the cache."
+    ).tag(config=True)
+    blob_maxsize = Integer(
+        32 * 1024 * 1024,
+        help="Maximum total size in characters of the notebook sources kept in the in-process cache. "
+             "0 disables the cache."
+    ).tag(config=True)
+    render_maxsize = Integer(
+        64 * 1024 * 1024,
+        help="Maximum total size in bytes of the rendered assignment notebooks kept in memory for "
+             "fetches. 0 disables the in-memory cache."
+    ).tag(config=True)
+    render_spill_path = Unicode(
+        "render-cache",
+        help="Directory the rendered assignment notebooks are written to, so they survive eviction "
+             "and restarts. Empty disables it."
+    ).tag(config=True)
+
+
+class ArchiveTaskConfig(Configurable):
+    enabled = Bool(
+        True,
+        help="Periodically move archived submissions out of the hot tables into the compressed "
+             "archived_submissions table, and delete notebook source blobs no longer referenced."
+    ).tag(config=True)
+    interval = Unicode(
+        "1d",
+        help="Interval for the archive task."
+    ).tag(config=True)
+    min_age_days = Integer(
+        7,
+        help="Days a submission stays archived in the hot tables before it is moved to cold storage."
+    ).tag(config=True)
+    batch_size = Integer(
+        200,
+        help="Number of submissions moved per transaction."
+    ).tag(config=True)
+    codec = Enum(
+        values=["zlib", "zstd"],
+        default_value="zlib",
+        help="Compression codec for archived submissions. 'zstd' requires the zstandard package."
+    ).tag(config=True)
+
+
+class PaginationConfig(Configurable):
+    default_page_size = Integer(
+        50,
+        help="Number of items returned by listing endpoints when the client does not pass a limit."
+    ).tag(config=True)
+    max_page_size = Integer(
+        200,
+        help="Upper bound for the 'limit' query argument of listing endpoints."
+    ).tag(config=True)
+
+
+class RateLimitConfig(Configurable):
+    user_limit = Integer(
+        30,
+        help="Submissions a user can make in a burst, across all assignments. The allowance refills "
+             "evenly over user_period. 0 disables the limit."
+    ).tag(config=True)
+    user_period = Unicode(
+        "1h",
+        help="Time over which a user's submission allowance refills completely."
+    ).tag(config=True)
+    course_limit = Integer(
+        0,
+        help="Submissions all users of a course can make in a burst. The allowance refills evenly "
+             "over course_period. 0 disables the limit."
+    ).tag(config=True)
+    course_period = Unicode(
+        "10m",
+        help="Time over which a course's submission allowance refills completely."
+    ).tag(config=True)
+
+
+class UploadConfig(Configurable):
+    max_request_size = Integer(
+        100 * 1024 * 1024,
+        help="Maximum size in bytes of an upload request body (assignment creation, submission)."
+    ).tag(config=True)
+    max_notebook_size = Integer(
+        20 * 1024 * 1024,
+        help="Maximum size in bytes of a single uploaded notebook."
+    ).tag(config=True)
+    max_asset_size = Integer(
+        100 * 1024 * 1024,
+        help="Maximum size in bytes of a single uploaded assignment asset."
+    ).tag(config=True)
+    max_field_size = Integer(
+        1024 * 1024,
+        help="Maximum size in bytes of a non-file form field, such as the assignment metadata."
+    ).tag(config=True)
+    spool_size = Integer(
+        1024 * 1024,
+        help="Bytes of an uploaded file kept in memory before it is spooled to a temporary file."
+    ).tag(config=True)
+    spool_path = Unicode(
+        "",
+        help="Directory for spooled upload files. Empty uses the system temporary directory."
+    ).tag(config=True)
 
 
 class BYTEGraderConfig(Configurable):
     database = Instance(DatabaseConfig, allow_none=True).tag(config=True)
     lti = Instance(LTIConfig, allow_none=True).tag(config=True)
     autograde = Instance(AutogradeConfig, allow_none=True).tag(config=True)
+    cache = Instance(CacheConfig, allow_none=True).tag(config=True)
+    pagination = Instance(PaginationConfig, allow_none=True).tag(config=True)
+    archive = Instance(ArchiveTaskConfig, allow_none=True).tag(config=True)
+    upload = Instance(UploadConfig, allow_none=True).tag(config=True)
+    rate_limit = Instance(RateLimitConfig, allow_none=True).tag(config=True)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -111,3 +327,13 @@ class BYTEGraderConfig(Configurable):
             self.lti = LTIConfig(parent=self)
         if self.autograde is None:
             self.autograde = AutogradeConfig(parent=self)
+        if self.cache is None:
+            self.cache = CacheConfig(parent=self)
+        if self.pagination is None:
+            self.pagination = PaginationConfig(parent=self)
+        if self.archive is None:
+            self.archive = ArchiveTaskConfig(parent=self)
+        if self.upload is None:
+            self.upload = UploadConfig(parent=self)
+        if self.rate_limit is None:
+            self.rate_limit = RateLimitConfig(parent=self)
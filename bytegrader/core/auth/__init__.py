@@ -1,7 +1,8 @@
-from .permissions import PermissionManager
+from .permissions import PermissionManager, PermissionEvaluator
 from .decorators import require_permission
 
 __all__ = [
     "PermissionManager",
+    "PermissionEvaluator",
     "require_permission"
 ]
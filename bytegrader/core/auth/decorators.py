@@ -1,10 +1,11 @@
 import functools
 
+from sqlalchemy.orm import selectinload
 from tornado.web import HTTPError
 
-from .permissions import PermissionManager
+from .permissions import PermissionManager, PermissionEvaluator
 from .policies import POLICY_STORE
-from ..models import Enrollment, Assignment, Course
+from ..models import Assignment
 
 permission_manager = PermissionManager(POLICY_STORE)
 
@@ -14,31 +15,41 @@ def require_permission(action: str):
     def decorator(handler_method):
         @functools.wraps(handler_method)
         async def wrapper(self, *args, **kwargs):
-            raw_user, current_user = self.resolve_current_user()
+            raw_user, current_user = await self.resolve_current_user()
             if not raw_user or not current_user:
                 raise HTTPError(401, reason="Authentication required.")
 
-            context = {'db_session': self.db_session}
+            context = {}
             course_id = kwargs.get('course_id')
             if course_id:
-                course = self.db_session.query(Course).filter_by(label=course_id).first()
+                course = await self.course_repo.get_async(course_id)
                 if not course: raise HTTPError(404, reason="Course not found.")
                 context['course'] = course
-                context['enrollment'] = self.db_session.query(Enrollment).filter_by(user_id=current_user.id,
-                                                                                    course_id=course_id).first()
+                context['enrollment'] = await self.enrollment_repo.get_by_user_and_course_async(
+                    current_user.id, course_id, include_inactive=True
+                )
 
             assignment_id = kwargs.get('assignment_id')
             if assignment_id:
-                assignment = self.db_session.query(Assignment).filter_by(id=assignment_id).first()
+                assignment = await self.assignment_repo.get_async(
+                    assignment_id, options=(selectinload(Assignment.course),)
+                )
                 if not assignment: raise HTTPError(404, reason="Assignment not found.")
                 context['assignment'] = assignment
                 # If checking an assignment, we need its course context too
                 if 'course' not in context:
                     context['course'] = assignment.course
-                    context['enrollment'] = self.db_session.query(Enrollment).filter_by(
-                        user_id=current_user.id,
-                        course_id=assignment.course.label
-                    ).first()
+                    context['enrollment'] = await self.enrollment_repo.get_by_user_and_course_async(
+                        current_user.id, assignment.course.label, include_inactive=True
+                    )
+                submissions = await self.submission_repo.list_for_user_and_assignments_async(
+                    current_user.id, [assignment.id], include_archived=True
+                )
+                # Stands in for the session the permission check used to query the submission with
+                context['submissions'] = submissions
+                if self._permission_evaluator is None:
+                    self._permission_evaluator = PermissionEvaluator(permission_manager, current_user)
+                self._permission_evaluator.add_submissions([assignment.id], submissions)
 
             is_allowed = permission_manager.check(current_user, action, context)
 
@@ -1,6 +1,9 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
 from sqlalchemy.orm import Session
 
 from ..models import User, Submission
+from ..models.enum import SubmissionStatus
 
 
 class PermissionManager:
@@ -39,6 +42,8 @@ class PermissionManager:
                     user_id=user.id, assignment_id=assignment.id
                 ).first()
                 context.setdefault('submission', existing)
+            elif 'submissions' in context:
+                context.setdefault('submission', next(iter(context['submissions']), None))
 
             course = assignment.course
             context.setdefault('course', course)
@@ -65,34 +70,83 @@ class PermissionManager:
 
         return False
 
-    def get_all_permissions(self, user: User, db_session: Session, resources: dict = None) -> dict:
+    def get_all_permissions(self, user: User, db_session: Optional[Session] = None,
+                            resources: dict = None) -> dict:
+        evaluator = PermissionEvaluator(self, user)
+        assignment_ids = [a.id for a in (resources or {}).get('assignment', [])]
+        if db_session is not None and assignment_ids:
+            evaluator.add_submissions(assignment_ids, db_session.query(Submission).filter(
+                Submission.user_id == user.id,
+                Submission.assignment_id.in_(assignment_ids)
+            ).all())
+        return evaluator.get_all_permissions(resources)
+
+
+# Evaluates policies for one user against a preloaded snapshot and memoizes the results, so it
+# is meant to live for a single request. Submissions must be added before assignment-scoped checks.
+class PermissionEvaluator:
+
+    def __init__(self, manager: PermissionManager, user: User):
+        self.manager = manager
+        self.user = user
+        self.enrollments = {e.course_id: e for e in user.enrollments}
+        self.submissions: Dict[str, Optional[Submission]] = {}
+        self._results: Dict[Tuple[str, Optional[str]], bool] = {}
+
+    def missing_submissions(self, assignments: Iterable) -> List[str]:
+        return [a.id for a in assignments if a.id not in self.submissions]
+
+    def add_submissions(self, assignment_ids: Iterable[str], submissions: Iterable[Submission]):
+        for assignment_id in assignment_ids:
+            self.submissions.setdefault(assignment_id, None)
+        for submission in submissions:
+            current = self.submissions.get(submission.assignment_id)
+            # A non-archived submission wins over archived ones
+            if current is None or (current.status == SubmissionStatus.ARCHIVED
+                                   and submission.status != SubmissionStatus.ARCHIVED):
+                self.submissions[submission.assignment_id] = submission
+
+    def _context(self, scope: str, resource) -> dict:
+        context = {'user': self.user}
+        if scope == 'course':
+            context['course'] = resource
+            context['enrollment'] = self.enrollments.get(resource.label)
+        elif scope == 'assignment':
+            context['assignment'] = resource
+            context['course'] = resource.course
+            context['enrollment'] = self.enrollments.get(resource.course.label)
+            if resource.id in self.submissions:
+                context['submission'] = self.submissions[resource.id]
+        return context
+
+    def check(self, action: str, resource=None) -> bool:
+        policy = self.manager.policies.get(action)
+        if not policy:
+            return False
+
+        scope = policy.get('scope', 'global')
+        resource_id = None if scope == 'global' else getattr(resource, 'label', getattr(resource, 'id', None))
+        key = (action, resource_id)
+        if key not in self._results:
+            self._results[key] = self.manager.check(self.user, action, self._context(scope, resource))
+        return self._results[key]
+
+    def get_all_permissions(self, resources: dict = None) -> dict:
         perms = {"global": [], "scoped": {}}
         resources = resources or {}
-        user_enrollments = {e.course_id: e for e in user.enrollments}
 
-        for action, policy in self.policies.items():
+        for action, policy in self.manager.policies.items():
             scope = policy.get("scope", "global")
 
             if scope == "global":
-                if self.check(user, action, {'db_session': db_session}):
+                if self.check(action):
                     perms["global"].append(action)
 
             elif scope in resources:
                 for resource in resources[scope]:
                     resource_id = getattr(resource, 'label', getattr(resource, 'id', None))
-                    if resource_id not in perms["scoped"]:
-                        perms["scoped"][resource_id] = []
-
-                    context = {'user': user, 'db_session': db_session}
-                    if scope == 'course':
-                        context['course'] = resource
-                        context['enrollment'] = user_enrollments.get(resource.label)
-                    elif scope == 'assignment':
-                        context['assignment'] = resource
-                        context['course'] = resource.course
-                        context['enrollment'] = user_enrollments.get(resource.course.label)
-
-                    if self.check(user, action, context):
-                        perms["scoped"][resource_id].append(action)
+                    scoped = perms["scoped"].setdefault(resource_id, [])
+                    if self.check(action, resource):
+                        scoped.append(action)
 
         return perms
@@ -6,10 +6,16 @@ from ..utils import utc_now
 from ..utils.datetime import ensure_aware
 
 
+def _get_submission(ctx):
+    # Filled in by PermissionManager.check; fall back to a lookup for callers passing a session
+    if 'submission' in ctx:
+        return ctx['submission']
+    assignment = ctx['assignment']
+    return ctx['db_session'].query(Submission).filter_by(user_id=ctx['user'].id, assignment_id=assignment.id).first()
+
+
 def check_fetch_solution_for_student(ctx):
     assignment = ctx['assignment']
-    user = ctx['user']
-    db_session = ctx['db_session']
     show_solutions = assignment.show_solutions
 
     if show_solutions == ShowSolutionsOption.NEVER:
@@ -21,9 +27,9 @@ def check_fetch_solution_for_student(ctx):
             return utc_now() > ensure_aware(assignment.due_date)
         return False  # Deny if no due date
     elif show_solutions == ShowSolutionsOption.AFTER_SUBMISSION:
-        return db_session.query(Submission).filter_by(user_id=user.id, assignment_id=assignment.id).first() is not None
+        return _get_submission(ctx) is not None
     elif show_solutions == ShowSolutionsOption.AFTER_COMPLETION:
-        submission = db_session.query(Submission).filter_by(user_id=user.id, assignment_id=assignment.id).first()
+        submission = _get_submission(ctx)
         if submission:
             if not assignment.allow_resubmission:
                 return True
@@ -166,6 +172,16 @@ POLICY_STORE = {
             },
         ],
     },
+    "assignment:regrade": {
+        "description": "Allows regrading all submissions of an assignment.",
+        "scope": "assignment",
+        "rules": [
+            {"roles": ["ADMIN"], "conditions": []},
+            {"roles": ["INSTRUCTOR"], "conditions": [
+                lambda ctx: ctx.get('enrollment') is not None,
+            ]},
+        ],
+    },
     "assignment:delete": {
         "description": "Allows deleting an assignment.",
         "scope": "assignment",
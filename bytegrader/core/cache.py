@@ -0,0 +1,267 @@
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+
+from .models import User
+from .observability import add_counter
+
+
+class UserCache:
+    # Resolved users (with their enrollments loaded) keyed by LMS user id. Entries are detached
+    # ORM instances and must be treated as read-only.
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.enabled = maxsize > 0 and ttl > 0
+        self._cache = TTLCache(maxsize=max(maxsize, 1), ttl=max(ttl, 0.001))
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, lms_user_id: str) -> Optional[User]:
+        user = self._cache.get(lms_user_id) if self.enabled else None
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        add_counter("bytegrader.cache.user.lookups", attributes={"result": "miss" if user is None else "hit"})
+        return user
+
+    def set(self, lms_user_id: str, user: User):
+        if self.enabled and user is not None:
+            self._cache[lms_user_id] = user
+
+    async def get_or_load(self, lms_user_id: str, load: Callable[[], Awaitable[Optional[User]]]) -> Optional[User]:
+        # Concurrent misses for the same user (a student's first requests, fired in parallel by
+        # the lab) share one load, including a Hub lookup and provisioning
+        pending = self._pending.get(lms_user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[lms_user_id] = future
+        try:
+            user = await load()
+            self.set(lms_user_id, user)
+            future.set_result(user)
+            return user
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(lms_user_id, None)
+
+    def invalidate(self, *user_ids: str):
+        # Users are cached by LMS id, which usually but not necessarily equals User.id
+        ids = {user_id for user_id in user_ids if user_id}
+        for key, user in list(self._cache.items()):
+            if key in ids or user.id in ids or user.lms_user_id in ids:
+                self._cache.pop(key, None)
+
+    def invalidate_course(self, course_id: str):
+        # Users are cached with their enrollments, members of the course are loaded again
+        for key, user in list(self._cache.items()):
+            if any(enrollment.course_id == course_id for enrollment in user.enrollments):
+                self._cache.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class BlobCache:
+    # Decoded blob texts keyed by content hash. Blobs are immutable, so entries never go stale;
+    # the cache is bounded by the total size of the texts. Shared by the request handlers and
+    # the autograding workers, hence the lock.
+
+    def __init__(self, maxsize: int = 32 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self.resize(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.enabled = maxsize > 0
+            self._cache = LRUCache(maxsize=max(maxsize, 1), getsizeof=lambda text: max(len(text), 1))
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for digest in digests:
+                text = self._cache.get(digest) if self.enabled else None
+                if text is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[digest] = text
+        return found
+
+    def set_many(self, texts: Dict[str, str]):
+        if not self.enabled:
+            return
+        with self._lock:
+            for digest, text in texts.items():
+                # Texts larger than the whole cache are not kept
+                if len(text) <= self._cache.maxsize:
+                    self._cache[digest] = text
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+@dataclass
+class RenderedAssignment:
+    notebooks: List[Tuple[str, bytes]]  # (filename, serialized notebook)
+    assets: List[Tuple[str, str]]  # (asset id, path); asset files never change
+    digest: str
+
+    @classmethod
+    def build(cls, notebooks: List[Tuple[str, bytes]], assets: List[Tuple[str, str]]) -> "RenderedAssignment":
+        h = hashlib.sha256()
+        for name, body in notebooks:
+            h.update(f"notebook:{name}:{len(body)}:".encode())
+            h.update(body)
+        for asset_id, path in assets:
+            h.update(f"asset:{asset_id}:{path}:".encode())
+        return cls(notebooks, assets, h.hexdigest())
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for _, body in self.notebooks) + 1
+
+    def etag(self, metadata: str, representation: str) -> str:
+        # Strong validator of the whole fetch response; the metadata may change independently
+        key = f"{self.digest}:{representation}:{metadata}"
+        return '"' + hashlib.sha256(key.encode()).hexdigest()[:40] + '"'
+
+    def dumps(self) -> bytes:
+        return json.dumps({
+            "digest": self.digest,
+            "assets": self.assets,
+            "notebooks": [(name, body.decode("utf-8")) for name, body in self.notebooks],
+        }).encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "RenderedAssignment":
+        doc = json.loads(data)
+        return cls(
+            notebooks=[(name, body.encode("utf-8")) for name, body in doc["notebooks"]],
+            assets=[tuple(asset) for asset in doc["assets"]],
+            digest=doc["digest"],
+        )
+
+
+class RenderCache:
+    # Rendered fetch artifacts keyed by (assignment id, version, variant). Assignments do not
+    # change after creation, so entries are only dropped when the assignment is deleted. Kept in
+    # an LRU bounded by size, written through to spill_path so evicted entries (and entries
+    # rendered before a restart) are read back from disk instead of being rendered again.
+    # Concurrent misses for the same key wait for a single render.
+
+    def __init__(self, maxsize: int = 64 * 1024 * 1024, spill_path: Optional[str] = None):
+        self.enabled = maxsize > 0
+        self._cache = LRUCache(maxsize=max(maxsize, 1), getsizeof=lambda entry: entry.size)
+        self.spill_path = spill_path or None
+        self._pending: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self.log = logging.getLogger("RenderCache")
+        self.hits = 0
+        self.misses = 0
+        if self.spill_path:
+            os.makedirs(self.spill_path, exist_ok=True)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _spill_file(self, key: Tuple[str, str, str]) -> str:
+        return os.path.join(self.spill_path, "{}-{}-{}.json".format(*key))
+
+    def _read_spilled(self, key) -> Optional[RenderedAssignment]:
+        try:
+            with open(self._spill_file(key), "rb") as f:
+                return RenderedAssignment.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            self.log.warning(f"Ignoring unreadable render cache file for {key}: {e}")
+            return None
+
+    def _write_spilled(self, key, entry: RenderedAssignment):
+        path = self._spill_file(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(entry.dumps())
+            os.replace(tmp, path)
+        except OSError as e:
+            self.log.warning(f"Failed to write render cache file {path}: {e}")
+
+    def _remember(self, key, entry: RenderedAssignment):
+        if self.enabled and entry.size <= self._cache.maxsize:
+            self._cache[key] = entry
+
+    async def get_or_render(self, key: Tuple[str, str, str],
+                            render: Callable[[], Awaitable[RenderedAssignment]]) -> RenderedAssignment:
+        entry = self._cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            entry = await loop.run_in_executor(None, self._read_spilled, key) if self.spill_path else None
+            if entry is None:
+                entry = await render()
+                if self.spill_path:
+                    await loop.run_in_executor(None, self._write_spilled, key, entry)
+            self._remember(key, entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved; waiters (if any) get the exception through their own await
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    def invalidate(self, assignment_id: str):
+        for key in [key for key in self._cache.keys() if key[0] == assignment_id]:
+            self._cache.pop(key, None)
+        if self.spill_path:
+            for path in glob.glob(os.path.join(glob.escape(self.spill_path), f"{glob.escape(assignment_id)}-*.json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        self._cache.clear()
+        if self.spill_path:
+            for path in glob.glob(os.path.join(glob.escape(self.spill_path), "*.json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,194 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:02:15.095014
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('courses',
+    sa.Column('label', sa.String(length=128), nullable=False),
+    sa.Column('title', sa.String(length=256), nullable=False),
+    sa.Column('lti_id', sa.String(length=64), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('label')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.String(length=128), nullable=False),
+    sa.Column('first_name', sa.String(length=128), nullable=True),
+    sa.Column('last_name', sa.String(length=128), nullable=True),
+    sa.Column('email', sa.String(length=256), nullable=True),
+    sa.Column('lms_user_id', sa.String(length=128), nullable=True),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('assignments',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('course_id', sa.String(length=128), nullable=False),
+    sa.Column('name', sa.String(length=256), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('lti_id', sa.String(length=32), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('allow_resubmission', sa.Boolean(), nullable=False),
+    sa.Column('allow_late_submission', sa.Boolean(), nullable=False),
+    sa.Column('show_solutions', sa.Enum('NEVER', 'ALWAYS', 'AFTER_DUE', 'AFTER_SUBMISSION', 'AFTER_COMPLETION', name='show_solutions_option'), nullable=False),
+    sa.Column('visible', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.label'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('course_id', 'name')
+    )
+    op.create_table('enrollments',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.String(length=128), nullable=False),
+    sa.Column('course_id', sa.String(length=128), nullable=False),
+    sa.Column('role', sa.Enum('STUDENT', 'INSTRUCTOR', name='userrole'), nullable=False),
+    sa.Column('enrolled_at', sa.DateTime(), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.label'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'course_id')
+    )
+    op.create_table('assignment_assets',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('assignment_id', sa.String(length=32), nullable=False),
+    sa.Column('path', sa.Text(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('assignment_id', 'path')
+    )
+    op.create_table('notebooks',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('assignment_id', sa.String(length=32), nullable=False),
+    sa.Column('name', sa.String(length=256), nullable=False),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('kernelspec', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('idx >= 0', name='positive_idx'),
+    sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('assignment_id', 'idx'),
+    sa.UniqueConstraint('assignment_id', 'name')
+    )
+    op.create_table('submissions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('assignment_id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.String(length=128), nullable=False),
+    sa.Column('status', sa.Enum('SUBMITTED', 'GRADED', 'ARCHIVED', name='submissionstatus'), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    sa.Column('extension_days', sa.Integer(), nullable=False),
+    sa.Column('graded_at', sa.DateTime(), nullable=True),
+    sa.Column('graded_by', sa.String(length=128), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('extension_days >= 0', name='positive_extension'),
+    sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('cells',
+    sa.Column('id', sa.String(length=128), nullable=False),
+    sa.Column('notebook_id', sa.String(length=32), nullable=False),
+    sa.Column('name', sa.String(length=256), nullable=True),
+    sa.Column('idx', sa.Integer(), nullable=False),
+    sa.Column('cell_type', sa.Enum('CODE', 'MARKDOWN', name='celltype'), nullable=False),
+    sa.Column('source', sa.Text(), nullable=True),
+    sa.Column('source_student', sa.Text(), nullable=True),
+    sa.Column('meta', sa.Text(), nullable=True),
+    sa.Column('max_score', sa.Float(), nullable=False),
+    sa.Column('is_grade', sa.Boolean(), nullable=False),
+    sa.Column('is_solution', sa.Boolean(), nullable=False),
+    sa.Column('is_locked', sa.Boolean(), nullable=False),
+    sa.Column('is_task', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint('(is_grade = true) OR (max_score = 0)', name='gradable_score_consistency'),
+    sa.CheckConstraint('idx >= 0', name='positive_idx'),
+    sa.CheckConstraint('max_score >= 0', name='positive_max_score'),
+    sa.ForeignKeyConstraint(['notebook_id'], ['notebooks.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('notebook_id', 'id'),
+    sa.UniqueConstraint('notebook_id', 'idx')
+    )
+    op.create_table('notebook_submissions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('submission_id', sa.String(length=32), nullable=False),
+    sa.Column('notebook_id', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['notebook_id'], ['notebooks.id'], ),
+    sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('submission_id', 'notebook_id')
+    )
+    op.create_table('cell_submissions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('notebook_submission_id', sa.String(length=32), nullable=False),
+    sa.Column('cell_id', sa.String(length=128), nullable=False),
+    sa.Column('submitted_source', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['cell_id'], ['cells.id'], ),
+    sa.ForeignKeyConstraint(['notebook_submission_id'], ['notebook_submissions.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('notebook_submission_id', 'cell_id')
+    )
+    op.create_table('comments',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('notebook_submission_id', sa.String(length=32), nullable=False),
+    sa.Column('cell_id', sa.String(length=128), nullable=False),
+    sa.Column('auto_comment', sa.Text(), nullable=True),
+    sa.Column('manual_comment', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('commented_by', sa.String(length=128), nullable=True),
+    sa.ForeignKeyConstraint(['cell_id'], ['cells.id'], ),
+    sa.ForeignKeyConstraint(['notebook_submission_id'], ['notebook_submissions.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('notebook_submission_id', 'cell_id')
+    )
+    op.create_table('grades',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('notebook_submission_id', sa.String(length=32), nullable=False),
+    sa.Column('cell_id', sa.String(length=128), nullable=False),
+    sa.Column('auto_score', sa.Float(), nullable=True),
+    sa.Column('manual_score', sa.Float(), nullable=True),
+    sa.Column('extra_credit', sa.Float(), nullable=False),
+    sa.Column('needs_manual_grading', sa.Boolean(), nullable=False),
+    sa.Column('execution_error', sa.Text(), nullable=True),
+    sa.Column('graded_at', sa.DateTime(), nullable=True),
+    sa.Column('graded_by', sa.String(length=128), nullable=True),
+    sa.CheckConstraint('auto_score IS NULL OR auto_score >= 0', name='positive_auto_score'),
+    sa.CheckConstraint('manual_score IS NULL OR manual_score >= 0', name='positive_manual_score'),
+    sa.ForeignKeyConstraint(['cell_id'], ['cells.id'], ),
+    sa.ForeignKeyConstraint(['notebook_submission_id'], ['notebook_submissions.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('notebook_submission_id', 'cell_id', name='uq_grade_cell_submission'),
+    sa.UniqueConstraint('notebook_submission_id', 'id')
+    )
+
+
+def downgrade():
+    op.drop_table('grades')
+    op.drop_table('comments')
+    op.drop_table('cell_submissions')
+    op.drop_table('notebook_submissions')
+    op.drop_table('cells')
+    op.drop_table('submissions')
+    op.drop_table('notebooks')
+    op.drop_table('assignment_assets')
+    op.drop_table('enrollments')
+    op.drop_table('assignments')
+    op.drop_table('users')
+    op.drop_table('courses')
@@ -0,0 +1,28 @@
+"""hot query indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:02:42.393170
+
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Grades by notebook_submission_id are already covered by uq_grade_cell_submission
+    op.create_index('ix_submissions_user_assignment_status', 'submissions',
+                    ['user_id', 'assignment_id', 'status'])
+    op.create_index('ix_enrollments_course_role_active', 'enrollments',
+                    ['course_id', 'role', 'active'])
+    op.create_index('ix_users_lms_user_id', 'users', ['lms_user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_users_lms_user_id', table_name='users')
+    op.drop_index('ix_enrollments_course_role_active', table_name='enrollments')
+    op.drop_index('ix_submissions_user_assignment_status', table_name='submissions')
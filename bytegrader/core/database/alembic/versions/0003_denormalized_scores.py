@@ -0,0 +1,121 @@
+"""denormalized score columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:20:11.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+SCORE_TABLES = ('submissions', 'notebook_submissions')
+MAX_SCORE_TABLES = ('notebooks', 'assignments')
+
+cells = sa.table('cells', sa.column('notebook_id'), sa.column('max_score'))
+notebooks = sa.table('notebooks', sa.column('id'), sa.column('assignment_id'), sa.column('max_score'))
+assignments = sa.table('assignments', sa.column('id'), sa.column('max_score'))
+grades = sa.table(
+    'grades',
+    sa.column('notebook_submission_id'),
+    sa.column('auto_score'),
+    sa.column('manual_score'),
+    sa.column('extra_credit'),
+    sa.column('needs_manual_grading'),
+)
+notebook_submissions = sa.table(
+    'notebook_submissions',
+    sa.column('id'),
+    sa.column('submission_id'),
+    sa.column('total_score'),
+    sa.column('auto_score'),
+    sa.column('manual_score'),
+    sa.column('needs_manual_grading'),
+)
+submissions = sa.table(
+    'submissions',
+    sa.column('id'),
+    sa.column('total_score'),
+    sa.column('auto_score'),
+    sa.column('manual_score'),
+    sa.column('needs_manual_grading'),
+)
+
+
+def _grade_sum(score, *criteria):
+    return sa.select(sa.func.coalesce(sa.func.sum(score + sa.func.coalesce(grades.c.extra_credit, 0.0)), 0.0)) \
+        .where(grades.c.notebook_submission_id == notebook_submissions.c.id, *criteria) \
+        .scalar_subquery()
+
+
+def _nb_sum(column):
+    return sa.select(sa.func.coalesce(sa.func.sum(column), 0.0)) \
+        .where(notebook_submissions.c.submission_id == submissions.c.id) \
+        .scalar_subquery()
+
+
+def upgrade():
+    for table in SCORE_TABLES:
+        op.add_column(table, sa.Column('total_score', sa.Float(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('auto_score', sa.Float(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('manual_score', sa.Float(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('needs_manual_grading', sa.Boolean(), nullable=False,
+                                       server_default=sa.true()))
+    for table in MAX_SCORE_TABLES:
+        op.add_column(table, sa.Column('max_score', sa.Float(), nullable=False, server_default='0'))
+
+    final_score = sa.case(
+        (grades.c.manual_score.isnot(None), grades.c.manual_score),
+        else_=sa.func.coalesce(grades.c.auto_score, 0.0)
+    )
+    op.execute(notebook_submissions.update().values(
+        total_score=_grade_sum(final_score),
+        auto_score=_grade_sum(grades.c.auto_score, grades.c.auto_score.isnot(None)),
+        manual_score=_grade_sum(grades.c.manual_score, grades.c.manual_score.isnot(None)),
+        needs_manual_grading=sa.or_(
+            ~sa.exists().where(grades.c.notebook_submission_id == notebook_submissions.c.id),
+            sa.exists().where(
+                grades.c.notebook_submission_id == notebook_submissions.c.id,
+                grades.c.needs_manual_grading == sa.true()
+            )
+        ),
+    ))
+    op.execute(submissions.update().values(
+        total_score=_nb_sum(notebook_submissions.c.total_score),
+        auto_score=_nb_sum(notebook_submissions.c.auto_score),
+        manual_score=_nb_sum(notebook_submissions.c.manual_score),
+        needs_manual_grading=sa.or_(
+            ~sa.exists().where(notebook_submissions.c.submission_id == submissions.c.id),
+            sa.exists().where(
+                notebook_submissions.c.submission_id == submissions.c.id,
+                grades.c.notebook_submission_id == notebook_submissions.c.id,
+                grades.c.needs_manual_grading == sa.true()
+            )
+        ),
+    ))
+    op.execute(notebooks.update().values(
+        max_score=sa.select(sa.func.coalesce(sa.func.sum(cells.c.max_score), 0.0))
+        .where(cells.c.notebook_id == notebooks.c.id)
+        .scalar_subquery()
+    ))
+    op.execute(assignments.update().values(
+        max_score=sa.select(sa.func.coalesce(sa.func.sum(notebooks.c.max_score), 0.0))
+        .where(notebooks.c.assignment_id == assignments.c.id)
+        .scalar_subquery()
+    ))
+
+
+def downgrade():
+    for table in MAX_SCORE_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('max_score')
+    for table in SCORE_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('needs_manual_grading')
+            batch_op.drop_column('manual_score')
+            batch_op.drop_column('auto_score')
+            batch_op.drop_column('total_score')
@@ -0,0 +1,36 @@
+"""archived submissions cold storage
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:14:37.204911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('archived_submissions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('assignment_id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.String(length=128), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    sa.Column('codec', sa.String(length=16), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_submissions_assignment_user', 'archived_submissions',
+                    ['assignment_id', 'user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_archived_submissions_assignment_user', table_name='archived_submissions')
+    op.drop_table('archived_submissions')
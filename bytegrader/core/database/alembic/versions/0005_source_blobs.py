@@ -0,0 +1,174 @@
+"""content-addressed blobs for notebook sources
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 11:02:51.730412
+
+"""
+import hashlib
+import zlib
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+COMPRESS_MIN_SIZE = 256
+
+# table -> text columns moved into blobs; each is replaced by <column>_hash
+SOURCE_COLUMNS = {
+    'cells': ('source', 'source_student'),
+    'cell_submissions': ('submitted_source',),
+}
+
+blobs = sa.table(
+    'blobs',
+    sa.column('hash', sa.String),
+    sa.column('codec', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _table(name, columns):
+    return sa.table(name, sa.column('id'), *(sa.column(column) for column in columns))
+
+
+def _encode(text):
+    raw = text.encode('utf-8')
+    if len(raw) >= COMPRESS_MIN_SIZE:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return 'zlib', len(raw), packed
+    return 'none', len(raw), raw
+
+
+def _decode(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return data.decode('utf-8')
+
+
+def _move_sources_to_blobs(bind, table_name, columns):
+    table = _table(table_name, columns + tuple(f'{column}_hash' for column in columns))
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    after = None
+    while True:
+        query = sa.select(table.c.id, *(table.c[column] for column in columns)) \
+            .order_by(table.c.id).limit(BATCH_SIZE)
+        if after is not None:
+            query = query.where(table.c.id > after)
+        rows = bind.execute(query).all()
+        if not rows:
+            return
+
+        texts = {}
+        updates = []
+        for row in rows:
+            values = {'_id': row.id}
+            for column in columns:
+                text = getattr(row, column)
+                digest = hashlib.sha256(text.encode('utf-8')).hexdigest() if text is not None else None
+                if digest:
+                    texts.setdefault(digest, text)
+                values[f'_{column}_hash'] = digest
+            updates.append(values)
+
+        existing = set(bind.execute(sa.select(blobs.c.hash).where(blobs.c.hash.in_(list(texts)))).scalars())
+        new_blobs = []
+        for digest, text in texts.items():
+            if digest not in existing:
+                codec, size, data = _encode(text)
+                new_blobs.append({'hash': digest, 'codec': codec, 'size': size, 'data': data, 'created_at': now})
+        if new_blobs:
+            bind.execute(blobs.insert(), new_blobs)
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('_id'))
+            .values({f'{column}_hash': sa.bindparam(f'_{column}_hash') for column in columns}),
+            updates
+        )
+        after = rows[-1].id
+
+
+def _restore_sources_from_blobs(bind, table_name, columns):
+    table = _table(table_name, columns + tuple(f'{column}_hash' for column in columns))
+    after = None
+    while True:
+        query = sa.select(table.c.id, *(table.c[f'{column}_hash'] for column in columns)) \
+            .order_by(table.c.id).limit(BATCH_SIZE)
+        if after is not None:
+            query = query.where(table.c.id > after)
+        rows = bind.execute(query).all()
+        if not rows:
+            return
+
+        digests = {getattr(row, f'{column}_hash') for row in rows for column in columns} - {None}
+        texts = {
+            blob.hash: _decode(blob.codec, blob.data)
+            for blob in bind.execute(
+                sa.select(blobs.c.hash, blobs.c.codec, blobs.c.data).where(blobs.c.hash.in_(list(digests)))
+            )
+        }
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('_id'))
+            .values({column: sa.bindparam(f'_{column}') for column in columns}),
+            [
+                {'_id': row.id, **{f'_{column}': texts.get(getattr(row, f'{column}_hash')) for column in columns}}
+                for row in rows
+            ]
+        )
+        after = rows[-1].id
+
+
+def upgrade():
+    op.create_table('blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('codec', sa.String(length=16), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+
+    for table_name, columns in SOURCE_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in columns:
+                batch_op.add_column(sa.Column(f'{column}_hash', sa.String(length=64), nullable=True))
+                batch_op.create_foreign_key(f'fk_{table_name}_{column}_hash_blobs', 'blobs',
+                                            [f'{column}_hash'], ['hash'])
+
+    bind = op.get_bind()
+    for table_name, columns in SOURCE_COLUMNS.items():
+        _move_sources_to_blobs(bind, table_name, columns)
+
+    for table_name, columns in SOURCE_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in columns:
+                batch_op.drop_column(column)
+
+
+def downgrade():
+    for table_name, columns in SOURCE_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in columns:
+                batch_op.add_column(sa.Column(column, sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    for table_name, columns in SOURCE_COLUMNS.items():
+        _restore_sources_from_blobs(bind, table_name, columns)
+
+    for table_name, columns in SOURCE_COLUMNS.items():
+        with op.batch_alter_table(table_name) as batch_op:
+            for column in columns:
+                batch_op.drop_column(f'{column}_hash')
+
+    op.drop_table('blobs')
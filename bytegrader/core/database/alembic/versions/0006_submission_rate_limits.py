@@ -0,0 +1,31 @@
+"""submission cooldown and rate limits
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:41:08.512634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rate_limits',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('assignments') as batch_op:
+        batch_op.add_column(sa.Column('submission_cooldown', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('assignments') as batch_op:
+        batch_op.drop_column('submission_cooldown')
+    op.drop_table('rate_limits')
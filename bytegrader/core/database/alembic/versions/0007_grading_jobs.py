@@ -0,0 +1,40 @@
+"""database-backed grading queue
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 17:12:44.903517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('grading_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('submission_id', sa.String(length=32), nullable=False),
+    sa.Column('assignment_id', sa.String(length=32), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('batch_id', sa.String(length=32), nullable=True),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='gradingjobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('claimed_by', sa.String(length=128), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_grading_jobs_status_priority', 'grading_jobs', ['status', 'priority', 'created_at'])
+    op.create_index('ix_grading_jobs_assignment_batch', 'grading_jobs', ['assignment_id', 'batch_id'])
+
+
+def downgrade():
+    op.drop_index('ix_grading_jobs_assignment_batch', table_name='grading_jobs')
+    op.drop_index('ix_grading_jobs_status_priority', table_name='grading_jobs')
+    op.drop_table('grading_jobs')
@@ -0,0 +1,121 @@
+"""indexes for blob references, inline sources in archived submissions
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 19:40:12.581304
+
+"""
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 200
+
+# Columns referencing blobs; indexed so unreferenced blobs can be found (and deleted) cheaply
+BLOB_REFERENCES = {
+    'cells': ('source_hash', 'source_student_hash'),
+    'cell_submissions': ('submitted_source_hash',),
+}
+
+blobs = sa.table(
+    'blobs',
+    sa.column('hash', sa.String),
+    sa.column('codec', sa.String),
+    sa.column('data', sa.LargeBinary),
+)
+
+archived_submissions = sa.table(
+    'archived_submissions',
+    sa.column('id', sa.String),
+    sa.column('codec', sa.String),
+    sa.column('payload', sa.LargeBinary),
+)
+
+
+def _decompress(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _compress(codec, data):
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _inline_archived_sources(bind):
+    # Trees archived since 0005 reference their submitted sources by blob hash. They are
+    # rewritten with the sources inline, so archived trees no longer keep blobs alive.
+    after = None
+    while True:
+        query = sa.select(archived_submissions.c.id, archived_submissions.c.codec, archived_submissions.c.payload) \
+            .order_by(archived_submissions.c.id).limit(BATCH_SIZE)
+        if after is not None:
+            query = query.where(archived_submissions.c.id > after)
+        rows = bind.execute(query).all()
+        if not rows:
+            return
+
+        documents = {}
+        for row in rows:
+            document = json.loads(_decompress(row.codec, row.payload))
+            if any('submitted_source_hash' in cell for cell in document.get('cell_submissions', [])):
+                documents[row.id] = (row.codec, document)
+
+        digests = {
+            cell.get('submitted_source_hash')
+            for _, document in documents.values()
+            for cell in document.get('cell_submissions', [])
+        } - {None}
+        texts = {
+            blob.hash: _decompress(blob.codec, blob.data).decode('utf-8')
+            for blob in bind.execute(
+                sa.select(blobs.c.hash, blobs.c.codec, blobs.c.data).where(blobs.c.hash.in_(list(digests)))
+            )
+        }
+
+        updates = []
+        for archived_id, (codec, document) in documents.items():
+            for cell in document.get('cell_submissions', []):
+                if 'submitted_source_hash' in cell:
+                    digest = cell.pop('submitted_source_hash')
+                    cell['submitted_source'] = texts.get(digest) if digest else None
+            document['version'] = 2
+            payload = json.dumps(document, separators=(',', ':')).encode()
+            updates.append({'_id': archived_id, '_payload': _compress(codec, payload)})
+        if updates:
+            bind.execute(
+                archived_submissions.update().where(archived_submissions.c.id == sa.bindparam('_id'))
+                .values(payload=sa.bindparam('_payload')),
+                updates
+            )
+        after = rows[-1].id
+
+
+def upgrade():
+    for table_name, columns in BLOB_REFERENCES.items():
+        for column in columns:
+            op.create_index(f'ix_{table_name}_{column}', table_name, [column])
+
+    _inline_archived_sources(op.get_bind())
+
+
+def downgrade():
+    # Archived trees keep their sources inline, which the previous revision restores as well
+    for table_name, columns in BLOB_REFERENCES.items():
+        for column in columns:
+            op.drop_index(f'ix_{table_name}_{column}', table_name=table_name)
@@ -0,0 +1,123 @@
+import enum
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import select, delete, DateTime, Enum
+from sqlalchemy.orm import Session
+
+from .blobs import fetch_texts, store_texts
+from .bulk import bulk_insert
+from .codec import compress, decompress
+from ..models import Submission, NotebookSubmission, CellSubmission, Grade, Comment, ArchivedSubmission
+
+# Archived submissions are moved out of the hot tables into archived_submissions, one row per
+# submission holding the JSON of its whole tree. Rows are restored unchanged (status ARCHIVED).
+# Submitted sources are stored inline rather than as blob references, so the blobs of archived
+# trees can be pruned (see blobs.prune_blobs) and are stored again on restore.
+
+PAYLOAD_VERSION = 2
+
+# Tables below notebook_submissions, keyed by notebook_submission_id
+_NOTEBOOK_CHILDREN = (CellSubmission, Grade, Comment)
+
+
+def _dump_row(row) -> Dict[str, Any]:
+    out = {}
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.name
+        out[key] = value
+    return out
+
+
+def _load_row(model, data: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for column in model.__table__.columns:
+        if column.key not in data:
+            continue
+        value = data[column.key]
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Enum) and column.type.enum_class is not None:
+                value = column.type.enum_class[value]
+        out[column.key] = value
+    return out
+
+
+def _rows(session: Session, model, criterion) -> List[Dict[str, Any]]:
+    return [_dump_row(row) for row in session.execute(select(model.__table__).where(criterion)).mappings()]
+
+
+def archive_submission_trees(session: Session, submission_ids: Iterable[str], codec: str = "zlib") -> int:
+    ids = list(submission_ids)
+    if not ids:
+        return 0
+
+    submissions = _rows(session, Submission, Submission.id.in_(ids))
+    notebook_submissions = _rows(session, NotebookSubmission, NotebookSubmission.submission_id.in_(ids))
+    nb_owner = {ns["id"]: ns["submission_id"] for ns in notebook_submissions}
+    nb_ids = select(NotebookSubmission.id).where(NotebookSubmission.submission_id.in_(ids))
+
+    documents = defaultdict(lambda: {"version": PAYLOAD_VERSION})
+
+    def add(model, submission_id: str, row: Dict[str, Any]):
+        documents[submission_id].setdefault(model.__tablename__, []).append(row)
+
+    for row in submissions:
+        add(Submission, row["id"], row)
+    for row in notebook_submissions:
+        add(NotebookSubmission, row["submission_id"], row)
+    for child in _NOTEBOOK_CHILDREN:
+        rows = _rows(session, child, child.notebook_submission_id.in_(nb_ids))
+        if child is CellSubmission:
+            texts = fetch_texts(session, [row["submitted_source_hash"] for row in rows])
+            for row in rows:
+                digest = row.pop("submitted_source_hash")
+                row["submitted_source"] = texts[digest] if digest else None
+        for row in rows:
+            add(child, nb_owner[row["notebook_submission_id"]], row)
+
+    bulk_insert(session, ArchivedSubmission, [
+        {
+            "id": s["id"],
+            "assignment_id": s["assignment_id"],
+            "user_id": s["user_id"],
+            "submitted_at": datetime.fromisoformat(s["submitted_at"]) if s["submitted_at"] else None,
+            "codec": codec,
+            "payload": compress(json.dumps(documents[s["id"]], separators=(",", ":")).encode(), codec),
+        }
+        for s in submissions
+    ])
+
+    for child in _NOTEBOOK_CHILDREN:
+        session.execute(delete(child).where(child.notebook_submission_id.in_(nb_ids)),
+                        execution_options={"synchronize_session": False})
+    session.execute(delete(NotebookSubmission).where(NotebookSubmission.submission_id.in_(ids)),
+                    execution_options={"synchronize_session": False})
+    session.execute(delete(Submission).where(Submission.id.in_(ids)),
+                    execution_options={"synchronize_session": False})
+    return len(submissions)
+
+
+def restore_submission_tree(session: Session, submission_id: str) -> bool:
+    archived = session.get(ArchivedSubmission, submission_id)
+    if archived is None:
+        return False
+
+    document = json.loads(decompress(archived.payload, archived.codec))
+    # Submitted sources are inline; their blobs may have been pruned since
+    inline = [row for row in document.get(CellSubmission.__tablename__, []) if "submitted_source" in row]
+    if inline:
+        digests = store_texts(session, [row.pop("submitted_source") for row in inline])
+        for row, digest in zip(inline, digests):
+            row["submitted_source_hash"] = digest
+
+    for model in (Submission, NotebookSubmission, *_NOTEBOOK_CHILDREN):
+        bulk_insert(session, model, [_load_row(model, row) for row in document.get(model.__tablename__, [])])
+    session.delete(archived)
+    return True
@@ -0,0 +1,186 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+from datetime import datetime
+
+from sqlalchemy import select, insert, delete, exists
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+
+from .bulk import BULK_BATCH_SIZE
+from .codec import compress, decompress
+from ..cache import BlobCache
+from ..exceptions import DatabaseError
+from ..models import Cell, CellSubmission
+from ..models.blob import Blob, BlobText
+from ..utils import utc_now
+
+# Notebook sources (Cell.source, Cell.source_student, CellSubmission.submitted_source) are
+# stored once per distinct text in the blobs table and referenced by their sha256. An untouched
+# stub cell or an unchanged cell of a resubmission adds a reference, not another copy.
+# Blobs are immutable. Once no cell or cell submission references a blob it is removed by
+# prune_blobs; archived submissions in cold storage carry their sources inline.
+
+blob_cache = BlobCache()
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chunks(items: List, size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert_ignoring_duplicates(session: Session, rows: List[Dict]):
+    # Two transactions may store the same text concurrently; the second insert is a no-op
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Blob).on_conflict_do_nothing(index_elements=[Blob.hash])
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Blob).on_conflict_do_nothing(index_elements=[Blob.hash])
+    elif dialect in ("mysql", "mariadb"):
+        stmt = insert(Blob).prefix_with("IGNORE")
+    else:
+        stmt = insert(Blob)
+    for batch in _chunks(rows):
+        session.execute(stmt, batch)
+
+
+def store_options(config) -> Dict:
+    if config is None or not hasattr(config, "database"):
+        return {}
+    return {"codec": config.database.blob_codec, "min_size": config.database.blob_compress_min_size}
+
+
+def existing_hashes(session: Session, digests: Iterable[str]) -> Set[str]:
+    # Only holds for the rest of a writing transaction (see prune_blobs)
+    existing = set()
+    for batch in _chunks(list(digests)):
+        existing.update(session.scalars(select(Blob.hash).where(Blob.hash.in_(batch))))
+    return existing
+
+
+def _unreferenced():
+    return (
+        ~exists().where(Cell.source_hash == Blob.hash),
+        ~exists().where(Cell.source_student_hash == Blob.hash),
+        ~exists().where(CellSubmission.submitted_source_hash == Blob.hash),
+    )
+
+
+def prune_blobs(session: Session, created_before: datetime, limit: int = BULK_BATCH_SIZE) -> int:
+    # Deletes up to limit blobs created before created_before that nothing references, returns
+    # the number deleted. A writer that found a blob (existing_hashes) references it in the same
+    # transaction. On SQLite that transaction holds the write lock from its first statement, so
+    # the prune waits for it; other backends enforce the foreign key when the writer inserts,
+    # which then fails. A reference is never left dangling.
+    digests = list(session.scalars(
+        select(Blob.hash).where(Blob.created_at < created_before, *_unreferenced()).limit(limit)
+    ))
+    if not digests:
+        return 0
+    result = session.execute(delete(Blob).where(Blob.hash.in_(digests), *_unreferenced()),
+                             execution_options={"synchronize_session": False})
+    return result.rowcount
+
+
+def store_texts(session: Session, texts: Iterable[Optional[str]], codec: str = "zlib",
+                min_size: int = 256) -> List[Optional[str]]:
+    # Returns the hash of every text, in order, inserting the blobs that do not exist yet.
+    # Texts shorter than min_size, or that do not shrink, are stored uncompressed.
+    digests = []
+    pending: Dict[str, str] = {}
+    for text in texts:
+        if text is None:
+            digests.append(None)
+            continue
+        digest = blob_hash(text)
+        digests.append(digest)
+        pending.setdefault(digest, text)
+
+    if not pending:
+        return digests
+
+    existing = existing_hashes(session, pending)
+
+    rows = []
+    now = utc_now()
+    for digest, text in pending.items():
+        if digest in existing:
+            continue
+        raw = text.encode("utf-8")
+        used, data = "none", raw
+        if codec != "none" and len(raw) >= min_size:
+            packed = compress(raw, codec)
+            if len(packed) < len(raw):
+                used, data = codec, packed
+        rows.append({"hash": digest, "codec": used, "size": len(raw), "data": data, "created_at": now})
+    if rows:
+        _insert_ignoring_duplicates(session, rows)
+
+    # Content addressed, so the texts are valid cache entries even if the transaction rolls back
+    blob_cache.set_many(pending)
+    return digests
+
+
+def fetch_texts(session: Session, digests: Iterable[str]) -> Dict[str, str]:
+    wanted = {digest for digest in digests if digest}
+    texts = blob_cache.get_many(wanted)
+    missing = list(wanted - texts.keys())
+
+    loaded = {}
+    for batch in _chunks(missing):
+        for blob in session.execute(select(Blob.hash, Blob.codec, Blob.data).where(Blob.hash.in_(batch))):
+            loaded[blob.hash] = decompress(blob.data, blob.codec).decode("utf-8")
+    if len(loaded) < len(missing):
+        absent = sorted(set(missing) - loaded.keys())
+        raise DatabaseError(f"Blobs not found: {', '.join(absent[:5])}")
+
+    blob_cache.set_many(loaded)
+    texts.update(loaded)
+    return texts
+
+
+def _blob_attrs(model) -> List[str]:
+    return [attr.hash_attr for attr in vars(model).values() if isinstance(attr, BlobText)]
+
+
+def load_texts(session: Session, objects: Iterable) -> None:
+    # Attaches the texts of all blob columns of the given instances with at most one query per
+    # batch of cache misses. The instances may be detached; the texts stay attached to them.
+    pending = []
+    digests = set()
+    attrs_by_model = {}
+    for obj in objects:
+        model = type(obj)
+        if model not in attrs_by_model:
+            attrs_by_model[model] = _blob_attrs(model)
+        attached = obj.__dict__.get("_blob_texts", {})
+        needed = [getattr(obj, attr) for attr in attrs_by_model[model]]
+        needed = [digest for digest in needed if digest and digest not in attached]
+        if needed:
+            pending.append((obj, needed))
+            digests.update(needed)
+
+    if not digests:
+        return
+
+    texts = fetch_texts(session, digests)
+    for obj, needed in pending:
+        attached = obj.__dict__.setdefault("_blob_texts", {})
+        for digest in needed:
+            attached[digest] = texts[digest]
+
+
+def resolve_text(obj, digest: str) -> str:
+    # Fallback for instances whose texts were not attached with load_texts
+    text = blob_cache.get_many([digest]).get(digest)
+    if text is None:
+        session = object_session(obj)
+        if session is None:
+            raise DatabaseError(f"Blob {digest} of detached {type(obj).__name__} was not loaded")
+        text = fetch_texts(session, [digest])[digest]
+    obj.__dict__.setdefault("_blob_texts", {})[digest] = text
+    return text
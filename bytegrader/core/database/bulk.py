@@ -0,0 +1,14 @@
+from typing import Any, Dict, List, Type
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+# Rows are written with Core INSERT statements executed as executemany, bypassing the unit of
+# work. Column defaults still apply, but relationships and ORM events do not, so callers pass
+# fully populated rows and load the objects afterwards if they need them.
+BULK_BATCH_SIZE = 1000
+
+
+def bulk_insert(session: Session, model: Type, rows: List[Dict[str, Any]], batch_size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(rows), batch_size):
+        session.execute(insert(model), rows[start:start + batch_size])
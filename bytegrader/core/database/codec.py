@@ -0,0 +1,88 @@
+import zlib
+
+from ..exceptions.config import ConfigurationError
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+# Compression codecs shared by the blob store and the submission archive. The codec name is
+# stored next to the payload so rows written with different settings stay readable.
+CODECS = ("none", "zlib", "zstd")
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise ConfigurationError("The 'zstd' codec requires the zstandard package (pip install bytegrader[zstd])")
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def decompress_bounded(data: bytes, codec: str, max_size: int) -> bytes:
+    # decompress() for untrusted input: stops as soon as the output exceeds max_size
+    if codec == "none":
+        out = data
+    elif codec == "zlib":
+        d = zlib.decompressobj()
+        out = d.decompress(data, max_size + 1)
+        if len(out) <= max_size and not d.eof:
+            raise ValueError("Truncated zlib data")
+    elif codec == "zstd":
+        _require_zstd()
+        out = b""
+        with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+            while len(out) <= max_size:
+                chunk = reader.read(max_size + 1 - len(out))
+                if not chunk:
+                    break
+                out += chunk
+    else:
+        raise ValueError(f"Unknown codec '{codec}'")
+    if len(out) > max_size:
+        raise ValueError(f"Decompressed data exceeds {max_size} bytes")
+    return out
+
+
+def compressor(codec: str):
+    # Incremental counterpart of compress(): an object with compress(chunk) and flush(), or
+    # None for "none". The concatenated output is readable with decompressor(codec).
+    if codec == "none":
+        return None
+    if codec == "zlib":
+        return zlib.compressobj(6)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unknown codec '{codec}'")
+
+
+def decompressor(codec: str):
+    if codec == "none":
+        return None
+    if codec == "zlib":
+        return zlib.decompressobj()
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown codec '{codec}'")
@@ -1,91 +1,430 @@
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session, scoped_session
 from sqlalchemy.pool import StaticPool
-from contextlib import contextmanager
-from typing import Iterator, Dict, Any
+from contextlib import contextmanager, asynccontextmanager
+from typing import Iterator, AsyncIterator, Dict, Any, Optional
 
 from bytegrader.config.config import BYTEGraderConfig
 from ..exceptions import DatabaseError
 from ..models import BaseModel
 
+# Sync driver -> async driver used when no explicit async URI is configured
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+# Replication lag in seconds as seen by the replica. Backends without an entry are only
+# checked for reachability.
+REPLICA_LAG_QUERIES = {
+    "postgresql": "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                  "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END",
+}
+
+# Set once a session of the current request (or task) has written. Its later read-only
+# sessions use the primary so they see their own writes instead of a lagging replica.
+_primary_pinned: ContextVar[bool] = ContextVar("bytegrader_primary_pinned", default=False)
+
+
+@event.listens_for(Session, "after_flush")
+def _flagged_flush(session, _flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flagged_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def _async_uri_for(uri: str) -> str:
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if url.drivername in ASYNC_DRIVERS.values() or backend not in ASYNC_DRIVERS:
+        return uri
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
 
 class DatabaseManager:
 
     def __init__(self, uri: str, config: 'BYTEGraderConfig' = None):
         self.uri: str = uri
         self.engine = None
+        self.read_engine = None
         self.SessionLocal = None
+        self.ReadSessionLocal = None
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        self.replica_engine = None
+        self.ReplicaSessionLocal = None
+        self.async_replica_engine = None
+        self.AsyncReplicaSessionLocal = None
+        self.replica_lag: Optional[float] = None
+        self._replica_checked_at: Optional[float] = None
+        self._replica_usable: Optional[bool] = None
+        # Held while a lag probe runs, so at most one is in flight
+        self._replica_probing = threading.Lock()
+        self.log = logging.getLogger(__name__)
 
         self.config: 'BYTEGraderConfig' = config
         if not uri:
             raise ValueError("Database URI must be provided.")
 
+    @property
+    def async_uri(self) -> str:
+        configured = None
+        if self.config and hasattr(self.config, 'database'):
+            configured = getattr(self.config.database, 'async_uri', None)
+        if configured:
+            return configured
+        return _async_uri_for(self.uri)
+
+    @property
+    def replica_uri(self) -> str:
+        return self._db_option('replica_uri', "") or ""
+
+    @property
+    def replica_async_uri(self) -> str:
+        if not self.replica_uri:
+            return ""
+        return self._db_option('replica_async_uri', "") or _async_uri_for(self.replica_uri)
+
+    def _db_option(self, name: str, default: Any) -> Any:
+        if self.config and hasattr(self.config, 'database'):
+            return getattr(self.config.database, name, default)
+        return default
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.uri).get_backend_name() == "sqlite"
+
+    @property
+    def is_sqlite_memory(self) -> bool:
+        url = make_url(self.uri)
+        return self.is_sqlite and url.database in (None, "", ":memory:")
+
+    def _engine_kwargs(self, pooled: bool = True) -> Dict[str, Any]:
+        engine_kwargs: Dict[str, Any] = {
+            "echo": self._db_option('echo', False),
+            "pool_pre_ping": True
+        }
+        if pooled:
+            engine_kwargs.update({
+                "pool_size": self._db_option('pool_size', 5),
+                "max_overflow": self._db_option('max_overflow', 10),
+                "pool_timeout": self._db_option('pool_timeout', 30.0),
+                "pool_recycle": self._db_option('pool_recycle', 1800),
+            })
+        return engine_kwargs
+
+    def _set_sqlite_pragmas(self, dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(self._db_option('sqlite_busy_timeout', 5000))}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @staticmethod
+    def _defer_sqlite_begin(dbapi_connection, _connection_record):
+        # pysqlite only opens a transaction before DML, so the SELECTs of a writer would run
+        # outside it. Transactions are begun explicitly instead (see _begin_immediate).
+        dbapi_connection.isolation_level = None
+
+    @staticmethod
+    def _begin_immediate(connection):
+        # Takes the write lock when the transaction begins: what a writer reads (e.g. that a blob
+        # exists) cannot be changed by another process before it commits
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _set_sqlite_async_pragmas(self, dbapi_connection, connection_record):
+        # Writes go through the single writer connection of the sync engine. The async pool is
+        # read-only, so a write through it fails instead of contending with that writer.
+        self._set_sqlite_pragmas(dbapi_connection, connection_record)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    def _instrument(self, engine):
+        try:
+            from bytegrader.core.observability import instrument_sqlalchemy
+
+            instrument_sqlalchemy(engine)
+        except Exception:
+            pass
+
     def _init_engine(self):
         try:
-            echo_flag = False
-            if self.config and hasattr(self.config, 'database'):
-                echo_flag = getattr(self.config.database, 'echo', False)
-            engine_kwargs: Dict[str, Any] = {
-                "echo": echo_flag,
-                "pool_pre_ping": True
-            }
-
-            if self.uri.startswith("sqlite://"):
-                engine_kwargs.update({
-                    'poolclass': StaticPool,
-                    'connect_args': {'check_same_thread': False},
-                })
-
-            self.engine = create_engine(self.uri, **engine_kwargs)
+            if self.is_sqlite_memory:
+                # An in-memory database only exists on its connection, so everything has to share it
+                self.engine = create_engine(self.uri, poolclass=StaticPool,
+                                            connect_args={'check_same_thread': False},
+                                            **self._engine_kwargs(pooled=False))
+                self.read_engine = self.engine
+            elif self.is_sqlite:
+                # SQLite allows a single writer at a time. Writes go through one dedicated connection,
+                # reads use a separate pool and run concurrently thanks to WAL.
+                writer_kwargs = self._engine_kwargs()
+                writer_kwargs.update({"pool_size": 1, "max_overflow": 0})
+                self.engine = create_engine(self.uri, connect_args={'check_same_thread': False}, **writer_kwargs)
+                self.read_engine = create_engine(self.uri, connect_args={'check_same_thread': False},
+                                                 **self._engine_kwargs())
+                for engine in (self.engine, self.read_engine):
+                    event.listen(engine, "connect", self._set_sqlite_pragmas)
+                event.listen(self.engine, "connect", self._defer_sqlite_begin)
+                event.listen(self.engine, "begin", self._begin_immediate)
+            else:
+                self.engine = create_engine(self.uri, **self._engine_kwargs())
+                self.read_engine = self.engine
+
             self.SessionLocal = sessionmaker(
                 autocommit=False,
                 autoflush=False,
                 expire_on_commit=False,
                 bind=self.engine
             )
+            self.ReadSessionLocal = sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                expire_on_commit=False,
+                bind=self.read_engine
+            )
             self.Session = scoped_session(self.SessionLocal)
 
-            try:
-                from bytegrader.core.observability import instrument_sqlalchemy
+            self._instrument(self.engine)
+            if self.read_engine is not self.engine:
+                self._instrument(self.read_engine)
 
-                instrument_sqlalchemy(self.engine)
-            except Exception:
-                pass
+            if self.replica_uri:
+                self.replica_engine = self._create_replica_engine(self.replica_uri, create_engine)
+                self.ReplicaSessionLocal = sessionmaker(
+                    autocommit=False,
+                    autoflush=False,
+                    expire_on_commit=False,
+                    bind=self.replica_engine
+                )
+                self._instrument(self.replica_engine)
 
         except Exception as e:
             raise DatabaseError(f"Failed to initialize database engine: {e}") from e
 
+    def _init_async_engine(self):
+        if self.is_sqlite_memory:
+            # The async driver would open a second, empty in-memory database of its own
+            raise DatabaseError("An in-memory SQLite database cannot be used with the async engine, "
+                                "use a database file instead.")
+        try:
+            self.async_engine = create_async_engine(self.async_uri, **self._engine_kwargs())
+            if self.is_sqlite:
+                event.listen(self.async_engine.sync_engine, "connect", self._set_sqlite_async_pragmas)
+
+            self.AsyncSessionLocal = async_sessionmaker(
+                autoflush=False,
+                expire_on_commit=False,
+                bind=self.async_engine,
+                class_=AsyncSession,
+            )
+
+            self._instrument(self.async_engine.sync_engine)
+
+            if self.replica_async_uri:
+                self.async_replica_engine = self._create_replica_engine(self.replica_async_uri, create_async_engine)
+                self.AsyncReplicaSessionLocal = async_sessionmaker(
+                    autoflush=False,
+                    expire_on_commit=False,
+                    bind=self.async_replica_engine,
+                    class_=AsyncSession,
+                )
+                self._instrument(self.async_replica_engine.sync_engine)
+
+        except Exception as e:
+            raise DatabaseError(f"Failed to initialize async database engine: {e}") from e
+
+    def _create_replica_engine(self, uri: str, factory):
+        kwargs = self._engine_kwargs()
+        if make_url(uri).get_backend_name() == "sqlite":
+            if factory is create_engine:
+                kwargs["connect_args"] = {'check_same_thread': False}
+            engine = factory(uri, **kwargs)
+            event.listen(getattr(engine, "sync_engine", engine), "connect", self._set_sqlite_pragmas)
+            return engine
+        return factory(uri, **kwargs)
+
+    @staticmethod
+    def reset_primary_pin():
+        _primary_pinned.set(False)
+
+    @staticmethod
+    def pin_primary():
+        _primary_pinned.set(True)
+
+    def _replica_check_due(self) -> bool:
+        interval = self._db_option('replica_check_interval', 5.0)
+        return self._replica_checked_at is None or time.monotonic() - self._replica_checked_at >= interval
+
+    def _record_replica_lag(self, lag: Optional[float]):
+        max_lag = self._db_option('replica_max_lag', 5.0)
+        usable = lag is not None and lag <= max_lag
+        if usable != self._replica_usable:
+            if usable:
+                self.log.info(f"Routing reads to the replica (lag {lag:.1f}s)")
+            elif lag is None:
+                self.log.warning("Replica unreachable, routing reads to the primary")
+            else:
+                self.log.warning(f"Replica lag {lag:.1f}s exceeds {max_lag}s, routing reads to the primary")
+        self.replica_lag = lag
+        self._replica_usable = usable
+        self._replica_checked_at = time.monotonic()
+
+    def _replica_lag_query(self):
+        backend = make_url(self.replica_uri).get_backend_name()
+        return text(REPLICA_LAG_QUERIES.get(backend, "SELECT 0"))
+
+    def _probe_replica(self):
+        try:
+            try:
+                with self.replica_engine.connect() as conn:
+                    lag = float(conn.execute(self._replica_lag_query()).scalar() or 0.0)
+            except Exception as e:
+                self.log.debug(f"Replica lag check failed: {e}")
+                lag = None
+            self._record_replica_lag(lag)
+        finally:
+            self._replica_probing.release()
+
+    def _use_replica(self) -> bool:
+        if self.ReplicaSessionLocal is None or _primary_pinned.get():
+            return False
+        if self._replica_check_due() and self._replica_probing.acquire(blocking=False):
+            # Sync sessions are opened on the event loop too, where a slow or unreachable replica
+            # would stall every request. The lag is probed in the background and the last result
+            # is used meanwhile; until the first probe finishes, reads go to the primary.
+            threading.Thread(target=self._probe_replica, name="bytegrader-replica-probe", daemon=True).start()
+        return bool(self._replica_usable)
+
+    async def _use_replica_async(self) -> bool:
+        if self.AsyncReplicaSessionLocal is None or _primary_pinned.get():
+            return False
+        if self._replica_check_due() and self._replica_probing.acquire(blocking=False):
+            try:
+                try:
+                    async with self.async_replica_engine.connect() as conn:
+                        lag = float((await conn.execute(self._replica_lag_query())).scalar() or 0.0)
+                except Exception as e:
+                    self.log.debug(f"Replica lag check failed: {e}")
+                    lag = None
+                self._record_replica_lag(lag)
+            finally:
+                self._replica_probing.release()
+        return bool(self._replica_usable)
+
     def create_tables(self):
         if not self.engine:
             self._init_engine()
 
         try:
+            from .migrations import stamp_database
+
+            # Tables created from the models are already at the latest revision
             BaseModel.metadata.create_all(bind=self.engine)
+            stamp_database(self)
         except Exception as e:
             raise DatabaseError(f"Failed to create tables: {e}") from e
 
     @contextmanager
-    def get_session(self) -> Iterator[Session]:
+    def get_session(self, readonly: bool = False) -> Iterator[Session]:
         if not self.engine:
             self._init_engine()
 
-        session: Session = self.SessionLocal()
+        if readonly:
+            session: Session = self.ReplicaSessionLocal() if self._use_replica() else self.ReadSessionLocal()
+        else:
+            session: Session = self.SessionLocal()
         try:
             yield session
             session.commit()
+            if session.info.get("wrote"):
+                _primary_pinned.set(True)
         except Exception as e:
             session.rollback()
             raise DatabaseError(f"Database operation failed: {e}") from e
         finally:
             session.close()
 
+    @asynccontextmanager
+    async def get_async_session(self, readonly: bool = False) -> AsyncIterator[AsyncSession]:
+        if not self.async_engine:
+            self._init_async_engine()
+
+        if readonly and await self._use_replica_async():
+            session: AsyncSession = self.AsyncReplicaSessionLocal()
+        else:
+            session: AsyncSession = self.AsyncSessionLocal()
+        try:
+            yield session
+            await session.commit()
+            if session.info.get("wrote"):
+                _primary_pinned.set(True)
+        except Exception as e:
+            await session.rollback()
+            raise DatabaseError(f"Database operation failed: {e}") from e
+        finally:
+            await session.close()
+
     def close(self):
+        if not self.engine and not self.async_engine:
+            raise DatabaseError("Database engine is not initialized or already closed.")
+
         if self.engine:
+            if self.read_engine is not self.engine:
+                self.read_engine.dispose()
+            if self.replica_engine:
+                self.replica_engine.dispose()
             self.engine.dispose()
             self.engine = None
+            self.read_engine = None
+            self.replica_engine = None
             self.SessionLocal = None
-        else:
-            raise DatabaseError("Database engine is not initialized or already closed.")
+            self.ReadSessionLocal = None
+            self.ReplicaSessionLocal = None
+        if self.async_engine:
+            # Async drivers (aiosqlite) keep a worker thread per connection alive until it is closed
+            for engine in (self.async_engine, self.async_replica_engine):
+                if engine is None:
+                    continue
+                try:
+                    loop = asyncio.get_event_loop()
+                    if loop.is_running():
+                        loop.create_task(engine.dispose())
+                    else:
+                        loop.run_until_complete(engine.dispose())
+                except RuntimeError:
+                    engine.sync_engine.dispose(close=False)
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+            self.async_replica_engine = None
+            self.AsyncReplicaSessionLocal = None
+
+    async def close_async(self):
+        if self.async_engine:
+            await self.async_engine.dispose()
+            if self.async_replica_engine:
+                await self.async_replica_engine.dispose()
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+            self.async_replica_engine = None
+            self.AsyncReplicaSessionLocal = None
+        if self.engine:
+            self.close()
 
     def remove_session(self):
         try:
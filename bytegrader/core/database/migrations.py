@@ -1 +1,94 @@
-# TODO: Implement database migrations with alembic
\ No newline at end of file
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from ..exceptions import DatabaseError
+
+SCRIPT_LOCATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+
+# Schema as created by create_tables() before migrations existed. Databases without
+# an alembic_version table are stamped with it before upgrading.
+BASELINE_REVISION = "0001"
+
+
+def get_alembic_config(db_mgr, connection=None) -> Config:
+    config = Config()
+    config.set_main_option("script_location", SCRIPT_LOCATION)
+    config.set_main_option("sqlalchemy.url", db_mgr.uri.replace("%", "%%"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def head_revision(db_mgr) -> str:
+    return ScriptDirectory.from_config(get_alembic_config(db_mgr)).get_current_head()
+
+
+def current_revision(db_mgr) -> Optional[str]:
+    if not db_mgr.engine:
+        db_mgr._init_engine()
+
+    with db_mgr.engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def is_up_to_date(db_mgr) -> bool:
+    return current_revision(db_mgr) == head_revision(db_mgr)
+
+
+def _set_foreign_keys(connection, enabled: bool):
+    # Through the DBAPI connection: SQLAlchemy would begin a transaction first, and SQLite
+    # ignores the pragma inside one
+    cursor = connection.connection.cursor()
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if enabled else 'OFF'}")
+    cursor.close()
+
+
+@contextmanager
+def _migration_connection(db_mgr):
+    # Batch migrations recreate SQLite tables. Foreign keys are not enforced meanwhile, or
+    # dropping the old table would fail for rows other tables reference.
+    if not db_mgr.engine:
+        db_mgr._init_engine()
+
+    with db_mgr.engine.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            _set_foreign_keys(connection, False)
+        try:
+            with connection.begin():
+                yield connection
+        finally:
+            if sqlite:
+                _set_foreign_keys(connection, True)
+
+
+def upgrade_database(db_mgr, revision: str = "head"):
+    try:
+        with _migration_connection(db_mgr) as connection:
+            config = get_alembic_config(db_mgr, connection)
+            tables = inspect(connection).get_table_names()
+            if "alembic_version" not in tables and "courses" in tables:
+                command.stamp(config, BASELINE_REVISION)
+            command.upgrade(config, revision)
+    except Exception as e:
+        raise DatabaseError(f"Failed to upgrade database: {e}") from e
+
+
+def stamp_database(db_mgr, revision: str = "head"):
+    with _migration_connection(db_mgr) as connection:
+        command.stamp(get_alembic_config(db_mgr, connection), revision)
+
+
+def downgrade_database(db_mgr, revision: str):
+    try:
+        with _migration_connection(db_mgr) as connection:
+            command.downgrade(get_alembic_config(db_mgr, connection), revision)
+    except Exception as e:
+        raise DatabaseError(f"Failed to downgrade database: {e}") from e
@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.rate_limit import RateLimit
+from ..utils import utc_now
+from ..utils.datetime import ensure_aware
+
+# Token buckets live in the rate_limits table so that every service process sees the same
+# state. A bucket is updated with a compare-and-set on updated_at: of two processes that read
+# the same row, only the first write matches and the other one re-reads and tries again. A
+# missing row is a full bucket.
+
+MAX_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class Bucket:
+    # Holds up to `capacity` tokens and refills `capacity` tokens evenly over `period` seconds.
+    # A capacity or period of 0 disables the bucket.
+    key: str
+    capacity: int
+    period: float
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.period > 0
+
+    def refill(self, tokens: float, elapsed: float) -> float:
+        return min(float(self.capacity), tokens + max(elapsed, 0.0) * self.capacity / self.period)
+
+    def wait(self, tokens: float) -> float:
+        # Seconds until the bucket holds a whole token
+        return max(1.0 - tokens, 0.0) * self.period / self.capacity
+
+
+def take_tokens(session: Session, buckets: Iterable[Bucket]) -> float:
+    # Takes one token from every bucket, or from none of them if one is empty. Returns 0 on
+    # success, otherwise the seconds until all buckets hold a token again. Rolls the session
+    # back when it loses a race, so it is meant to run in a session of its own.
+    buckets = [bucket for bucket in buckets if bucket.enabled]
+    if not buckets:
+        return 0.0
+
+    for _ in range(MAX_ATTEMPTS):
+        now = utc_now()
+        rows = {
+            row.key: row
+            for row in session.execute(
+                select(RateLimit.key, RateLimit.tokens, RateLimit.updated_at)
+                .where(RateLimit.key.in_([bucket.key for bucket in buckets]))
+            )
+        }
+
+        levels = []
+        for bucket in buckets:
+            row = rows.get(bucket.key)
+            if row is None:
+                tokens = float(bucket.capacity)
+            else:
+                tokens = bucket.refill(row.tokens, (now - ensure_aware(row.updated_at)).total_seconds())
+            levels.append((bucket, row, tokens))
+
+        retry_after = max((bucket.wait(tokens) for bucket, _, tokens in levels if tokens < 1.0), default=0.0)
+        if retry_after > 0:
+            return retry_after
+
+        try:
+            for bucket, row, tokens in levels:
+                if row is None:
+                    session.execute(insert(RateLimit).values(key=bucket.key, tokens=tokens - 1.0, updated_at=now))
+                    continue
+                result = session.execute(
+                    update(RateLimit)
+                    .where(RateLimit.key == bucket.key, RateLimit.updated_at == row.updated_at)
+                    .values(tokens=tokens - 1.0, updated_at=now),
+                    execution_options={"synchronize_session": False},
+                )
+                if result.rowcount != 1:
+                    break
+            else:
+                return 0.0
+        except IntegrityError:
+            # Another process created the row in the meantime
+            pass
+        session.rollback()
+
+    raise RuntimeError(f"Could not update rate limits {[bucket.key for bucket in buckets]}, too much contention")
+
+
+def refund_tokens(session: Session, buckets: Iterable[Bucket]) -> None:
+    # Gives back the tokens taken by take_tokens for a request that was not carried out
+    for bucket in buckets:
+        if not bucket.enabled:
+            continue
+        session.execute(
+            update(RateLimit)
+            .where(RateLimit.key == bucket.key)
+            .values(tokens=case((RateLimit.tokens + 1.0 > bucket.capacity, float(bucket.capacity)),
+                                else_=RateLimit.tokens + 1.0)),
+            execution_options={"synchronize_session": False},
+        )
@@ -0,0 +1,90 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, exists, func, case, or_
+from sqlalchemy.orm import Session
+
+from ..models import Assignment, Notebook, Cell, Submission, NotebookSubmission, Grade
+
+# Aggregates stored on submissions, notebook_submissions, notebooks and assignments. They are
+# recomputed set-based inside the transaction that writes grades or cells, so readers only
+# need the scalar columns instead of loading the grade/cell trees.
+
+
+def _grade_sum(score, *criteria):
+    return select(func.coalesce(func.sum(score + func.coalesce(Grade.extra_credit, 0.0)), 0.0)) \
+        .where(Grade.notebook_submission_id == NotebookSubmission.id, *criteria) \
+        .scalar_subquery()
+
+
+def refresh_submission_scores(session: Session, submission_ids: Optional[Iterable[str]] = None):
+    ids = list(submission_ids) if submission_ids is not None else None
+    if ids is not None and not ids:
+        return
+
+    final_score = case(
+        (Grade.manual_score.isnot(None), Grade.manual_score),
+        else_=func.coalesce(Grade.auto_score, 0.0)
+    )
+
+    nb_stmt = update(NotebookSubmission).values(
+        total_score=_grade_sum(final_score),
+        auto_score=_grade_sum(Grade.auto_score, Grade.auto_score.isnot(None)),
+        manual_score=_grade_sum(Grade.manual_score, Grade.manual_score.isnot(None)),
+        # Without any grades the notebook has not been graded yet
+        needs_manual_grading=or_(
+            ~exists().where(Grade.notebook_submission_id == NotebookSubmission.id),
+            exists().where(
+                Grade.notebook_submission_id == NotebookSubmission.id,
+                Grade.needs_manual_grading == True
+            )
+        ),
+    )
+    if ids is not None:
+        nb_stmt = nb_stmt.where(NotebookSubmission.submission_id.in_(ids))
+    session.execute(nb_stmt, execution_options={"synchronize_session": "fetch"})
+
+    def nb_sum(column):
+        return select(func.coalesce(func.sum(column), 0.0)) \
+            .where(NotebookSubmission.submission_id == Submission.id) \
+            .scalar_subquery()
+
+    sub_stmt = update(Submission).values(
+        total_score=nb_sum(NotebookSubmission.total_score),
+        auto_score=nb_sum(NotebookSubmission.auto_score),
+        manual_score=nb_sum(NotebookSubmission.manual_score),
+        needs_manual_grading=or_(
+            ~exists().where(NotebookSubmission.submission_id == Submission.id),
+            exists().where(
+                NotebookSubmission.submission_id == Submission.id,
+                Grade.notebook_submission_id == NotebookSubmission.id,
+                Grade.needs_manual_grading == True
+            )
+        ),
+    )
+    if ids is not None:
+        sub_stmt = sub_stmt.where(Submission.id.in_(ids))
+    session.execute(sub_stmt, execution_options={"synchronize_session": "fetch"})
+
+
+def refresh_max_scores(session: Session, assignment_ids: Optional[Iterable[str]] = None):
+    ids = list(assignment_ids) if assignment_ids is not None else None
+    if ids is not None and not ids:
+        return
+
+    nb_stmt = update(Notebook).values(
+        max_score=select(func.coalesce(func.sum(Cell.max_score), 0.0))
+        .where(Cell.notebook_id == Notebook.id)
+        .scalar_subquery()
+    )
+    if ids is not None:
+        nb_stmt = nb_stmt.where(Notebook.assignment_id.in_(ids))
+    session.execute(nb_stmt, execution_options={"synchronize_session": "fetch"})
+
+    assignment_stmt = update(Assignment).values(
+        max_score=select(func.coalesce(func.sum(Notebook.max_score), 0.0))
+        .where(Notebook.assignment_id == Assignment.id)
+        .scalar_subquery()
+    )
+    if ids is not None:
+        assignment_stmt = assignment_stmt.where(Assignment.id.in_(ids))
+    session.execute(assignment_stmt, execution_options={"synchronize_session": "fetch"})
@@ -0,0 +1,6 @@
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after  # Seconds until the request would be accepted
@@ -0,0 +1,11 @@
+class UploadError(Exception):
+    status_code = 400
+
+
+class UploadTooLargeError(UploadError):
+    status_code = 413
+
+
+class UnknownSourceError(UploadError):
+    # A compact submission referenced a cell source by a hash the server does not hold
+    status_code = 409
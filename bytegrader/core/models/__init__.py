@@ -2,12 +2,15 @@ from .base import Base as BaseModel
 from .course import Course, Assignment
 from .grade import Grade, Comment
 from .notebook import Notebook, Cell
-from .submission import Submission, NotebookSubmission, CellSubmission
+from .submission import Submission, NotebookSubmission, CellSubmission, ArchivedSubmission
 from .user import User, Enrollment
 from .asset import AssignmentAsset
+from .blob import Blob
+from .rate_limit import RateLimit
+from .grading_job import GradingJob
 
 __all__ = [
     "BaseModel", "Course", "Assignment", "Grade", "Comment", "Notebook", "Cell",
-    "Submission", "NotebookSubmission", "CellSubmission", "User", "Enrollment",
-    "AssignmentAsset"
+    "Submission", "NotebookSubmission", "CellSubmission", "ArchivedSubmission", "User", "Enrollment",
+    "AssignmentAsset", "Blob", "RateLimit", "GradingJob"
 ]
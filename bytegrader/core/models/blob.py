@@ -0,0 +1,44 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary
+
+from .base import Base
+from ..utils import utc_now
+
+
+class Blob(Base):
+    # Content-addressed text shared by cells and cell submissions, see core.database.blobs
+    __tablename__ = "blobs"
+
+    hash = Column(String(64), primary_key=True)  # sha256 of the UTF-8 text
+    codec = Column(String(16), nullable=False)
+    size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=utc_now, nullable=False)
+
+    def __repr__(self):
+        return f"Blob(hash='{self.hash}', size={self.size})"
+
+
+class BlobText:
+    # Read-only text of the blob referenced by a hash column. Texts are attached in bulk by
+    # core.database.blobs.load_texts; anything else is resolved through the shared LRU.
+
+    def __init__(self, hash_attr: str):
+        self.hash_attr = hash_attr
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        digest = getattr(obj, self.hash_attr)
+        if digest is None:
+            return None
+        text = obj.__dict__.get("_blob_texts", {}).get(digest)
+        if text is None:
+            from ..database.blobs import resolve_text
+            text = resolve_text(obj, digest)
+        return text
+
+    def __set__(self, obj, value):
+        raise AttributeError(f"{self.name} is read-only, write {self.hash_attr} through core.database.blobs")
@@ -1,12 +1,11 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, String, Integer, Enum, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, func
+from sqlalchemy import Column, String, Integer, Enum, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, Float, func
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
 from .base import Base, new_uuid
 from .enum import ShowSolutionsOption
-from .notebook import Notebook
 from ..utils import utc_now
 
 
@@ -44,6 +43,10 @@ class Assignment(Base):
         nullable=False
     )
     visible = Column(Boolean, default=True, nullable=False)
+    # Seconds a student waits between submissions; NULL uses AutogradeConfig.cooldown_period
+    submission_cooldown = Column(Integer, nullable=True)
+    # Sum of the notebooks' max_score, maintained by core.database.scores
+    max_score = Column(Float, default=0.0, nullable=False)
     created_at = Column(DateTime, default=utc_now, nullable=False)
 
     course = relationship("Course", back_populates="assignments")
@@ -54,6 +57,11 @@ class Assignment(Base):
         back_populates="assignment",
         cascade="all, delete-orphan"
     )
+    archived_submissions = relationship(
+        "ArchivedSubmission",
+        back_populates="assignment",
+        cascade="all, delete-orphan"
+    )
     assets = relationship(
         'AssignmentAsset',
         back_populates='assignment',
@@ -64,19 +72,6 @@ class Assignment(Base):
         UniqueConstraint('course_id', 'name'),
     )
 
-    @hybrid_property
-    def max_score(self):
-        if not self.notebooks:
-            return 0.0
-        return sum(notebook.max_score for notebook in self.notebooks)
-
-    @max_score.expression
-    def max_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(Notebook.max_score), 0.0)) \
-            .where(Notebook.assignment_id == cls.id) \
-            .scalar_subquery()
-
     def __repr__(self):
         return f"Assignment(id='{self.id}', name='{self.name}')"
 
@@ -22,4 +22,10 @@ class ShowSolutionsOption(enum.Enum):
 class SubmissionStatus(enum.Enum):
     SUBMITTED = "submitted"
     GRADED = "graded"
-    ARCHIVED = "archived"
\ No newline at end of file
+    ARCHIVED = "archived"
+
+class GradingJobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index, Enum
+
+from .base import Base, new_uuid
+from .enum import GradingJobStatus
+from ..utils import utc_now
+
+
+class GradingJob(Base):
+    # Autograding queue shared by the HTTP processes and `bytegrader grader`, see
+    # autograde.queue.DatabaseJobQueue. No foreign keys: archiving or deleting a submission must not
+    # wait for its job, a job whose submission is gone simply fails.
+    __tablename__ = "grading_jobs"
+
+    id = Column(String(32), primary_key=True, default=new_uuid)
+    submission_id = Column(String(32), nullable=False)
+    assignment_id = Column(String(32), nullable=False)
+    priority = Column(Integer, nullable=False)  # autograde.worker.JobPriority, lower goes first
+    # Set on the jobs of one regrade run; their counts are the run's progress
+    batch_id = Column(String(32), nullable=True)
+    status = Column(Enum(GradingJobStatus), default=GradingJobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    claimed_by = Column(String(128), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utc_now, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_grading_jobs_status_priority', 'status', 'priority', 'created_at'),
+        Index('ix_grading_jobs_assignment_batch', 'assignment_id', 'batch_id'),
+    )
+
+    def __repr__(self):
+        return f"GradingJob(id='{self.id}', submission_id='{self.submission_id}', status={self.status.name})"
@@ -6,6 +6,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship, validates
 
 from .base import Base, new_uuid
+from .blob import BlobText
 from .enum import CellType
 from ..utils import utc_now
 
@@ -18,6 +19,8 @@ class Notebook(Base):
     name = Column(String(256), nullable=False)
     idx = Column(Integer, nullable=False)  # Order within assignment
     kernelspec = Column(Text)
+    # Sum of the cells' max_score, maintained by core.database.scores
+    max_score = Column(Float, default=0.0, nullable=False)
     created_at = Column(DateTime, default=utc_now, nullable=False)
 
     assignment = relationship("Assignment", back_populates="notebooks")
@@ -35,19 +38,6 @@ class Notebook(Base):
         CheckConstraint('idx >= 0', name='positive_idx'),
     )
 
-    @hybrid_property
-    def max_score(self):
-        if not self.cells:
-            return 0.0
-        return sum(cell.max_score for cell in self.cells)
-
-    @max_score.expression
-    def max_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(Cell.max_score), 0.0)) \
-            .where(Cell.notebook_id == cls.id) \
-            .scalar_subquery()
-
     def __repr__(self):
         return f"Notebook(id='{self.id}', name='{self.name}')"
 
@@ -61,8 +51,9 @@ class Cell(Base):
     idx = Column(Integer, nullable=False)  # Order within notebook
     cell_type = Column(Enum(CellType), nullable=False)
 
-    source = Column(Text)
-    source_student = Column(Text)
+    # Sources are stored in the blob table, see core.database.blobs
+    source_hash = Column(String(64), ForeignKey('blobs.hash'), index=True)
+    source_student_hash = Column(String(64), ForeignKey('blobs.hash'), index=True)
     meta = Column(Text)
 
     max_score = Column(Float, default=0.0, nullable=False)
@@ -74,6 +65,9 @@ class Cell(Base):
 
     created_at = Column(DateTime, default=utc_now, nullable=False)
 
+    source = BlobText("source_hash")
+    source_student = BlobText("source_student_hash")
+
     notebook = relationship("Notebook", back_populates="cells")
     grades = relationship("Grade", back_populates="cell")
     comments = relationship("Comment", back_populates="cell")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Float, DateTime
+
+from .base import Base
+from ..utils import utc_now
+
+
+class RateLimit(Base):
+    # Token bucket state shared by all service processes, see core.database.rate_limit
+    __tablename__ = "rate_limits"
+
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=utc_now, nullable=False)  # Time the tokens were counted
+
+    def __repr__(self):
+        return f"RateLimit(key='{self.key}', tokens={self.tokens})"
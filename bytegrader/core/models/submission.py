@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, UniqueConstraint, func, \
-    CheckConstraint, case, and_, Enum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, UniqueConstraint, \
+    CheckConstraint, Index, Enum, Float, Boolean, LargeBinary
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
-from . import Grade
 from .base import Base, new_uuid
+from .blob import BlobText
 from .enum import SubmissionStatus
 from ..utils import utc_now
 
@@ -25,6 +25,12 @@ class Submission(Base):
     graded_at = Column(DateTime)
     graded_by = Column(String(128))
 
+    # Maintained by core.database.scores whenever grades are written
+    total_score = Column(Float, default=0.0, nullable=False)
+    auto_score = Column(Float, default=0.0, nullable=False)
+    manual_score = Column(Float, default=0.0, nullable=False)
+    needs_manual_grading = Column(Boolean, default=True, nullable=False)
+
     created_at = Column(DateTime, default=utc_now, nullable=False)
     updated_at = Column(DateTime, default=utc_now, onupdate=utc_now, nullable=False)
 
@@ -35,6 +41,7 @@ class Submission(Base):
 
     __table_args__ = (
         CheckConstraint('extension_days >= 0', name='positive_extension'),
+        Index('ix_submissions_user_assignment_status', 'user_id', 'assignment_id', 'status'),
     )
 
     @hybrid_property
@@ -74,110 +81,6 @@ class Submission(Base):
         delta = submitted - due
         return max(0, delta.days)
 
-    @hybrid_property
-    def total_score(self):
-        if not self.notebook_submissions:
-            return 0.0
-        total = 0.0
-        for nb_sub in self.notebook_submissions:
-            for grade in nb_sub.grades:
-                total += grade.final_score
-        return total
-
-    @total_score.expression
-    def total_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            case(
-                (Grade.manual_score.isnot(None), Grade.manual_score),
-                else_=func.coalesce(Grade.auto_score, 0.0)
-            ) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .select_from(
-            NotebookSubmission.__table__.join(Grade.__table__)
-        ) \
-            .where(NotebookSubmission.submission_id == cls.id) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def auto_score(self):
-        if not self.notebook_submissions:
-            return 0.0
-        total = 0.0
-        for nb_sub in self.notebook_submissions:
-            for grade in nb_sub.grades:
-                if grade.auto_score is not None:
-                    total += grade.auto_score + (grade.extra_credit or 0.0)
-        return total
-
-    @auto_score.expression
-    def auto_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            func.coalesce(Grade.auto_score, 0.0) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .select_from(
-            NotebookSubmission.__table__.join(Grade.__table__)
-        ) \
-            .where(
-            and_(
-                NotebookSubmission.submission_id == cls.id,
-                Grade.auto_score.isnot(None)
-            )
-        ) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def manual_score(self):
-        if not self.notebook_submissions:
-            return 0.0
-        total = 0.0
-        for nb_sub in self.notebook_submissions:
-            for grade in nb_sub.grades:
-                if grade.manual_score is not None:
-                    total += grade.manual_score + (grade.extra_credit or 0.0)
-        return total
-
-    @manual_score.expression
-    def manual_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            func.coalesce(Grade.manual_score, 0.0) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .select_from(
-            NotebookSubmission.__table__.join(Grade.__table__)
-        ) \
-            .where(
-            and_(
-                NotebookSubmission.submission_id == cls.id,
-                Grade.manual_score.isnot(None)
-            )
-        ) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def needs_manual_grading(self):
-        if not self.notebook_submissions:
-            return True
-        for nb_sub in self.notebook_submissions:
-            for grade in nb_sub.grades:
-                if grade.needs_manual_grading:
-                    return True
-        return False
-
-    @needs_manual_grading.expression
-    def needs_manual_grading(cls):
-        from sqlalchemy import select, exists
-        return select(
-            exists().where(
-                and_(
-                    NotebookSubmission.submission_id == cls.id,
-                    Grade.notebook_submission_id == NotebookSubmission.id,
-                    Grade.needs_manual_grading == True
-                )
-            )
-        ).scalar_subquery()
-
     def __repr__(self):
         return f"Submission(id='{self.id}', user='{self.user_id}', assignment='{self.assignment.name}')"
 
@@ -189,6 +92,12 @@ class NotebookSubmission(Base):
     submission_id = Column(String(32), ForeignKey('submissions.id'), nullable=False)
     notebook_id = Column(String(32), ForeignKey('notebooks.id'), nullable=False)
 
+    # Maintained by core.database.scores whenever grades are written
+    total_score = Column(Float, default=0.0, nullable=False)
+    auto_score = Column(Float, default=0.0, nullable=False)
+    manual_score = Column(Float, default=0.0, nullable=False)
+    needs_manual_grading = Column(Boolean, default=True, nullable=False)
+
     created_at = Column(DateTime, default=utc_now, nullable=False)
     updated_at = Column(DateTime, default=utc_now, onupdate=utc_now, nullable=False)
 
@@ -203,90 +112,6 @@ class NotebookSubmission(Base):
         UniqueConstraint('submission_id', 'notebook_id'),
     )
 
-    @hybrid_property
-    def total_score(self):
-        if not self.grades:
-            return 0.0
-        return sum(grade.final_score for grade in self.grades)
-
-    @total_score.expression
-    def total_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            case(
-                (Grade.manual_score.isnot(None), Grade.manual_score),
-                else_=func.coalesce(Grade.auto_score, 0.0)
-            ) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .where(Grade.notebook_submission_id == cls.id) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def auto_score(self):
-        if not self.grades:
-            return 0.0
-        return sum(
-            (grade.auto_score or 0.0) + (grade.extra_credit or 0.0)
-            for grade in self.grades
-            if grade.auto_score is not None
-        )
-
-    @auto_score.expression
-    def auto_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            func.coalesce(Grade.auto_score, 0.0) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .where(
-            and_(
-                Grade.notebook_submission_id == cls.id,
-                Grade.auto_score.isnot(None)
-            )
-        ) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def manual_score(self):
-        if not self.grades:
-            return 0.0
-        return sum(
-            (grade.manual_score or 0.0) + (grade.extra_credit or 0.0)
-            for grade in self.grades
-            if grade.manual_score is not None
-        )
-
-    @manual_score.expression
-    def manual_score(cls):
-        from sqlalchemy import select
-        return select(func.coalesce(func.sum(
-            func.coalesce(Grade.manual_score, 0.0) + func.coalesce(Grade.extra_credit, 0.0)
-        ), 0.0)) \
-            .where(
-            and_(
-                Grade.notebook_submission_id == cls.id,
-                Grade.manual_score.isnot(None)
-            )
-        ) \
-            .scalar_subquery()
-
-    @hybrid_property
-    def needs_manual_grading(self):
-        if not self.grades:
-            return True
-        return any(grade.needs_manual_grading for grade in self.grades)
-
-    @needs_manual_grading.expression
-    def needs_manual_grading(cls):
-        from sqlalchemy import select, exists
-        return select(
-            exists().where(
-                and_(
-                    Grade.notebook_submission_id == cls.id,
-                    Grade.needs_manual_grading == True
-                )
-            )
-        ).scalar_subquery()
-
     def __repr__(self):
         return f"NotebookSubmission(id='{self.id}', notebook='{self.notebook.name}')"
 
@@ -298,13 +123,39 @@ class CellSubmission(Base):
     notebook_submission_id = Column(String(32), ForeignKey('notebook_submissions.id'), nullable=False)
     cell_id = Column(String(128), ForeignKey('cells.id'), nullable=False)
 
-    submitted_source = Column(Text)
+    submitted_source_hash = Column(String(64), ForeignKey('blobs.hash'), index=True)
 
     created_at = Column(DateTime, default=utc_now, nullable=False)
 
+    submitted_source = BlobText("submitted_source_hash")
+
     notebook_submission = relationship("NotebookSubmission", back_populates="cell_submissions")
     cell = relationship("Cell")
 
     __table_args__ = (
         UniqueConstraint('notebook_submission_id', 'cell_id'),
-    )
\ No newline at end of file
+    )
+
+
+class ArchivedSubmission(Base):
+    # Cold storage for archived submissions: the whole tree (submission, notebook and cell
+    # submissions, grades, comments) as one compressed JSON document, see core.database.archive
+    __tablename__ = "archived_submissions"
+
+    id = Column(String(32), primary_key=True)
+    assignment_id = Column(String(32), ForeignKey('assignments.id'), nullable=False)
+    user_id = Column(String(128), ForeignKey('users.id'), nullable=False)
+    submitted_at = Column(DateTime)
+
+    codec = Column(String(16), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=utc_now, nullable=False)
+
+    assignment = relationship("Assignment", back_populates="archived_submissions")
+
+    __table_args__ = (
+        Index('ix_archived_submissions_assignment_user', 'assignment_id', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f"ArchivedSubmission(id='{self.id}', user='{self.user_id}', assignment='{self.assignment_id}')"
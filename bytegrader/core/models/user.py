@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, String, Integer, Enum, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, func
+from sqlalchemy import Column, String, Integer, Enum, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, Index, func
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 
@@ -16,7 +16,7 @@ class User(Base):
     first_name = Column(String(128))
     last_name = Column(String(128))
     email = Column(String(256)) # * Won't be passed via LTI since the LTI-Authenticator for JupyterHub wants to use the email as the username for some reason which won't work with systemd.
-    lms_user_id = Column(String(128))
+    lms_user_id = Column(String(128), index=True)
     active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=utc_now, nullable=False)
 
@@ -35,7 +35,10 @@ class User(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
-    __table_args__ = (UniqueConstraint('user_id', 'course_id'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'course_id'),
+        Index('ix_enrollments_course_role_active', 'course_id', 'role', 'active'),
+    )
 
     id = Column(String(32), primary_key=True, default=new_uuid)
     user_id = Column(String(128), ForeignKey('users.id'), nullable=False)
@@ -10,6 +10,7 @@ from bytegrader.core.observability.sentry import (
 
 from bytegrader.core.observability.opentelemetry import (
 	init_otel as otel_init,
+	add_counter as otel_add_counter,
 	record_exception as otel_record_exception,
 	record_event as otel_record_event,
 	instrument_sqlalchemy as otel_instrument_sqlalchemy,
@@ -19,6 +20,7 @@ from bytegrader.core.observability.opentelemetry import (
 )
 
 __all__ = [
+	"add_counter",
 	"init_observability",
 	"init_sentry",
 	"init_otel",
@@ -89,6 +91,10 @@ def instrument_sqlalchemy(engine) -> bool:
 	return bool(otel_instrument_sqlalchemy(engine))
 
 
+def add_counter(name: str, value: int = 1, *, attributes: Dict[str, Any] | None = None) -> bool:
+	return otel_add_counter(name, value, attributes=attributes)
+
+
 def set_span_attributes(attributes: Dict[str, Any]) -> bool:
 	return otel_set_span_attributes(attributes)
 
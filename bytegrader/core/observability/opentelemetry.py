@@ -8,6 +8,8 @@ _OTEL_ENABLED = False
 _SQLA_ENGINES: set[int] = set()
 _REQUESTS_INSTRUMENTED = False
 _TORNADO_INSTRUMENTED = False
+_METRICS_ENABLED = False
+_COUNTERS: Dict[str, object] = {}
 
 
 def _parse_headers(raw_headers: str | None) -> Dict[str, str] | None:
@@ -77,7 +79,8 @@ def init_otel(logger: logging.Logger) -> bool:
     if service_version:
         resource_attributes["service.version"] = service_version
 
-    tracer_provider = TracerProvider(resource=Resource.create(resource_attributes))
+    resource = Resource.create(resource_attributes)
+    tracer_provider = TracerProvider(resource=resource)
     trace.set_tracer_provider(tracer_provider)
 
     tracer_provider.add_span_processor(BatchSpanProcessor(exporter))
@@ -99,11 +102,44 @@ def init_otel(logger: logging.Logger) -> bool:
         except Exception as exc:
             logger.warning("Tornado instrumentation failed: %s", exc)
 
+    _init_metrics(logger, resource, endpoint, protocol, headers)
+
     _OTEL_ENABLED = True
     logger.info("OpenTelemetry tracing enabled (endpoint=%s, protocol=%s).", endpoint, protocol)
     return True
 
 
+def _init_metrics(logger: logging.Logger, resource, endpoint: str, protocol: str,
+                  headers: Dict[str, str] | None) -> None:
+    global _METRICS_ENABLED
+
+    try:
+        from opentelemetry import metrics  # type: ignore[import-not-found]
+        from opentelemetry.sdk.metrics import MeterProvider  # type: ignore[import-not-found]
+        from opentelemetry.sdk.metrics.export import (  # type: ignore[import-not-found]
+            PeriodicExportingMetricReader,
+        )
+
+        if protocol in {"http", "http/protobuf"}:
+            from opentelemetry.exporter.otlp.proto.http.metric_exporter import (  # type: ignore[import-not-found]
+                OTLPMetricExporter,
+            )
+
+            exporter = OTLPMetricExporter(endpoint=endpoint, headers=headers)
+        else:
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import (  # type: ignore[import-not-found]
+                OTLPMetricExporter,
+            )
+
+            exporter = OTLPMetricExporter(endpoint=endpoint, headers=_headers_sequence(headers))
+
+        reader = PeriodicExportingMetricReader(exporter)
+        metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[reader]))
+        _METRICS_ENABLED = True
+    except Exception as exc:
+        logger.warning("OpenTelemetry metrics disabled: %s", exc)
+
+
 def _build_exporter(endpoint: str, protocol: str,
                     headers: Dict[str, str] | None):
     if protocol in {"http", "http/protobuf"}:
@@ -178,6 +214,22 @@ def instrument_sqlalchemy(engine) -> bool:
         return False
 
 
+def add_counter(name: str, value: int = 1, *, attributes: Optional[Mapping[str, object]] = None) -> bool:
+    if not _METRICS_ENABLED:
+        return False
+
+    try:
+        counter = _COUNTERS.get(name)
+        if counter is None:
+            from opentelemetry import metrics  # type: ignore[import-not-found]
+
+            counter = _COUNTERS[name] = metrics.get_meter("bytegrader").create_counter(name)
+        counter.add(value, attributes=attributes)
+        return True
+    except Exception:  # pragma: no cover - defensive
+        return False
+
+
 def set_span_attributes(attributes: Mapping[str, object]) -> bool:
     if not _OTEL_ENABLED:
         return False
@@ -9,3 +9,23 @@ def ensure_aware(dt):
     if dt.tzinfo is None:
         return dt.replace(tzinfo=timezone.utc)
     return dt
+
+
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value: str) -> float:
+    # '<number><unit>' as used by the config, e.g. '90s', '30m', '1h' or '1d'; '' and '0' are 0
+    value = (value or '').strip().lower()
+    if not value or value == '0':
+        return 0.0
+    number, unit = value[:-1], value[-1:]
+    if unit not in _DURATION_UNITS:
+        raise ValueError(f"Invalid duration '{value}', expected <number><unit> with unit s, m, h or d")
+    try:
+        seconds = float(number) * _DURATION_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid duration '{value}', expected <number><unit> with unit s, m, h or d")
+    if seconds < 0:
+        raise ValueError(f"Invalid duration '{value}', must not be negative")
+    return seconds
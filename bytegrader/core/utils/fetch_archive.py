@@ -0,0 +1,82 @@
+import io
+import tarfile
+from typing import Iterable, List, Optional
+
+from ..database.codec import decompressor, zstandard
+
+# Alternative representation of an assignment fetch: a tar archive, optionally compressed as a
+# whole, holding metadata.json, notebooks/<filename> and assets/<path>. Clients ask for it with
+# the Accept header; everything else keeps getting the multipart/mixed body.
+ARCHIVE_CODECS = {
+    "application/x-tar+zstd": "zstd",
+    "application/x-tar+zlib": "zlib",
+    "application/x-tar": "none",
+}
+METADATA_MEMBER = "metadata.json"
+NOTEBOOK_PREFIX = "notebooks/"
+ASSET_PREFIX = "assets/"
+
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+TAR_END = b"\0" * (2 * TAR_BLOCK_SIZE)
+
+
+def archive_types() -> List[str]:
+    # In order of preference; zstd only when the zstandard package is installed
+    return [media_type for media_type, codec in ARCHIVE_CODECS.items() if codec != "zstd" or zstandard is not None]
+
+
+def negotiate_archive_type(accept: Optional[str]) -> Optional[str]:
+    # First archive type of the Accept header (in the client's order) this side can produce
+    supported = archive_types()
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if media_type.lower() not in supported:
+            continue
+        q = next((param[2:] for param in params if param.startswith("q=")), "1")
+        try:
+            if float(q) <= 0:
+                continue
+        except ValueError:
+            continue
+        return media_type.lower()
+    return None
+
+
+def tar_header(name: str, size: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def tar_padding(size: int) -> bytes:
+    return b"\0" * (-size % TAR_BLOCK_SIZE)
+
+
+class DecompressingReader(io.RawIOBase):
+    # File object over an iterable of (compressed) chunks, e.g. requests' iter_content(), so
+    # tarfile can read an archive in stream mode while it is being downloaded
+
+    def __init__(self, chunks: Iterable[bytes], codec: str = "none"):
+        self._chunks = iter(chunks)
+        self._decompressor = decompressor(codec)
+        self._buffer = memoryview(b"")
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._done:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._done = True
+                chunk = self._decompressor.flush() if self._decompressor is not None else b""
+            elif self._decompressor is not None:
+                chunk = self._decompressor.decompress(chunk)
+            self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
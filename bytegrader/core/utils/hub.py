@@ -1,17 +1,36 @@
+import asyncio
+import json
 import os
 import logging
-from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator
 from urllib.parse import urljoin
 
-import requests
+import aiohttp
 
 from ..exceptions.hub import JupyterHubEnvironmentError, ByteGraderServiceError, JupyterHubApiError
 
 logger = logging.getLogger(__name__)
 
-class HubApiClient:
+# Requests that are safe to send again after a connection error or a gateway status
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({502, 503, 504})
 
-    def __init__(self, timeout: int = 30):
+
+def _merge_page(combined: Optional[Dict[str, Any]], response: Dict[str, Any], items_key: str) -> Dict[str, Any]:
+    if combined is None:
+        return response
+    data = response["data"]
+    combined_data = combined["data"]
+    combined_data.setdefault(items_key, []).extend(data.get(items_key) or [])
+    scoped = (data.get("permissions") or {}).get("scoped") or {}
+    combined_data.setdefault("permissions", {}).setdefault("scoped", {}).update(scoped)
+    return combined
+
+
+class HubEnvironment:
+
+    def __init__(self, timeout: float = 30):
         self.timeout = timeout
         self._api_token = None
         self._hub_api_url = None
@@ -56,175 +75,173 @@ class HubApiClient:
 
         return f"http://{hub_host}{port_suffix}/services/bytegrader"
 
-    def query_hub_service(
-        self,
-        method: str,
-        api_path: str,
-        data: Optional[Dict[str, Any]] = None,
-        params: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        base_url = self.service_url.rstrip("/") + "/"
-        path = api_path.lstrip("/")
-        url = urljoin(base_url, path)
+    def service_endpoint(self, api_path: str) -> str:
+        return urljoin(self.service_url.rstrip("/") + "/", api_path.lstrip("/"))
 
-        headers = {
-            "Authorization": f"token {self.api_token}",
-            "Content-Type": "application/json",
-        }
 
-        try:
-            logger.debug(f"Making {method} request to service: {url}")
-
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                headers=headers,
-                timeout=self.timeout,
-            )
+class AsyncHubApiClient(HubEnvironment):
+    # Used from inside an event loop (the lab extension, and the service's Hub user lookups). All
+    # calls share one aiohttp session, so connections to the service are kept alive and pooled.
+    # Idempotent requests are retried with exponential backoff on connection errors, timeouts
+    # and gateway errors.
+
+    def __init__(self, timeout: float = 30, retries: int = 2, backoff: float = 0.5, pool_size: int = 20):
+        super().__init__(timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
 
-            logger.debug(f"Service response status: {response.status_code}")
-
-            if response.ok:
-                try:
-                    return response.json()
-                except ValueError as e:
-                    raise ByteGraderServiceError(
-                        f"Invalid JSON response from service: {e}",
-                        response.status_code,
-                        response.text,
-                    )
-
-            error_msg = (
-                f"Service returned status {response.status_code} "
-                f"for {method} {url}"
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={"Authorization": f"token {self.api_token}"},
             )
-            logger.error(f"{error_msg}: {response.text}")
-            raise ByteGraderServiceError(error_msg, response.status_code, response.text)
-
-        except requests.exceptions.Timeout:
-            error_msg = f"Request timeout after {self.timeout}s for {url}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection error for {url}: {e}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request failed for {url}: {e}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
+        return self._session
 
-    def query_hub_service_raw(
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @asynccontextmanager
+    async def request(
             self,
             method: str,
-            api_path: str,
-            data: Optional[Dict[str, Any]] = None,
+            url: str,
+            json: Optional[Dict[str, Any]] = None,
+            data: Any = None,
             params: Optional[Dict[str, Any]] = None,
-    ) -> requests.Response:
-        base_url = self.service_url.rstrip("/") + "/"
-        path = api_path.lstrip("/")
-        url = urljoin(base_url, path)
-
-        headers = {
-            "Authorization": f"token {self.api_token}",
-            "Content-Type": "application/json",
-        }
+            headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None,
+            stream: bool = False,
+            error_cls: type = ByteGraderServiceError,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        timeout = self.timeout if timeout is None else timeout
+        # A streamed body may take longer than the timeout in total; it applies per read instead
+        client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout) if stream \
+            else aiohttp.ClientTimeout(total=timeout)
+        # Bodies that are read once (uploads) cannot be sent again
+        retryable = method.upper() in RETRY_METHODS and (data is None or isinstance(data, (bytes, str)))
+        attempts = 1 + (self.retries if retryable else 0)
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                logger.debug(f"Making {method} request to service: {url}")
+                response = await self.session.request(
+                    method, url, json=json, data=data, params=params, headers=headers, timeout=client_timeout
+                )
+            except asyncio.TimeoutError:
+                error_msg = f"Request timeout after {timeout}s for {url}"
+                if last:
+                    logger.error(error_msg)
+                    raise error_cls(error_msg)
+            except aiohttp.ClientConnectionError as e:
+                error_msg = f"Connection error for {url}: {e}"
+                if last:
+                    logger.error(error_msg)
+                    raise error_cls(error_msg)
+            except aiohttp.ClientError as e:
+                error_msg = f"Request failed for {url}: {e}"
+                logger.error(error_msg)
+                raise error_cls(error_msg)
+            else:
+                logger.debug(f"Service response status: {response.status}")
+                if last or response.status not in RETRY_STATUSES:
+                    break
+                error_msg = f"Service returned status {response.status} for {method} {url}"
+                response.release()
+
+            delay = self.backoff * 2 ** attempt
+            logger.warning(f"{error_msg}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
         try:
-            logger.debug(f"Making {method} request to service: {url}")
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                headers=headers,
-                timeout=self.timeout,
+            if response.status >= 400:
+                text = await response.text()
+                error_msg = f"Service returned status {response.status} for {method} {url}"
+                logger.error(f"{error_msg}: {text}")
+                raise error_cls(error_msg, response.status, text)
+            yield response
+        finally:
+            response.release()
+
+    async def _json(self, response: aiohttp.ClientResponse, error_cls: type) -> Dict[str, Any]:
+        body = await response.read()
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise error_cls(
+                f"Invalid JSON response: {e}", response.status, body.decode("utf-8", errors="replace")
             )
 
-            logger.debug(f"Service response status: {response.status_code}")
+    async def query_hub_service(
+            self,
+            method: str,
+            api_path: str,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        async with self.request(method, self.service_endpoint(api_path), json=data, params=params,
+                                timeout=timeout) as response:
+            return await self._json(response, ByteGraderServiceError)
 
-            if response.ok:
+    async def query_hub_service_pages(
+            self,
+            api_path: str,
+            items_key: str,
+            params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        params = dict(params or {})
+        combined = None
+        while True:
+            response = await self.query_hub_service("GET", api_path, params=params, timeout=timeout)
+            data = response.get("data")
+            if not response.get("success") or not isinstance(data, dict):
                 return response
 
-            error_msg = (
-                f"ByteGrader service returned status {response.status_code} "
-                f"for {method} {url}"
-            )
-            logger.error(f"{error_msg}: {response.text}")
-            raise ByteGraderServiceError(error_msg, response.status_code, response.text)
-
-        except requests.exceptions.Timeout:
-            error_msg = f"Request timeout after {self.timeout}s for {url}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
-
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection error for {url}: {e}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
-
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request failed for {url}: {e}"
-            logger.error(error_msg)
-            raise ByteGraderServiceError(error_msg)
-
-    def query_jupyterhub_api(
-        self,
-        method: str,
-        api_path: str,
-        data: Optional[Dict[str, Any]] = None,
-        params: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        base_url = self.hub_api_url.rstrip("/") + "/"
-        path = api_path.lstrip("/")
-        url = urljoin(base_url, path)
+            combined = _merge_page(combined, response, items_key)
+            cursor = data.get("next_cursor")
+            if not cursor:
+                combined["data"]["next_cursor"] = None
+                return combined
+            params["cursor"] = cursor
 
-        headers = {
-            "Authorization": f"token {self.api_token}",
-            "Content-Type": "application/json",
-        }
+    def query_hub_service_raw(
+            self,
+            method: str,
+            api_path: str,
+            data: Any = None,
+            params: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None,
+    ):
+        # Async context manager yielding the response with its body unread. Responses with
+        # status 400 and above raise ByteGraderServiceError.
+        return self.request(method, self.service_endpoint(api_path), data=data, params=params,
+                            headers=headers, timeout=timeout, stream=True)
+
+    async def query_jupyterhub_api(
+            self,
+            method: str,
+            api_path: str,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        url = urljoin(self.hub_api_url.rstrip("/") + "/", api_path.lstrip("/"))
+        async with self.request(method, url, json=data, params=params, timeout=timeout,
+                                error_cls=JupyterHubApiError) as response:
+            return await self._json(response, JupyterHubApiError)
 
-        try:
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                headers=headers,
-                timeout=self.timeout,
-            )
+    async def __aenter__(self):
+        return self
 
-            if response.ok:
-                try:
-                    return response.json()
-                except ValueError as e:
-                    raise JupyterHubApiError(
-                        f"Invalid JSON response from JupyterHub API: {e}",
-                        response.status_code,
-                        response.text,
-                    )
-
-            error_msg = (
-                f"JupyterHub API returned status {response.status_code} "
-                f"for {method} {url}"
-            )
-            logger.error(f"{error_msg}: {response.text}")
-            raise JupyterHubApiError(error_msg, response.status_code, response.text)
-
-        except requests.exceptions.Timeout:
-            error_msg = f"Request timeout after {self.timeout}s for {url}"
-            logger.error(error_msg)
-            raise JupyterHubApiError(error_msg)
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Connection error for {url}: {e}"
-            logger.error(error_msg)
-            raise JupyterHubApiError(error_msg)
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Request failed for {url}: {e}"
-            logger.error(error_msg)
-            raise JupyterHubApiError(error_msg)
-
-    def __enter__(self):
-        return self
\ No newline at end of file
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
@@ -0,0 +1,213 @@
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from tornado.httputil import HTTPHeaders, _parse_header
+
+from ..exceptions.upload import UploadError, UploadTooLargeError
+
+# Incremental multipart/form-data parser for streamed request bodies. Form fields are kept in
+# memory up to max_field_size; file parts are hashed as they arrive and written to a
+# SpooledTemporaryFile that moves to disk once it exceeds spool_size. Limits are checked
+# against every chunk, so an oversized part is rejected as soon as it crosses the limit.
+# Subclasses can override open_file to send file parts somewhere else.
+
+MAX_HEADER_SIZE = 16 * 1024
+
+
+class UploadedFile:
+
+    def __init__(self, name: str, filename: str, content_type: str, spool_size: int, spool_dir: Optional[str]):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_size, dir=spool_dir or None)
+        self._hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data) -> None:
+        self._hash.update(data)
+        self.file.write(data)
+        self.size += len(data)
+
+    @property
+    def body(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def chunks(self, size: int = 256 * 1024):
+        self.file.seek(0)
+        while True:
+            chunk = self.file.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+
+@dataclass
+class FieldLimits:
+    max_size: int
+    # Expected first non-whitespace byte of the part, checked as soon as it arrives
+    starts_with: Optional[bytes] = None
+
+
+@dataclass
+class MultipartForm:
+    fields: Dict[str, List[str]] = field(default_factory=dict)
+    files: Dict[str, List[UploadedFile]] = field(default_factory=dict)
+
+    def close(self) -> None:
+        for uploads in self.files.values():
+            for upload in uploads:
+                upload.close()
+
+
+class MultipartParser:
+
+    def __init__(self, boundary: str, file_limits: Dict[str, FieldLimits], max_field_size: int = 1024 * 1024,
+                 spool_size: int = 1024 * 1024, spool_dir: Optional[str] = None):
+        self.form = MultipartForm()
+        self._delimiter = b"\r\n--" + boundary.encode("latin1")
+        self._file_limits = file_limits
+        self._max_field_size = max_field_size
+        self._spool_size = spool_size
+        self._spool_dir = spool_dir
+        # The first delimiter is not preceded by a line break
+        self._buffer = bytearray(b"\r\n")
+        self._state = "preamble"
+        self._part = None
+        self._limits: Optional[FieldLimits] = None
+        self._checked_start = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: bytes) -> None:
+        if self._state == "done":
+            return
+        self._buffer += data
+        while True:
+            if self._state == "preamble":
+                idx = self._buffer.find(self._delimiter)
+                if idx == -1:
+                    del self._buffer[:max(0, len(self._buffer) - len(self._delimiter))]
+                    return
+                del self._buffer[:idx + len(self._delimiter)]
+                self._state = "delimiter"
+
+            elif self._state == "delimiter":
+                if len(self._buffer) < 2:
+                    return
+                if self._buffer[:2] == b"--":
+                    self._state = "done"
+                    self._buffer.clear()
+                    return
+                if self._buffer[:2] != b"\r\n":
+                    raise UploadError("Malformed multipart body")
+                del self._buffer[:2]
+                self._state = "headers"
+
+            elif self._state == "headers":
+                idx = self._buffer.find(b"\r\n\r\n")
+                if idx == -1:
+                    if len(self._buffer) > MAX_HEADER_SIZE:
+                        raise UploadError("Multipart part headers too large")
+                    return
+                headers = HTTPHeaders.parse(self._buffer[:idx].decode("utf-8"))
+                del self._buffer[:idx + 4]
+                self._start_part(headers)
+                self._state = "body"
+
+            elif self._state == "body":
+                idx = self._buffer.find(self._delimiter)
+                if idx == -1:
+                    # Keep what could be the start of a delimiter split across chunks
+                    safe = len(self._buffer) - len(self._delimiter) + 1
+                    if safe > 0:
+                        self._write(memoryview(self._buffer)[:safe])
+                        del self._buffer[:safe]
+                    return
+                self._write(memoryview(self._buffer)[:idx])
+                del self._buffer[:idx + len(self._delimiter)]
+                self._finish_part()
+                self._state = "delimiter"
+
+    def finish(self) -> MultipartForm:
+        if self._state != "done":
+            raise UploadError("Incomplete multipart body")
+        return self.form
+
+    def close(self) -> None:
+        self.form.close()
+        if self._part is not None and not isinstance(self._part, tuple):
+            self._part.close()
+
+    def _start_part(self, headers: HTTPHeaders) -> None:
+        disposition, params = _parse_header(headers.get("Content-Disposition", ""))
+        name = params.get("name")
+        if disposition != "form-data" or not name:
+            raise UploadError("Invalid multipart part, missing form-data name")
+        filename = params.get("filename")
+        self._checked_start = False
+        if filename is None:
+            self._part = (name, bytearray())
+            self._limits = FieldLimits(self._max_field_size)
+            return
+
+        self._limits = self._file_limits.get(name)
+        if self._limits is None:
+            # Files the route does not expect are skipped without being stored
+            self._part = None
+            return
+        self._part = self.open_file(name, filename, headers.get("Content-Type", "application/octet-stream"))
+
+    def open_file(self, name: str, filename: str, content_type: str):
+        # Returns the object receiving the part (write, size, close, name, filename); None skips it
+        return UploadedFile(name, filename, content_type, self._spool_size, self._spool_dir)
+
+    def _write(self, data: memoryview) -> None:
+        if self._part is None or not len(data):
+            return
+        limits = self._limits
+        if not self._checked_start and limits.starts_with is not None:
+            stripped = bytes(data).lstrip()
+            if stripped:
+                if not stripped.startswith(limits.starts_with):
+                    raise UploadError(f"Invalid content for '{self._part_name}'")
+                self._checked_start = True
+
+        size = (len(self._part[1]) if isinstance(self._part, tuple) else self._part.size) + len(data)
+        if size > limits.max_size:
+            raise UploadTooLargeError(f"'{self._part_name}' exceeds the limit of {limits.max_size} bytes")
+        if isinstance(self._part, tuple):
+            self._part[1].extend(data)
+        else:
+            self._part.write(data)
+
+    @property
+    def _part_name(self) -> str:
+        if isinstance(self._part, tuple):
+            return self._part[0]
+        return self._part.filename
+
+    def _finish_part(self) -> None:
+        part, self._part = self._part, None
+        if part is None:
+            return
+        if isinstance(part, tuple):
+            name, value = part
+            self.form.fields.setdefault(name, []).append(value.decode("utf-8"))
+        else:
+            if self._limits.starts_with is not None and not self._checked_start:
+                part.close()
+                raise UploadError(f"Invalid content for '{part.filename}'")
+            self.form.files.setdefault(part.name, []).append(part)
@@ -1,4 +1,18 @@
+import json
+import re
+from typing import Optional
+
+import nbformat
 from nbformat import NotebookNode
+from nbformat.v4.rwbase import strip_transient
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+_CELL_TYPES = ("code", "markdown", "raw")
+_CELL_ID = re.compile(r"^[a-zA-Z0-9-_]{1,64}$")
 
 
 def is_task(cell: NotebookNode) -> bool:
@@ -27,4 +41,74 @@ def is_locked(cell: NotebookNode) -> bool:
     elif is_grade(cell):
         return True
     else:
-        return cell.metadata['nbgrader'].get('locked', False)
\ No newline at end of file
+        return cell.metadata['nbgrader'].get('locked', False)
+
+
+def is_submitted(grade: bool, solution: bool, locked: bool) -> bool:
+    # Cells whose source is stored with a submission; read-only test and locked cells are not
+    return bool(solution) or not (grade or locked)
+
+
+def _is_source(value) -> bool:
+    return isinstance(value, str) or (isinstance(value, list) and all(isinstance(line, str) for line in value))
+
+
+def _structure_error(nb) -> Optional[str]:
+    # Checks the parts of a v4 notebook BYTEGrader reads (cells, their type, id, source and
+    # metadata, the notebook metadata). Outputs are never stored and are not looked at.
+    if not isinstance(nb, dict) or nb.get("nbformat") != 4:
+        return "not an nbformat 4 notebook"
+    minor = nb.get("nbformat_minor")
+    if not isinstance(minor, int) or not isinstance(nb.get("metadata"), dict):
+        return "missing nbformat_minor or metadata"
+    cells = nb.get("cells")
+    if not isinstance(cells, list):
+        return "missing cells"
+    ids = set()
+    for cell in cells:
+        if not isinstance(cell, dict) or cell.get("cell_type") not in _CELL_TYPES:
+            return "invalid cell"
+        if not _is_source(cell.get("source")) or not isinstance(cell.get("metadata"), dict):
+            return "invalid cell source or metadata"
+        if cell["cell_type"] == "code" and not isinstance(cell.get("outputs"), list):
+            return "invalid code cell outputs"
+        if minor >= 5:
+            cell_id = cell.get("id")
+            if not isinstance(cell_id, str) or not _CELL_ID.match(cell_id) or cell_id in ids:
+                return "missing, invalid or duplicate cell id"
+            ids.add(cell_id)
+    return None
+
+
+def _read_validated(text: str) -> NotebookNode:
+    nb = nbformat.reads(text, nbformat.current_nbformat, capture_validation_error={})
+    nbformat.validate(nb)
+    return nb
+
+
+def read_notebook(data: bytes) -> NotebookNode:
+    # Fast path for uploaded notebooks: one JSON parse (orjson when installed) and a structural
+    # check of the fields BYTEGrader reads. Anything unusual (other versions, invalid or
+    # duplicate ids, ...) goes through nbformat's conversion and full schema validation, which
+    # also produces the error message.
+    try:
+        nb = orjson.loads(data) if orjson is not None else json.loads(data)
+    except ValueError:
+        nb = None
+    if nb is None or _structure_error(nb) is not None:
+        return _read_validated(data.decode("utf-8"))
+
+    # Outputs and attachments are kept as parsed (plain dicts, sources of outputs not rejoined):
+    # converting them dominates the cost and nothing downstream reads them
+    cells = nb.pop("cells")
+    nb = nbformat.from_dict(nb)
+    nb.cells = []
+    for cell in cells:
+        # Apart from metadata, the other cell fields are scalars, sources or outputs
+        node = NotebookNode(cell)
+        node.metadata = nbformat.from_dict(node.metadata)
+        if isinstance(node.source, list):
+            node.source = "".join(node.source)
+        nb.cells.append(node)
+    strip_transient(nb)
+    return nb
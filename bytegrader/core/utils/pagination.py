@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, tuple_
+
+# Keyset (cursor) pagination. A cursor is the sort key of the last row of a page, encoded as
+# url-safe base64 JSON so clients treat it as opaque. Queries order by the same columns and
+# continue strictly after the key, which stays stable under concurrent inserts and does not
+# scan skipped rows the way OFFSET does.
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("unexpected cursor shape")
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime and v is not None else t(v)
+            for t, v in zip(types, payload)
+        )
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def keyset_page(query: Select, columns: Sequence, after: Optional[Sequence[Any]], limit: int) -> Select:
+    # One extra row tells the caller whether another page follows
+    if after is not None:
+        query = query.where(tuple_(*columns) > tuple_(*after))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def split_page(rows: List[Any], limit: int, key) -> Tuple[List[Any], Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
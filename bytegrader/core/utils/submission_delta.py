@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Dict, Iterable
+
+from .multipart import UploadedFile
+from .notebook import is_submitted
+from ..database.blobs import blob_hash
+from ..database.codec import compress, decompress_bounded, zstandard
+from ..exceptions.upload import UploadError
+
+# Compact submissions. Instead of whole notebooks (outputs, attachments, checkpoints), the lab
+# extension sends a single "cells" part holding the sources of the cells a submission stores,
+# keyed by notebook name and cell id:
+#
+#     {"version": 1, "notebooks": {"<name>": {"<cell id>": {"source": "..."} | {"sha256": "..."}}}}
+#
+# Sources the server already holds (the fetched stub, a previous submission) are sent as their
+# sha256, the key of the blob store. The JSON is compressed as named by the part content type.
+
+DELTA_FIELD = "cells"
+DELTA_VERSION = 1
+
+DELTA_CODECS = {
+    "application/x-bytegrader-cells+zstd": "zstd",
+    "application/x-bytegrader-cells+zlib": "zlib",
+    "application/x-bytegrader-cells+json": "none",
+}
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def delta_content_type(codec: str) -> str:
+    return next(content_type for content_type, name in DELTA_CODECS.items() if name == codec)
+
+
+def delta_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def notebook_cells(nb: Dict, known: Iterable[str] = ()) -> Dict[str, Dict[str, str]]:
+    # Entries for the submitted cells of a parsed notebook; cells without an id are skipped
+    known = set(known)
+    cells = {}
+    for cell in nb.get("cells") or []:
+        cell_id = cell.get("id")
+        flags = (cell.get("metadata") or {}).get("nbgrader") or {}
+        if not cell_id or not is_submitted(flags.get("grade"), flags.get("solution"), flags.get("locked")):
+            continue
+        source = cell.get("source") or ""
+        if isinstance(source, list):
+            source = "".join(source)
+        digest = blob_hash(source)
+        cells[cell_id] = {"sha256": digest} if digest in known else {"source": source}
+    return cells
+
+
+def source_hashes(notebooks: Dict[str, Dict[str, Dict[str, str]]]) -> set:
+    return {
+        entry.get("sha256") or blob_hash(entry["source"])
+        for cells in notebooks.values() for entry in cells.values()
+    }
+
+
+def encode_delta(notebooks: Dict[str, Dict[str, Dict[str, str]]], codec: str) -> bytes:
+    payload = {"version": DELTA_VERSION, "notebooks": notebooks}
+    return compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), codec)
+
+
+def _valid_entry(entry) -> bool:
+    if not isinstance(entry, dict) or len(entry) != 1:
+        return False
+    if "source" in entry:
+        return isinstance(entry["source"], str)
+    return isinstance(entry.get("sha256"), str) and _SHA256.match(entry["sha256"]) is not None
+
+
+def read_delta(upload: UploadedFile, max_size: int) -> Dict[str, Dict[str, Dict[str, str]]]:
+    codec = DELTA_CODECS.get(upload.content_type.split(";")[0].strip().lower())
+    if codec is None:
+        raise UploadError(f"Unsupported content type '{upload.content_type}' for '{DELTA_FIELD}'")
+    try:
+        payload = json.loads(decompress_bounded(upload.body, codec, max_size))
+    except Exception as e:
+        raise UploadError(f"Invalid '{DELTA_FIELD}' payload: {e}")
+
+    if not isinstance(payload, dict) or payload.get("version") != DELTA_VERSION \
+            or not isinstance(payload.get("notebooks"), dict):
+        raise UploadError(f"Invalid '{DELTA_FIELD}' payload")
+    notebooks = payload["notebooks"]
+    for cells in notebooks.values():
+        if not isinstance(cells, dict) or not all(_valid_entry(entry) for entry in cells.values()):
+            raise UploadError(f"Invalid '{DELTA_FIELD}' payload")
+    return notebooks
@@ -1,5 +1,13 @@
-from bytegrader.extensions.lab.labextension import load_jupyter_server_extension
+from bytegrader.extensions.lab.labextension import BYTEGraderLabExtension, load_jupyter_server_extension
 
 _load_jupyter_server_extension = load_jupyter_server_extension
 
-__all__ = ['load_jupyter_server_extension']
\ No newline at end of file
+
+def _jupyter_server_extension_points():
+    return [{
+        "module": "bytegrader.extensions.lab",
+        "app": BYTEGraderLabExtension,
+    }]
+
+
+__all__ = ['BYTEGraderLabExtension', 'load_jupyter_server_extension']
\ No newline at end of file
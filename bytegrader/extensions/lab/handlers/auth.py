@@ -10,7 +10,7 @@ class LabWhoAmIHandler(LabBaseHandler):
     @web.authenticated
     async def get(self):
         try:
-            response = self.hub_client.query_hub_service(
+            response = await self.hub_client.query_hub_service(
                 method='GET',
                 api_path='/auth/whoami',
                 params={}
@@ -1,8 +1,9 @@
 import logging
 
+from jupyter_server.extension.application import ExtensionApp
 from jupyterhub.utils import url_path_join
 
-from bytegrader.core.utils.hub import HubApiClient
+from bytegrader.core.utils.hub import AsyncHubApiClient
 from bytegrader.extensions.lab.handlers.assignment import LabAssignmentListHandler, LabAssignmentFetchHandler, \
     LabAssignmentCreateHandler, LabAssignmentGenerateHandler, LabAssignmentDeleteHandler
 from bytegrader.extensions.lab.handlers.auth import LabWhoAmIHandler
@@ -27,16 +28,26 @@ HANDLERS = [
 logger = logging.getLogger("bytegrader.labextension")
 
 
+class BYTEGraderLabExtension(ExtensionApp):
+    # Registered as an extension app (rather than a plain load function) for the shutdown hook
+    name = "bytegrader"
+
+    def initialize_settings(self):
+        self.settings["hub_client"] = AsyncHubApiClient()
+
+    def initialize_handlers(self):
+        self.handlers.extend((url_path_join('bytegrader', path), handler) for path, handler in HANDLERS)
+        logger.info("BYTE Grader labextension loaded successfully.")
+
+    async def stop_extension(self):
+        # The hub client's aiohttp session would otherwise be left unclosed
+        hub_client = self.settings.get("hub_client")
+        if hub_client is not None:
+            await hub_client.close()
+
+
 def load_jupyter_server_extension(app):
     try:
-        webapp = app.web_app
-        base_url = webapp.settings.get("base_url", "")
-        hub_client = HubApiClient()
-        webapp.settings["hub_client"] = hub_client
-        webapp.add_handlers('.*$', [
-            (url_path_join(base_url, 'bytegrader', path), handler)
-            for path, handler in HANDLERS
-        ])
-        logger.info("BYTE Grader labextension loaded successfully.")
+        BYTEGraderLabExtension._load_jupyter_server_extension(app)
     except Exception:
         logger.error("Failed to load BYTE Grader Lab extension", exc_info=True)
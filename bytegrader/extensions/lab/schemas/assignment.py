@@ -61,6 +61,7 @@ class LabAssignmentCreateRequest(BaseModel):
     allow_resubmission: bool
     show_solutions: ShowSolutionsOption
     lti_sync: bool
+    cooldown_period: Optional[str] = None
 
     notebooks: List[FileReference]
     assets: List[FileReference]
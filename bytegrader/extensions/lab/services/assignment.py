@@ -1,35 +1,48 @@
+import asyncio
+import io
 import json
 import logging
 import os.path
 import re
 import shutil
 import stat
+import sys
+import tarfile
 import tempfile
+from contextlib import ExitStack
 from pathlib import Path
-from urllib.parse import urljoin
 
+import aiohttp
 import nbformat
-import requests
 
 from ..schemas.base import LabAPIResponse
 from ..schemas.assignment import AssignmentListData, LabAssignmentCreateRequest, LabAssignmentGenerateRequest, \
     FileReference
-from ....core.utils.hub import HubApiClient
+from ....core.utils.fetch_archive import ARCHIVE_CODECS, ASSET_PREFIX, NOTEBOOK_PREFIX, DecompressingReader, \
+    archive_types
+from ....core.exceptions.hub import ByteGraderServiceError
+from ....core.utils.hub import AsyncHubApiClient
+from ....core.utils.multipart import FieldLimits, MultipartParser
+from ....core.utils.submission_delta import notebook_cells, source_hashes
 from ....preprocessors.factory import ProcessorFactory
 from ....schemas.assignment import AssignmentCreateRequest
+from .submission import remember_sources
+
+# Written next to the fetched files; holds the ETag of the fetch and the files it wrote
+FETCH_STATE_FILE = ".bytegrader-fetch.json"
+FETCH_READ_SIZE = 256 * 1024
 
 
 class LabAssignmentService:
 
-    def __init__(self, hub_client: HubApiClient):
+    def __init__(self, hub_client: AsyncHubApiClient):
         self.hub_client = hub_client
 
     async def list_assignments(self, course_id: str) -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
-                method='GET',
+            response = await self.hub_client.query_hub_service_pages(
                 api_path=f'/courses/{course_id}/assignments',
-                params={}
+                items_key='assignments'
             )
             resp = LabAPIResponse.parse_obj(response)
         except Exception as e:
@@ -67,88 +80,47 @@ class LabAssignmentService:
 
     async def fetch_assignment(self, course_id: str, assignment_id: str, solution: bool = False) -> LabAPIResponse:
         try:
-            params = {"solution": str(solution).lower()} if solution else {}
-            resp = self.hub_client.query_hub_service_raw(
-                method='GET',
-                api_path=f'/courses/{course_id}/assignments/{assignment_id}/fetch',
-                params=params
-            )
-
-            raw_bytes = resp.content
-            content_type = resp.headers.get("Content-Type", "")
-            match = re.search(r'boundary=([^;]+)', content_type)
-            if not match:
-                return LabAPIResponse.error_response("Invalid content type, missing boundary")
-            boundary = match.group(1)
-
             base_dir = os.path.join(os.getcwd(), "courses", course_id, assignment_id)
             if solution:
                 base_dir = os.path.join(base_dir, "solution")
-            os.makedirs(base_dir, exist_ok=True)
-
-            parts = raw_bytes.decode('latin1', errors='ignore').split(f'--{boundary}')
-
-            assignment_metadata = None
-
-            for part in parts:
-                if not part.strip():
-                    continue
-
-                header_end = part.find('\r\n\r\n')
-                if header_end == -1:
-                    continue
-
-                headers_text = part[:header_end]
-                content = part[header_end + 4:].strip()
-
-                headers = {}
-                for line in headers_text.split('\r\n'):
-                    if ': ' in line:
-                        key, value = line.split(': ', 1)
-                        headers[key.lower()] = value
-
-                disposition = headers.get('content-disposition', '')
-                name_match = re.search(r'name="([^"]+)"', disposition)
-                filename_match = re.search(r'filename="([^"]+)"', disposition)
-
-                if not name_match:
-                    continue
-
-                name = name_match.group(1)
-
-                if name in ('notebook', 'asset') and filename_match:
-                    filename = filename_match.group(1)
-
-                    safe_path = _sanitize_path(base_dir, filename)
-                    if not safe_path:
-                        logging.warning(f"Skipping file due to path traversal concern: {filename}")
-                        continue
-
-                    if solution and os.path.exists(safe_path):
-                        continue
-
-                    os.makedirs(os.path.dirname(safe_path), exist_ok=True)
-
-                    is_binary = name == 'asset' and not headers.get('content-type', '').startswith(
-                        ('text/', 'application/json'))
-
-                    if is_binary:
-                        with open(safe_path, 'wb') as f:
-                            f.write(content.encode('latin1'))
-                    else:
-                        with open(safe_path, 'w') as f:
-                            f.write(content)
-                    try:
-                        # Solutions must be read-only; student notebooks are writable
-                        if solution:
-                            Path(safe_path).chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
-                        else:
-                            Path(safe_path).chmod(
-                                stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH
-                            )
-                    except Exception:
-                        logging.warning(f"Could not adjust permissions on fetched file {safe_path}")
 
+            params = {"solution": str(solution).lower()} if solution else {}
+            headers = {"Accept": ", ".join(archive_types() + ["multipart/mixed;q=0.1"])}
+            etag = _unchanged_fetch_etag(base_dir)
+            if etag:
+                headers["If-None-Match"] = etag
+            loop = asyncio.get_running_loop()
+            async with self.hub_client.query_hub_service_raw(
+                method='GET',
+                api_path=f'/courses/{course_id}/assignments/{assignment_id}/fetch',
+                params=params,
+                headers=headers
+            ) as resp:
+                if resp.status == 304:
+                    # The fetched files are still on disk, untouched, and the assignment did not change
+                    return LabAPIResponse.success_response({})
+
+                content_type = resp.headers.get("Content-Type", "")
+                media_type = content_type.split(";")[0].strip().lower()
+                os.makedirs(base_dir, exist_ok=True)
+                # Both formats are written to disk in a worker thread pulling chunks off the loop
+                if media_type in ARCHIVE_CODECS:
+                    written = await loop.run_in_executor(
+                        None, _extract_fetch_archive, _stream_chunks(resp, loop), ARCHIVE_CODECS[media_type],
+                        base_dir, solution
+                    )
+                else:
+                    match = re.search(r'boundary=([^;]+)', content_type)
+                    if not match:
+                        return LabAPIResponse.error_response("Invalid content type, missing boundary")
+                    written = await loop.run_in_executor(
+                        None, _write_fetch_multipart, _stream_chunks(resp, loop), match.group(1).strip('"'),
+                        base_dir, solution
+                    )
+
+            _save_fetch_state(base_dir, resp.headers.get("ETag"), written)
+            if not solution:
+                remember_sources(base_dir, await loop.run_in_executor(None, _fetched_source_hashes, written))
             return LabAPIResponse.success_response({})
 
         except Exception as e:
@@ -156,51 +128,44 @@ class LabAssignmentService:
             return LabAPIResponse.error_response(f"Failed to fetch assignment: {str(e)}")
 
     async def create_assignment(self, course_id: str, req_model: LabAssignmentCreateRequest) -> LabAPIResponse:
-        files = []
+        form = aiohttp.FormData()
 
         metadata = AssignmentCreateRequest(
             **req_model.model_dump(include={
                 'name', 'description', 'due_date', 'visible',
-                'allow_resubmission', 'show_solutions', 'lti_sync'
+                'allow_resubmission', 'show_solutions', 'lti_sync', 'cooldown_period'
             }, exclude_unset=True),
             allow_late_submission=False
         )
 
-        files.append((
-            "metadata",
-            (None, metadata.model_dump_json(by_alias=True), "application/json")
-        ))
+        form.add_field("metadata", metadata.model_dump_json(by_alias=True), content_type="application/json")
 
         base_dir = os.getcwd()
 
-        for ref in req_model.notebooks:
-            abs_p = os.path.join(base_dir, ref.abs)
-            if not os.path.isfile(abs_p):
-                return LabAPIResponse.error_response(f"Notebook file does not exist: {abs_p}")
-            with open(abs_p, "rb") as f:
-                content = f.read()
-            files.append(("notebooks", (ref.rel, content, "application/octet-stream")))
-
-        for ref in req_model.assets:
-            abs_p = os.path.join(base_dir, ref.abs)
-            if not os.path.isfile(abs_p):
-                return LabAPIResponse.error_response(f"Asset file does not exist: {abs_p}")
-            with open(abs_p, "rb") as f:
-                content = f.read()
-            files.append(("assets", (ref.rel, content, "application/octet-stream")))
-
-        base = self.hub_client.service_url.rstrip("/") + "/"
-        url = urljoin(base, f"courses/{course_id}/assignments/create")
-        headers = {"Authorization": f"token {self.hub_client.api_token}"}
-        resp = requests.post(url, files=files, headers=headers, timeout=30)
-
-        if resp.ok:
-            return LabAPIResponse.parse_obj(resp.json())
-        return LabAPIResponse.error_response(f"Create failed: {resp.text}")
+        # Files are attached open and read by aiohttp while the request is sent
+        with ExitStack() as stack:
+            for field, kind, refs in (("notebooks", "Notebook", req_model.notebooks),
+                                      ("assets", "Asset", req_model.assets)):
+                for ref in refs:
+                    abs_p = os.path.join(base_dir, ref.abs)
+                    if not os.path.isfile(abs_p):
+                        return LabAPIResponse.error_response(f"{kind} file does not exist: {abs_p}")
+                    form.add_field(field, stack.enter_context(open(abs_p, "rb")), filename=ref.rel,
+                                   content_type="application/octet-stream")
+
+            try:
+                async with self.hub_client.query_hub_service_raw(
+                    method='POST',
+                    api_path=f'/courses/{course_id}/assignments/create',
+                    data=form
+                ) as resp:
+                    return LabAPIResponse.parse_obj(await resp.json(content_type=None))
+            except ByteGraderServiceError as e:
+                return LabAPIResponse.error_response(f"Create failed: {e.response_text or e}")
 
     async def delete_assignment(self, course_id: str, assignment_id: str) -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
+            response = await self.hub_client.query_hub_service(
                 method='DELETE',
                 api_path=f'/courses/{course_id}/assignments/{assignment_id}/delete',
                 params={}
@@ -272,6 +237,161 @@ class LabAssignmentService:
             return LabAPIResponse.error_response(f"Failed to generate assignment: {str(e)}")
 
 
+def _fetch_target(base_dir: str, filename: str, solution: bool) -> Path | None:
+    safe_path = _sanitize_path(base_dir, filename)
+    if not safe_path:
+        logging.warning(f"Skipping file due to path traversal concern: {filename}")
+        return None
+    # Existing solution files are kept
+    if solution and os.path.exists(safe_path):
+        return None
+    os.makedirs(os.path.dirname(safe_path), exist_ok=True)
+    return safe_path
+
+
+def _set_fetched_mode(path: Path, solution: bool):
+    try:
+        # Solutions must be read-only; student notebooks are writable
+        if solution:
+            Path(path).chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        else:
+            Path(path).chmod(
+                stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH
+            )
+    except Exception:
+        logging.warning(f"Could not adjust permissions on fetched file {path}")
+
+
+def _stream_chunks(resp: aiohttp.ClientResponse, loop: asyncio.AbstractEventLoop):
+    # Iterated from a worker thread; each chunk is read on the event loop that owns the response
+    while True:
+        chunk = asyncio.run_coroutine_threadsafe(resp.content.read(FETCH_READ_SIZE), loop).result()
+        if not chunk:
+            return
+        yield chunk
+
+
+def _extract_fetch_archive(chunks, codec: str, base_dir: str, solution: bool) -> list:
+    # Members are written to disk while the archive is downloaded; only one chunk is in memory
+    written = []
+    reader = io.BufferedReader(DecompressingReader(chunks, codec), FETCH_READ_SIZE)
+    with tarfile.open(fileobj=reader, mode='r|') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            if member.name.startswith(NOTEBOOK_PREFIX):
+                filename = member.name[len(NOTEBOOK_PREFIX):]
+            elif member.name.startswith(ASSET_PREFIX):
+                filename = member.name[len(ASSET_PREFIX):]
+            else:
+                continue
+
+            safe_path = _fetch_target(base_dir, filename, solution)
+            if not safe_path:
+                continue
+            with open(safe_path, 'wb') as f:
+                shutil.copyfileobj(tar.extractfile(member), f, FETCH_READ_SIZE)
+            _set_fetched_mode(safe_path, solution)
+            written.append(safe_path)
+    return written
+
+
+class _FetchedFile:
+
+    def __init__(self, name: str, filename: str, path: Path):
+        self.name = name
+        self.filename = filename
+        self.path = path
+        self.size = 0
+        self.file = open(path, 'wb')
+
+    def write(self, data) -> None:
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _FetchMultipartParser(MultipartParser):
+    # Writes notebook and asset parts byte for byte straight to their destination files
+
+    def __init__(self, boundary: str, base_dir: str, solution: bool):
+        unlimited = FieldLimits(sys.maxsize)
+        super().__init__(boundary, {'notebook': unlimited, 'asset': unlimited})
+        self.base_dir = base_dir
+        self.solution = solution
+
+    def open_file(self, name: str, filename: str, content_type: str):
+        safe_path = _fetch_target(self.base_dir, filename, self.solution)
+        if not safe_path:
+            return None
+        return _FetchedFile(name, filename, safe_path)
+
+
+def _write_fetch_multipart(chunks, boundary: str, base_dir: str, solution: bool) -> list:
+    parser = _FetchMultipartParser(boundary, base_dir, solution)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        form = parser.finish()
+    finally:
+        parser.close()
+
+    written = []
+    for part in form.files.values():
+        for fetched in part:
+            _set_fetched_mode(fetched.path, solution)
+            written.append(fetched.path)
+    return written
+
+
+def _fetched_source_hashes(paths: list) -> set:
+    # The service stores the stub sources too; untouched cells are submitted by hash
+    notebooks = {}
+    for path in paths:
+        if str(path).endswith('.ipynb'):
+            with open(path, 'rb') as f:
+                notebooks[str(path)] = notebook_cells(json.load(f))
+    return source_hashes(notebooks)
+
+
+def _file_signature(path: str | Path) -> list:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _save_fetch_state(base_dir: str, etag: str | None, files: list):
+    state_path = os.path.join(base_dir, FETCH_STATE_FILE)
+    try:
+        if not etag:
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            return
+        state = {
+            "etag": etag,
+            "files": {os.path.relpath(path, base_dir): _file_signature(path) for path in files},
+        }
+        with open(state_path, 'w') as f:
+            json.dump(state, f)
+    except OSError:
+        logging.warning(f"Could not record fetch state in {base_dir}")
+
+
+def _unchanged_fetch_etag(base_dir: str) -> str | None:
+    # ETag of the last fetch into base_dir, provided all of its files are still there unmodified.
+    # A 304 skips writing, so a re-fetch still restores deleted or edited files.
+    try:
+        with open(os.path.join(base_dir, FETCH_STATE_FILE)) as f:
+            state = json.load(f)
+        for rel, signature in state["files"].items():
+            if _file_signature(os.path.join(base_dir, rel)) != signature:
+                return None
+        return state["etag"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
 def _sanitize_path(base_dir: str | Path, user_input_path: str | Path) -> Path:
     base_dir = Path(base_dir).resolve(strict=True)
     user_input_path = Path(str(user_input_path).lstrip("/\\")).parts
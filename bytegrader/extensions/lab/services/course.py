@@ -1,6 +1,6 @@
 from bytegrader.schemas.course import UpdateCourseRequest
 from ..schemas.base import LabAPIResponse
-from ....core.utils.hub import HubApiClient
+from ....core.utils.hub import AsyncHubApiClient
 from ....schemas.assignment import AssignmentCreateRequest
 from ....schemas.base import APIResponse
 from ....schemas.course import CreateCourseRequest
@@ -8,15 +8,14 @@ from ....schemas.course import CreateCourseRequest
 
 class LabCourseService:
 
-    def __init__(self, hub_client: 'HubApiClient'):
+    def __init__(self, hub_client: 'AsyncHubApiClient'):
         self.hub_client = hub_client
 
     async def list_courses(self) -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
-                method='GET',
+            response = await self.hub_client.query_hub_service_pages(
                 api_path='/courses',
-                params={}
+                items_key='courses'
             )
             return LabAPIResponse.parse_obj(response)
         except Exception as e:
@@ -24,7 +23,7 @@ class LabCourseService:
 
     async def create_course(self, course_data: 'CreateCourseRequest') -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
+            response = await self.hub_client.query_hub_service(
                 method='POST',
                 api_path='/courses/create',
                 data=course_data.model_dump(by_alias=True)
@@ -35,7 +34,7 @@ class LabCourseService:
 
     async def delete_course(self, course_id: str) -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
+            response = await self.hub_client.query_hub_service(
                 method='DELETE',
                 api_path=f'/courses/{course_id}/delete'
             )
@@ -45,7 +44,7 @@ class LabCourseService:
 
     async def update_course(self, course_id: str, course_data: 'UpdateCourseRequest') -> LabAPIResponse:
         try:
-            response = self.hub_client.query_hub_service(
+            response = await self.hub_client.query_hub_service(
                 method='PATCH',
                 api_path=f'/courses/{course_id}/update',
                 data=course_data.model_dump(by_alias=True)
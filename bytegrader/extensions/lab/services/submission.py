@@ -1,49 +1,86 @@
+import asyncio
+import json
+import logging
 import os.path
-from urllib.parse import urljoin
 
-import requests
+import aiohttp
 
-from bytegrader.core.models import Submission
-from bytegrader.core.utils.hub import HubApiClient
+from bytegrader.core.exceptions.hub import ByteGraderServiceError
+from bytegrader.core.utils.hub import AsyncHubApiClient
+from bytegrader.core.utils.submission_delta import DELTA_FIELD, delta_codec, delta_content_type, encode_delta, \
+    notebook_cells, source_hashes
 from bytegrader.extensions.lab.schemas.base import LabAPIResponse
 
+# Written next to the fetched files; hashes of the cell sources the service holds for the
+# assignment (fetched stubs and submitted sources). Those cells are submitted by hash.
+SOURCES_STATE_FILE = ".bytegrader-sources.json"
+
 
 class LabSubmissionService:
-    def __init__(self, hub_client: 'HubApiClient'):
+    def __init__(self, hub_client: 'AsyncHubApiClient'):
         self.hub_client = hub_client
 
     async def submit_assignment(self, course_id: str, assignment_id: str) -> LabAPIResponse:
         try:
             base_dir = os.path.join(os.getcwd(), 'courses', course_id, assignment_id)
-            files = []
-            for root, _, filenames in os.walk(base_dir):
-                for fname in filenames:
-                    if not fname.endswith('.ipynb'):
-                        continue
-                    path = os.path.join(root, fname)
-                    rel = os.path.relpath(path, base_dir)
-                    files.append(('notebooks', (rel, open(path, 'rb'), 'application/x-ipynb+json')))
-
-            base_url = self.hub_client.service_url.rstrip("/") + "/"
-            path = f"courses/{course_id}/assignments/{assignment_id}/submit".lstrip("/")
-            url = urljoin(base_url, path)
-
-            headers = {
-                "Authorization": f"token {self.hub_client.api_token}",
-            }
-
-            resp = requests.post(
-                url=url,
-                files=files,
-                headers=headers,
-                timeout=30
-            )
-
-            if resp.ok:
-                data = resp.json()
-                return LabAPIResponse.parse_obj(data)
-            else:
-                return LabAPIResponse.error_response(f"Failed to submit assignment: {resp.text}")
+            loop = asyncio.get_running_loop()
+            known = load_known_sources(base_dir)
+            while True:
+                body, content_type, sent = await loop.run_in_executor(None, _build_delta, base_dir, known)
+                form = aiohttp.FormData()
+                form.add_field(DELTA_FIELD, body, filename=DELTA_FIELD, content_type=content_type)
+                try:
+                    async with self.hub_client.query_hub_service_raw(
+                        method='POST',
+                        api_path=f'/courses/{course_id}/assignments/{assignment_id}/submit',
+                        data=form
+                    ) as resp:
+                        data = await resp.json(content_type=None)
+                    break
+                except ByteGraderServiceError as e:
+                    # The service lacks some of the sources sent by hash; send every source in full
+                    if e.status_code != 409 or not known:
+                        raise
+                    known = set()
+
+            remember_sources(base_dir, sent)
+            return LabAPIResponse.parse_obj(data)
 
+        except ByteGraderServiceError as e:
+            return LabAPIResponse.error_response(f"Failed to submit assignment: {e.response_text or e}")
         except Exception as e:
-            return LabAPIResponse.error_response(f"Failed to submit assignment: {str(e)}")
\ No newline at end of file
+            return LabAPIResponse.error_response(f"Failed to submit assignment: {str(e)}")
+
+
+def _build_delta(base_dir: str, known: set):
+    notebooks = {}
+    for root, dirs, filenames in os.walk(base_dir):
+        # Skips .ipynb_checkpoints and other hidden directories
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for fname in filenames:
+            if not fname.endswith('.ipynb'):
+                continue
+            path = os.path.join(root, fname)
+            with open(path, 'rb') as f:
+                nb = json.load(f)
+            notebooks[os.path.relpath(path, base_dir)] = notebook_cells(nb, known)
+
+    codec = delta_codec()
+    return encode_delta(notebooks, codec), delta_content_type(codec), source_hashes(notebooks)
+
+
+def load_known_sources(base_dir: str) -> set:
+    try:
+        with open(os.path.join(base_dir, SOURCES_STATE_FILE)) as f:
+            return set(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return set()
+
+
+def remember_sources(base_dir: str, hashes: set):
+    try:
+        hashes = load_known_sources(base_dir) | set(hashes)
+        with open(os.path.join(base_dir, SOURCES_STATE_FILE), 'w') as f:
+            json.dump(sorted(hashes), f)
+    except OSError:
+        logging.warning(f"Could not record submitted sources in {base_dir}")
@@ -1,44 +1,63 @@
+import calendar
 import json
 import os
-import uuid
+from datetime import datetime
 
 import nbformat
 from tornado import web
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
 from tornado.web import HTTPError
 
-from .base import BaseHandler
+from .base import BaseHandler, UploadHandler
 from tornado.web import HTTPError
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.exc import IntegrityError
 from ..core.auth import require_permission
 from ..core.auth.decorators import permission_manager
+from ..core.cache import RenderedAssignment
+from ..core.database.codec import compressor
 from ..core.exceptions.database import DatabaseError
+from ..core.observability import set_span_attributes
+from ..core.utils.fetch_archive import ARCHIVE_CODECS, ASSET_PREFIX, METADATA_MEMBER, NOTEBOOK_PREFIX, TAR_END, \
+    negotiate_archive_type, tar_header, tar_padding
+from ..core.utils.multipart import FieldLimits
 from ..schemas.assignment import AssignmentSchema, AssignmentCreateRequest, \
     AssignmentListResponse
 from ..schemas.base import APIResponse, PermissionsSchema
 
+# Size of the chunks written (and flushed) by the streaming assignment fetch
+FETCH_CHUNK_SIZE = 256 * 1024
 
-class AssignmentCreateHandler(BaseHandler):
+
+class AssignmentCreateHandler(UploadHandler):
+
+    def upload_limits(self, upload_cfg):
+        return {
+            'notebooks': FieldLimits(upload_cfg.max_notebook_size, starts_with=b'{'),
+            'assets': FieldLimits(upload_cfg.max_asset_size),
+        }
 
     @web.authenticated
     @require_permission('assignment:create')
     async def post(self, course_id, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             raise HTTPError(status_code=401, log_message="Unauthorized")
 
         try:
-            meta_json = self.get_body_argument("metadata")
+            meta_json = self.get_upload_field("metadata")
             meta = json.loads(meta_json)
             req_model = AssignmentCreateRequest.model_validate(meta)
         except Exception as e:
             raise HTTPError(status_code=400, log_message=f"Invalid request: {e}")
 
-        notebooks = self.request.files.get('notebooks')
+        upload = self.get_upload()
+        notebooks = upload.files.get('notebooks')
         if not notebooks:
             raise HTTPError(status_code=400, log_message="No notebook file provided")
 
-        assets = self.request.files.get('assets')
+        assets = upload.files.get('assets')
 
         try:
             self.log.info(f"Creating assignment for course {course_id} with metadata: {req_model.model_dump()}")
@@ -61,25 +80,21 @@ class AssignmentListHandler(BaseHandler):
     @web.authenticated
     async def get(self, course_id):
         try:
-            raw_user, user = self.resolve_current_user()
+            raw_user, user = await self.resolve_current_user()
             if not raw_user or not user:
                 raise HTTPError(status_code=401, log_message="Unauthorized")
 
-            items = self.assignment_service.list_assignments(course_id, user)
-            raw_assignments = self.assignment_repo.get_by_course(course_id)
-            visible_ids = [a.id for a in items]
-            visible_raw = [a for a in raw_assignments if a.id in visible_ids]
-
-            with self.db_mgr.get_session() as sess:
-                permissions = permission_manager.get_all_permissions(
-                    user,
-                    sess,
-                    resources={'assignment': visible_raw}
-                )
+            after, limit = self.get_page_args((datetime, str))
+            evaluator = await self.get_permission_evaluator()
+            items, visible, next_cursor = await self.assignment_service.list_assignments(
+                course_id, user, evaluator, after=after, limit=limit
+            )
+            permissions = evaluator.get_all_permissions(resources={'assignment': visible})
 
             response = AssignmentListResponse(
                 assignments=items,
-                permissions=PermissionsSchema.model_validate(permissions)
+                permissions=PermissionsSchema.model_validate(permissions),
+                next_cursor=next_cursor
             )
             self.set_status(200)
             self.set_header("Content-Type", "application/json")
@@ -90,12 +105,26 @@ class AssignmentListHandler(BaseHandler):
             raise HTTPError(status_code=500, log_message="Internal server error")
 
 
+def _asset_content_type(path: str) -> str:
+    # Content type (kind of useless in this case)
+    path = path.lower()
+    if path.endswith(('.jpg', '.jpeg')):
+        return "image/jpeg"
+    if path.endswith('.png'):
+        return "image/png"
+    if path.endswith('.txt'):
+        return "text/plain"
+    if path.endswith('.csv'):
+        return "text/csv"
+    return "application/octet-stream"
+
+
 class AssignmentFetchHandler(BaseHandler):
 
     @web.authenticated
     @require_permission('assignment:fetch')
     async def get(self, course_id, assignment_id, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             raise HTTPError(status_code=401, log_message="Unauthorized")
 
@@ -108,72 +137,156 @@ class AssignmentFetchHandler(BaseHandler):
                 raise HTTPError(status_code=403, log_message="You do not have permission to view solutions")
 
         assignment = auth_ctx['assignment']
+        if not assignment or assignment.course_id != course_id:
+            raise HTTPError(status_code=404, log_message="Assignment not found or does not belong to this course")
 
+        # Assignments do not change after creation; the rendered notebooks are cached per variant
+        render_cache = self.application.render_cache
+        key = (assignment.id, assignment.created_at.strftime('%Y%m%d%H%M%S%f'),
+               'solution' if show_solution else 'student')
         try:
-            notebooks, assets = self.assignment_service.fetch_assignment(assignment, show_solution)
+            rendered = await render_cache.get_or_render(key, lambda: self._render(assignment.id, show_solution))
         except PermissionError as e:
             raise HTTPError(status_code=403, log_message=str(e))
+        set_span_attributes({"cache.render.hit_ratio": render_cache.hit_ratio})
+
+        metadata = json.dumps(AssignmentSchema.model_validate(assignment).model_dump(mode='json'))
+        archive_type = negotiate_archive_type(self.request.headers.get("Accept"))
+        etag = rendered.etag(metadata, archive_type or "multipart")
+        self.set_header("Etag", etag)
+        self.set_header("Cache-Control", "private, no-cache")
+        self.set_header("Vary", "Accept")
+        if self.check_etag_header():
+            self.set_status(304)
+            return
 
-        if not assignment or assignment.course_id != course_id:
-            raise HTTPError(status_code=404, log_message="Assignment not found or does not belong to this course")
+        asset_path = self.db_mgr.config.database.asset_path
+        assets = [(path, os.path.join(asset_path, asset_id)) for asset_id, path in rendered.assets] \
+            if asset_path else []
 
-        # I'm sorry for this... Please forgive me. (╯°□°）╯︵ ┻━┻
-        boundary = f"bytegrader-boundary-{uuid.uuid4().hex}"
+        # The body is streamed in fixed-size chunks, flushing after each one, so a fetch holds at
+        # most one chunk of an asset in memory no matter how large the asset is
+        try:
+            if archive_type:
+                await self._write_archive(archive_type, metadata, rendered.notebooks, assets,
+                                          calendar.timegm(assignment.created_at.timetuple()))
+            else:
+                await self._write_multipart(etag, metadata, rendered.notebooks, assets)
+            await self.finish()
+        except StreamClosedError:
+            self.log.debug(f"Client closed the connection while fetching assignment {assignment.id}")
+
+    async def _write_multipart(self, etag: str, metadata: str, notebooks, assets):
+        # Derived from the ETag so that equal ETags always mean byte-identical responses
+        boundary = "bytegrader-boundary-" + etag.strip('"')[:32]
         self.set_header("Content-Type", f"multipart/mixed; boundary={boundary}")
 
-        response_parts = []
+        await self._write_part(
+            boundary,
+            'Content-Type: application/json\r\n'
+            'Content-Disposition: form-data; name="metadata"',
+            metadata.encode()
+        )
 
-        assignment_data = AssignmentSchema.model_validate(assignment).model_dump(mode='json')
-        metadata_json = json.dumps(assignment_data)
-        response_parts.append(
-            f'--{boundary}\r\n'
-            f'Content-Type: application/json\r\n'
-            f'Content-Disposition: form-data; name="metadata"\r\n\r\n'
-            f'{metadata_json}\r\n'
+        for name, body in notebooks:
+            await self._write_part(
+                boundary,
+                'Content-Type: application/json\r\n'
+                f'Content-Disposition: form-data; name="notebook"; filename="{name}"',
+                body
+            )
+
+        for path, file_path in assets:
+            await self._write_asset(boundary, path, file_path)
+
+        self.write(f'--{boundary}--\r\n')
+
+    async def _write_archive(self, archive_type: str, metadata: str, notebooks, assets, mtime: int):
+        self.set_header("Content-Type", archive_type)
+        loop = IOLoop.current()
+        packer = compressor(ARCHIVE_CODECS[archive_type])
+
+        async def emit(data: bytes):
+            # Content chunks are compressed off the event loop and flushed; tar headers and
+            # padding are small and go out with the next flush
+            large = len(data) >= FETCH_CHUNK_SIZE // 4
+            if packer is not None:
+                data = await loop.run_in_executor(None, packer.compress, data) if large else packer.compress(data)
+            if data:
+                self.write(data)
+            if large:
+                await self.flush()
+
+        async def add(name: str, body: bytes):
+            await emit(tar_header(name, len(body), mtime))
+            for start in range(0, len(body), FETCH_CHUNK_SIZE):
+                await emit(body[start:start + FETCH_CHUNK_SIZE])
+            await emit(tar_padding(len(body)))
+
+        await add(METADATA_MEMBER, metadata.encode())
+        for name, body in notebooks:
+            await add(NOTEBOOK_PREFIX + name, body)
+
+        for path, file_path in assets:
+            try:
+                f = await loop.run_in_executor(None, open, file_path, 'rb')
+            except FileNotFoundError:
+                continue
+            try:
+                size = os.fstat(f.fileno()).st_size
+                await emit(tar_header(ASSET_PREFIX + path, size, mtime))
+                remaining = size
+                while remaining > 0:
+                    chunk = await loop.run_in_executor(None, f.read, min(FETCH_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"Asset file {file_path} shrank while it was being sent")
+                    remaining -= len(chunk)
+                    await emit(chunk)
+                await emit(tar_padding(size))
+            finally:
+                f.close()
+
+        await emit(TAR_END)
+        if packer is not None:
+            self.write(packer.flush())
+
+    async def _render(self, assignment_id: str, show_solution: bool) -> RenderedAssignment:
+        assignment = await self.assignment_repo.get_with_notebooks_async(assignment_id, with_sources=True)
+        notebooks, assets = self.assignment_service.fetch_assignment(assignment, show_solution)
+        return RenderedAssignment.build(
+            [(name, nbformat.writes(nb).encode()) for name, nb in notebooks],
+            [(asset.id, asset.path) for asset in assets]
         )
 
-        for name, nb in notebooks:
-            notebook_json = nbformat.writes(nb)
-            response_parts.append(
+    async def _write_part(self, boundary: str, headers: str, body: bytes):
+        self.write(f'--{boundary}\r\n{headers}\r\n\r\n')
+        for start in range(0, len(body), FETCH_CHUNK_SIZE):
+            self.write(body[start:start + FETCH_CHUNK_SIZE])
+            await self.flush()
+        self.write('\r\n')
+
+    async def _write_asset(self, boundary: str, path: str, file_path: str):
+        loop = IOLoop.current()
+        try:
+            f = await loop.run_in_executor(None, open, file_path, 'rb')
+        except FileNotFoundError:
+            return
+
+        try:
+            self.write(
                 f'--{boundary}\r\n'
-                f'Content-Type: application/json\r\n'
-                f'Content-Disposition: form-data; name="notebook"; filename="{name}"\r\n\r\n'
-                f'{notebook_json}\r\n'
+                f'Content-Type: {_asset_content_type(path)}\r\n'
+                f'Content-Disposition: form-data; name="asset"; filename="{path}"\r\n\r\n'
             )
-
-        asset_path = self.db_mgr.config.database.asset_path
-        if asset_path:
-            for asset in assets:
-                file_path = os.path.join(asset_path, asset.id)
-                if os.path.exists(file_path):
-                    # Content type (kind of useless in this case)
-                    content_type = "application/octet-stream"
-                    if asset.path.lower().endswith(('.jpg', '.jpeg')):
-                        content_type = "image/jpeg"
-                    elif asset.path.lower().endswith('.png'):
-                        content_type = "image/png"
-                    elif asset.path.lower().endswith('.txt'):
-                        content_type = "text/plain"
-                    elif asset.path.lower().endswith('.csv'):
-                        content_type = "text/csv"
-
-                    # Binary part header
-                    response_parts.append(
-                        f'--{boundary}\r\n'
-                        f'Content-Type: {content_type}\r\n'
-                        f'Content-Disposition: form-data; name="asset"; filename="{asset.path}"\r\n\r\n'
-                    )
-
-                    self.write("".join(response_parts))
-                    response_parts = []
-
-                    with open(file_path, 'rb') as f:
-                        self.write(f.read())
-                    self.write("\r\n")
-
-        response_parts.append(f'--{boundary}--\r\n')
-        self.write("".join(response_parts))
-        await self.finish()
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, FETCH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.write(chunk)
+                await self.flush()
+            self.write('\r\n')
+        finally:
+            f.close()
 
 
 class AssignmentDeleteHandler(BaseHandler):
@@ -182,11 +295,12 @@ class AssignmentDeleteHandler(BaseHandler):
     @require_permission('assignment:delete')
     async def delete(self, course_id, assignment_id, auth_ctx=None):
         try:
-            raw_user, user = self.resolve_current_user()
+            raw_user, user = await self.resolve_current_user()
             if not raw_user or not user:
                 raise HTTPError(status_code=401, log_message="Unauthorized")
 
             self.assignment_service.delete_assignment(assignment_id, course_id)
+            self.application.render_cache.invalidate(assignment_id)
             self.set_status(200)
             self.set_header("Content-Type", "application/json")
             self.write(APIResponse.success_response("Assignment deleted").model_dump_json(by_alias=True))
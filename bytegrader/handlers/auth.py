@@ -10,7 +10,7 @@ class WhoAmIHandler(BaseHandler):
 
     @web.authenticated
     async def get(self):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             raise HTTPError(status_code=401, log_message="Unauthorized")
 
@@ -1,16 +1,23 @@
+import asyncio
 import logging
 import json
+import math
 from uuid import uuid4
-from typing import Any, TYPE_CHECKING
+from typing import Any, Dict, TYPE_CHECKING
 
 from jupyterhub.services.auth import HubAuthenticated
 from jupyterhub.utils import url_path_join
 from tornado import httputil
 from tornado.log import app_log
-from tornado.web import HTTPError, RequestHandler
+from tornado.web import HTTPError, RequestHandler, stream_request_body
 
+from ..core.auth.decorators import permission_manager
+from ..core.auth.permissions import PermissionEvaluator
+from ..core.exceptions.database import DatabaseError
+from ..core.exceptions.upload import UploadError
 from ..core.observability import capture_exception, set_span_attributes, set_user_context
-from ..core.utils.hub import HubApiClient
+from ..core.utils.pagination import decode_cursor
+from ..core.utils.multipart import FieldLimits, MultipartForm, MultipartParser
 from ..repositories.asset import AssignmentAssetRepository
 from ..repositories.assignment import AssignmentRepository
 from ..repositories.course import CourseRepository
@@ -24,6 +31,13 @@ if TYPE_CHECKING:
     from bytegrader.hub import BYTEGraderApplication
 
 
+class RetryLaterError(HTTPError):
+    # Answered with a Retry-After header (seconds), e.g. for 429 and 503
+    def __init__(self, status_code: int, retry_after: float, log_message: str = None):
+        super().__init__(status_code=status_code, log_message=log_message)
+        self.retry_after = retry_after
+
+
 class BaseHandler(HubAuthenticated, RequestHandler):
     application: "BYTEGraderApplication"
 
@@ -38,7 +52,9 @@ class BaseHandler(HubAuthenticated, RequestHandler):
         self.config = self.settings.get("config")
         self.log = logging.getLogger(__name__)
         self.lti_client = self.application.lti_client
-        self.hub_client = HubApiClient()
+        self.hub_client = self.application.hub_client
+        self._permission_evaluator = None
+        self._resolved_user = None
 
     def _initialize(self):
         super()._initialize()
@@ -68,110 +84,173 @@ class BaseHandler(HubAuthenticated, RequestHandler):
             }
         )
 
-    def resolve_current_user(self):
+    async def resolve_current_user(self):
+        # Resolved once per request, the decorators and the handler body share the result
+        if self._resolved_user is None:
+            self._resolved_user = await self._resolve_current_user()
+        return self._resolved_user
+
+    async def _resolve_current_user(self):
         raw_user = super().get_current_user()
         if not raw_user:
             self.log.warning("No current user")
             return None, None
 
         lms_user_name = raw_user.get("name") if isinstance(raw_user, dict) else None
-        user = None
-        if lms_user_name:
-            user = self.user_repo.get_by_lms_user_id(lms_user_name)
+        if not lms_user_name:
+            self.log.warning("Authenticated user payload missing 'name'")
+            return None, None
 
-        if not user:
-            if not lms_user_name:
-                self.log.warning("Authenticated user payload missing 'name'")
+        user_cache = self.application.user_cache
+        user = user_cache.get(lms_user_name)
+        set_span_attributes(
+            {
+                "cache.user.hit": user is not None,
+                "cache.user.hit_ratio": user_cache.hit_ratio,
+            }
+        )
+        if user is None:
+            user = await user_cache.get_or_load(lms_user_name, lambda: self._load_user(lms_user_name))
+            if user is None:
                 return None, None
 
-            try:
-                hub_user = self.hub_client.query_jupyterhub_api(
-                    "GET",
-                    url_path_join("users", lms_user_name),
-                )
-            except Exception as exc:
-                self.log.error(
-                    "Failed to retrieve JupyterHub user %s: %s", lms_user_name, exc
-                )
-                capture_exception(
-                    exc,
-                    tags={"component": "handler_base", "stage": "fetch_hub_user"},
-                    extra={"lms_user_id": lms_user_name},
-                )
-                return None, None
+        setattr(user, "is_admin", raw_user.get("admin", False))
+        try:
+            from sentry_sdk import set_user
 
-            auth_state = hub_user.get("auth_state") if isinstance(hub_user, dict) else {}
-            if not isinstance(auth_state, dict):
-                auth_state = {}
-
-            user_attrs = {
-                "id": lms_user_name,
-                "lms_user_id": lms_user_name,
-                "first_name": auth_state.get("first_name")
-                or auth_state.get("given_name")
-                or "",
-                "last_name": auth_state.get("last_name")
-                or auth_state.get("family_name")
-                or "",
-                "email": auth_state.get("email") or "",
-                "active": True,
-            }
+            set_user(
+                {
+                    "id": user.id,
+                    "username": getattr(user, "lms_user_id", None),
+                    "is_admin": getattr(user, "is_admin", False),
+                }
+            )
+        except Exception:
+            pass
 
-            try:
-                self.user_repo.create(**user_attrs)
-                user = self.user_repo.get_by_lms_user_id(lms_user_name)
-            except Exception as exc:
-                self.log.error(
-                    "Failed to auto-provision user %s: %s", lms_user_name, exc
-                )
-                capture_exception(
-                    exc,
-                    tags={
-                        "component": "handler_base",
-                        "stage": "auto_provision_user",
-                    },
-                    extra={"lms_user_id": lms_user_name},
-                )
-                return None, None
+        set_user_context(
+            user_id=user.id,
+            username=getattr(user, "lms_user_id", None),
+            is_admin=getattr(user, "is_admin", False),
+        )
+        return raw_user, user
 
-            if not user:
-                self.log.error(
-                    "Auto-provisioned user %s but subsequent lookup returned no record",
-                    lms_user_name,
-                )
-                capture_exception(
-                    RuntimeError("auto_provision_missing_user"),
-                    tags={
-                        "component": "handler_base",
-                        "stage": "auto_provision_lookup",
-                    },
-                    extra={"lms_user_id": lms_user_name},
-                )
-                return None, None
+    async def _load_user(self, lms_user_name: str):
+        user = await self.user_repo.get_by_lms_user_id_async(lms_user_name)
+        if user:
+            return user
 
-            self.log.info("Provisioned user record for %s", lms_user_name)
+        try:
+            hub_user = await self.hub_client.query_jupyterhub_api(
+                "GET",
+                url_path_join("users", lms_user_name),
+            )
+        except Exception as exc:
+            self.log.error(
+                "Failed to retrieve JupyterHub user %s: %s", lms_user_name, exc
+            )
+            capture_exception(
+                exc,
+                tags={"component": "handler_base", "stage": "fetch_hub_user"},
+                extra={"lms_user_id": lms_user_name},
+            )
+            return None
+
+        auth_state = hub_user.get("auth_state") if isinstance(hub_user, dict) else {}
+        if not isinstance(auth_state, dict):
+            auth_state = {}
+
+        user_attrs = {
+            "id": lms_user_name,
+            "lms_user_id": lms_user_name,
+            "first_name": auth_state.get("first_name")
+            or auth_state.get("given_name")
+            or "",
+            "last_name": auth_state.get("last_name")
+            or auth_state.get("family_name")
+            or "",
+            "email": auth_state.get("email") or "",
+            "active": True,
+        }
 
-        if user:
-            setattr(user, "is_admin", raw_user.get("admin", False))
+        # The lookups below must see the new user; a write in a worker thread only pins the copy
+        # of the context it runs in
+        self.db_mgr.pin_primary()
+        try:
             try:
-                from sentry_sdk import set_user
-
-                set_user(
-                    {
-                        "id": user.id,
-                        "username": getattr(user, "lms_user_id", None),
-                        "is_admin": getattr(user, "is_admin", False),
-                    }
-                )
-            except Exception:
-                pass
+                # Writes go through the sync engine, which would block the event loop here
+                await asyncio.to_thread(self.user_repo.create, **user_attrs)
+            except DatabaseError:
+                # Provisioned concurrently by another server process; the lookup finds that record
+                user = await self.user_repo.get_by_lms_user_id_async(lms_user_name)
+                if not user:
+                    raise
+                return user
+            user = await self.user_repo.get_by_lms_user_id_async(lms_user_name)
+        except Exception as exc:
+            self.log.error(
+                "Failed to auto-provision user %s: %s", lms_user_name, exc
+            )
+            capture_exception(
+                exc,
+                tags={
+                    "component": "handler_base",
+                    "stage": "auto_provision_user",
+                },
+                extra={"lms_user_id": lms_user_name},
+            )
+            return None
 
-            set_user_context(
-                user_id=user.id,
-                username=getattr(user, "lms_user_id", None),
-                is_admin=getattr(user, "is_admin", False),
+        if not user:
+            self.log.error(
+                "Auto-provisioned user %s but subsequent lookup returned no record",
+                lms_user_name,
             )
-        return raw_user, user
+            capture_exception(
+                RuntimeError("auto_provision_missing_user"),
+                tags={
+                    "component": "handler_base",
+                    "stage": "auto_provision_lookup",
+                },
+                extra={"lms_user_id": lms_user_name},
+            )
+            return None
+
+        self.log.info("Provisioned user record for %s", lms_user_name)
+        return user
+
+    def get_page_args(self, key_types):
+        # Parses the 'cursor' and 'limit' query arguments of listing endpoints
+        pagination = self.application.config.pagination
+        try:
+            limit = int(self.get_argument("limit", default=str(pagination.default_page_size)))
+        except ValueError:
+            raise HTTPError(status_code=400, log_message="Invalid limit")
+        if limit < 1:
+            raise HTTPError(status_code=400, log_message="Limit must be positive")
+        limit = min(limit, pagination.max_page_size)
+
+        cursor = self.get_argument("cursor", default=None)
+        try:
+            after = decode_cursor(cursor, key_types) if cursor else None
+        except ValueError:
+            raise HTTPError(status_code=400, log_message="Invalid cursor")
+        return after, limit
+
+    async def get_permission_evaluator(self, assignments=()) -> PermissionEvaluator:
+        if self._permission_evaluator is None:
+            raw_user, user = await self.resolve_current_user()
+            if not raw_user or not user:
+                raise HTTPError(status_code=401, log_message="Unauthorized")
+            self._permission_evaluator = PermissionEvaluator(permission_manager, user)
+
+        evaluator = self._permission_evaluator
+        missing = evaluator.missing_submissions(assignments)
+        if missing:
+            evaluator.add_submissions(missing, await self.submission_repo.list_for_user_and_assignments_async(
+                evaluator.user.id, missing, include_archived=True
+            ))
+        return evaluator
 
     @property
     def course_repo(self) -> CourseRepository:
@@ -215,20 +294,23 @@ class BaseHandler(HubAuthenticated, RequestHandler):
     def submission_service(self) -> SubmissionService:
         return SubmissionService(self.submission_repo, self.application.autograde_service)
 
-    @property
-    def db_session(self):
-        return self.db_mgr.Session()
-    
     def initialize(self, *args, **kwargs):
         super().initialize(*args, **kwargs)
         self.request_id = self.request.headers.get("X-Request-ID") or uuid4().hex
         self.set_header("X-Request-ID", self.request_id)
 
+    def prepare(self):
+        # Every request starts on the replica; the pin set by its first write must not leak
+        # into other requests handled by the same connection
+        self.db_mgr.reset_primary_pin()
+
     def write_error(self, status_code: int, **kwargs):
         self.set_header("Content-Type", "application/json")
         reason = self._reason
         if "exc_info" in kwargs:
             exc_type, exc, tb = kwargs["exc_info"]
+            if isinstance(exc, RetryLaterError):
+                self.set_header("Retry-After", str(max(math.ceil(exc.retry_after), 1)))
             app_log.error(f"[{self.request_id}] Unhandled exception: {exc}", exc_info=kwargs["exc_info"])
             if isinstance(exc, HTTPError) and exc.log_message:
                 reason = exc.log_message
@@ -267,3 +349,72 @@ class BaseHandler(HubAuthenticated, RequestHandler):
         }
         self.finish(json.dumps(body))
 
+
+
+@stream_request_body
+class UploadHandler(BaseHandler):
+    # POST bodies are parsed while they arrive instead of being buffered by Tornado. Limits
+    # (UploadConfig and upload_limits) are enforced per chunk; a request that crosses one is
+    # answered right away and the connection is closed without reading the rest of the body.
+    _upload_parser = None
+    _upload_form = None
+
+    def upload_limits(self, upload_cfg) -> Dict[str, FieldLimits]:
+        # File fields accepted by the route; files of other fields are discarded
+        return {}
+
+    def prepare(self):
+        super().prepare()
+        if self.request.method != "POST":
+            return
+
+        upload_cfg = self.application.config.upload
+        length = self.request.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > upload_cfg.max_request_size:
+            raise HTTPError(status_code=413,
+                            log_message=f"Request body exceeds the limit of {upload_cfg.max_request_size} bytes")
+        self.request.connection.set_max_body_size(upload_cfg.max_request_size)
+
+        content_type, params = httputil._parse_header(self.request.headers.get("Content-Type", ""))
+        boundary = params.get("boundary")
+        if content_type != "multipart/form-data" or not boundary:
+            raise HTTPError(status_code=400, log_message="Expected a multipart/form-data body")
+        self._upload_parser = MultipartParser(
+            boundary,
+            self.upload_limits(upload_cfg),
+            max_field_size=upload_cfg.max_field_size,
+            spool_size=upload_cfg.spool_size,
+            spool_dir=upload_cfg.spool_path,
+        )
+
+    def data_received(self, chunk: bytes):
+        if self._finished or self._upload_parser is None:
+            return
+        try:
+            self._upload_parser.feed(chunk)
+        except UploadError as e:
+            self._upload_parser.close()
+            self._upload_parser = None
+            error = HTTPError(status_code=e.status_code, log_message=str(e))
+            self.send_error(e.status_code, exc_info=(HTTPError, error, None))
+
+    def get_upload(self) -> MultipartForm:
+        if self._upload_form is None:
+            if self._upload_parser is None:
+                raise HTTPError(status_code=400, log_message="Expected a multipart/form-data body")
+            try:
+                self._upload_form = self._upload_parser.finish()
+            except UploadError as e:
+                raise HTTPError(status_code=e.status_code, log_message=str(e))
+        return self._upload_form
+
+    def get_upload_field(self, name: str) -> str:
+        values = self.get_upload().fields.get(name)
+        if not values:
+            raise HTTPError(status_code=400, log_message=f"Missing field '{name}'")
+        return values[-1]
+
+    def on_finish(self):
+        if self._upload_parser is not None:
+            self._upload_parser.close()
+        super().on_finish()
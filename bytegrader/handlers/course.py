@@ -7,7 +7,6 @@ from sqlalchemy.exc import IntegrityError
 
 from .base import BaseHandler
 from ..core.auth import require_permission
-from ..core.auth.decorators import permission_manager
 from ..core.exceptions.database import DatabaseError
 from ..schemas.base import APIResponse
 from ..schemas.course import (
@@ -24,7 +23,7 @@ class CourseCreateHandler(BaseHandler):
     @web.authenticated
     @require_permission('course:create')
     async def post(self, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             raise HTTPError(status_code=401, log_message="Unauthorized")
 
@@ -54,25 +53,24 @@ class CourseListHandler(BaseHandler):
 
     @web.authenticated
     async def get(self):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             self.set_status(401)
             self.set_header("Content-Type", "application/json")
             self.write({"error": "Unauthorized"})
             return
 
-        visible_courses = self.course_service.list_courses(user)
-        with self.db_mgr.get_session() as session:
-            permissions = permission_manager.get_all_permissions(
-                user,
-                session,
-                resources={'course': visible_courses}
-            )
+        after, limit = self.get_page_args((str,))
+        visible_courses, next_cursor = await self.course_service.list_courses(user, after=after, limit=limit)
+        evaluator = await self.get_permission_evaluator()
+        permissions = evaluator.get_all_permissions(resources={'course': visible_courses})
 
         course_schemas = [CourseSchema.model_validate(c) for c in visible_courses]
 
         permissions_model = PermissionsSchema.model_validate(permissions)
-        response_model = CourseListResponse(courses=course_schemas, permissions=permissions_model)
+        response_model = CourseListResponse(
+            courses=course_schemas, permissions=permissions_model, next_cursor=next_cursor
+        )
         self.set_header("Content-Type", "application/json")
         self.write(APIResponse.success_response(response_model).model_dump_json(by_alias=True))
 
@@ -82,7 +80,7 @@ class CourseUpdateHandler(BaseHandler):
     @web.authenticated
     @require_permission('course:edit')
     async def patch(self, course_id: str, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             self.set_status(401)
             self.set_header("Content-Type", "application/json")
@@ -100,6 +98,7 @@ class CourseUpdateHandler(BaseHandler):
 
         try:
             course = self.course_service.update_course(course_id, req_model)
+            self.application.user_cache.invalidate_course(course_id)
         except IntegrityError:
             raise HTTPError(status_code=409, log_message="Course update conflicts with existing data")
         except DatabaseError as e:
@@ -118,7 +117,7 @@ class CourseDeleteHandler(BaseHandler):
     @web.authenticated
     @require_permission('course:delete')
     async def delete(self, course_id: str, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             self.set_status(401)
             self.set_header("Content-Type", "application/json")
@@ -127,6 +126,9 @@ class CourseDeleteHandler(BaseHandler):
 
         try:
             self.course_service.delete_course(course_id)
+            # Enrollments of the course are gone with it
+            self.application.user_cache.clear()
+            self.application.render_cache.clear()
         except IntegrityError:
             raise HTTPError(status_code=409, log_message="Unable to delete course, it is referenced by existing records")
         except DatabaseError as e:
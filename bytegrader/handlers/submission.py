@@ -6,33 +6,47 @@ from sqlalchemy.exc import IntegrityError
 from tornado.web import HTTPError
 from tornado.escape import json_decode
 
-from .base import BaseHandler
+from .base import BaseHandler, RetryLaterError, UploadHandler
 from ..core.auth import require_permission
 from ..core.auth.decorators import permission_manager
 from ..core.exceptions.database import DatabaseError
-from ..schemas.assignment import AssignmentSubmissionSchema
+from ..core.exceptions.rate_limit import RateLimitError
+from ..core.exceptions.upload import UploadError
+from ..core.utils.multipart import FieldLimits
+from ..core.utils.submission_delta import DELTA_FIELD, read_delta
+from ..schemas.assignment import AssignmentSubmissionSchema, RegradeStatusSchema
 from ..schemas.base import APIResponse
 
 
-class AssignmentSubmitHandler(BaseHandler):
+class AssignmentSubmitHandler(UploadHandler):
+
+    def upload_limits(self, upload_cfg):
+        return {
+            'notebooks': FieldLimits(upload_cfg.max_notebook_size, starts_with=b'{'),
+            DELTA_FIELD: FieldLimits(upload_cfg.max_notebook_size),
+        }
 
     @web.authenticated
     @require_permission('assignment:submit')
     async def post(self, course_id: str, assignment_id: str, auth_ctx=None):
-        raw_user, user = self.resolve_current_user()
+        raw_user, user = await self.resolve_current_user()
         if not raw_user or not user:
             raise HTTPError(status_code=401, log_message="Unauthorized")
 
-        notebooks = self.request.files.get('notebooks')
-        if not notebooks:
+        upload = self.get_upload()
+        notebooks = upload.files.get('notebooks')
+        deltas = upload.files.get(DELTA_FIELD)
+        if not notebooks and not deltas:
             raise HTTPError(status_code=400, log_message="No notebook file provided")
 
         assignment = auth_ctx.get('assignment')
         if not assignment or assignment.course_id != course_id:
             raise HTTPError(status_code=404, log_message="Assignment not found")
+        assignment = await self.assignment_repo.get_with_notebooks_async(assignment.id)
 
         try:
-            submission = await self.submission_service.submit_assignment(assignment, user, notebooks)
+            cells = read_delta(deltas[0], self.application.config.upload.max_notebook_size) if deltas else None
+            submission = await self.submission_service.submit_assignment(assignment, user, notebooks or [], cells)
             submission_schema = AssignmentSubmissionSchema.model_validate(submission)
             self.set_status(201)
             self.set_header("Content-Type", "application/json")
@@ -41,5 +55,46 @@ class AssignmentSubmitHandler(BaseHandler):
             raise HTTPError(status_code=409, log_message="Submission conflict or invalid data")
         except DatabaseError as e:
             raise HTTPError(status_code=500, log_message="Internal server error")
+        except RateLimitError as e:
+            raise RetryLaterError(e.status_code, e.retry_after, log_message=str(e))
+        except UploadError as e:
+            raise HTTPError(status_code=e.status_code, log_message=str(e))
         except ValueError as e:
-            raise HTTPError(status_code=400, log_message=f"Invalid submission: {e}")
\ No newline at end of file
+            raise HTTPError(status_code=400, log_message=f"Invalid submission: {e}")
+
+
+class AssignmentRegradeHandler(BaseHandler):
+
+    @web.authenticated
+    @require_permission('assignment:regrade')
+    async def get(self, course_id: str, assignment_id: str, auth_ctx=None):
+        assignment = auth_ctx.get('assignment')
+        if not assignment or assignment.course_id != course_id:
+            raise HTTPError(status_code=404, log_message="Assignment not found")
+
+        progress = await self.application.autograde_service.get_regrade_progress(assignment.id)
+        if not progress:
+            raise HTTPError(status_code=404, log_message="No regrade has been started for this assignment")
+
+        self.set_header("Content-Type", "application/json")
+        self.write(APIResponse.success_response(
+            RegradeStatusSchema.model_validate(progress)
+        ).model_dump_json(by_alias=True))
+
+    @web.authenticated
+    @require_permission('assignment:regrade')
+    async def post(self, course_id: str, assignment_id: str, auth_ctx=None):
+        assignment = auth_ctx.get('assignment')
+        if not assignment or assignment.course_id != course_id:
+            raise HTTPError(status_code=404, log_message="Assignment not found")
+
+        try:
+            progress = await self.application.autograde_service.regrade_assignment(assignment.id)
+        except RuntimeError as e:
+            raise HTTPError(status_code=503, log_message=str(e))
+
+        self.set_status(202)
+        self.set_header("Content-Type", "application/json")
+        self.write(APIResponse.success_response(
+            RegradeStatusSchema.model_validate(progress)
+        ).model_dump_json(by_alias=True))
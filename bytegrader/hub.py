@@ -5,14 +5,19 @@ from tornado.web import Application as WebApplication
 
 from .autograde.service import AutogradingService
 from .config.config import BYTEGraderConfig
+from .core.cache import UserCache, RenderCache
+from .core.database.blobs import blob_cache
 from .core.database.connection import DatabaseManager
+from .core.database.migrations import upgrade_database, is_up_to_date
 from .core.exceptions.config import ConfigurationError
+from .core.utils.hub import AsyncHubApiClient
 from .core.utils.lti import LTIClient, LTIConfig
 from .handlers.assignment import AssignmentCreateHandler, AssignmentListHandler, AssignmentFetchHandler, \
     AssignmentDeleteHandler
 from .handlers.auth import WhoAmIHandler
 from .handlers.course import CourseListHandler, CourseCreateHandler, CourseUpdateHandler, CourseDeleteHandler
-from .handlers.submission import AssignmentSubmitHandler
+from .handlers.submission import AssignmentSubmitHandler, AssignmentRegradeHandler
+from .tasks.archive import SubmissionArchiveTask
 from .tasks.lti_sync import LTISyncTask
 from .tasks.scheduler import TaskScheduler
 
@@ -26,53 +31,75 @@ HANDLERS = [
     (r"/courses/(?P<course_id>[^/]+)/assignments/(?P<assignment_id>[^/]+)/delete", AssignmentDeleteHandler),
     (r"/courses/(?P<course_id>[^/]+)/assignments/(?P<assignment_id>[^/]+)/fetch", AssignmentFetchHandler),
     (r"/courses/(?P<course_id>[^/]+)/assignments/(?P<assignment_id>[^/]+)/submit", AssignmentSubmitHandler),
+    (r"/courses/(?P<course_id>[^/]+)/assignments/(?P<assignment_id>[^/]+)/regrade", AssignmentRegradeHandler),
     (r"/auth/whoami", WhoAmIHandler)
 ]
 
 
+def create_lti_client(config: 'BYTEGraderConfig') -> LTIClient | None:
+    if not config.lti.enabled:
+        return None
+
+    try:
+        priv_key = None
+        key_path = config.lti.key_path
+        if key_path:
+            try:
+                with open(key_path, 'r') as f:
+                    priv_key = f.read()
+            except Exception as e:
+                logging.error(f"Failed to read LTI private key from {key_path}: {e}")
+                raise ConfigurationError(
+                    f"Failed to read LTI private key from {key_path}: {e}"
+                ) from e
+        lti_cfg = LTIConfig(
+            client_id=config.lti.client_id,
+            platform_url=config.lti.lms_url,
+            token_url=config.lti.token_url,
+            private_key=priv_key,
+            platform=config.lti.platform,
+            lms_lti_url=config.lti.lti_url,
+            nrps_url=config.lti.nrps_url,
+            timeout=30,
+        )
+        return LTIClient(lti_cfg)
+    except Exception as e:
+        logging.error(f"Failed to initialize LTI client: {e}")
+        return None
+
+
 class BYTEGraderApplication(WebApplication):
     def __init__(self,
                  handlers,
                  db_uri: str,
                  config: 'BYTEGraderConfig',
+                 migrate: bool = True,
                  **settings
                  ):
         super().__init__(handlers, **settings)
         self.config = config
         self.db_mgr = DatabaseManager(db_uri, config)
-        self.db_mgr.create_tables()
-
-        if self.config.lti.enabled:
-            try:
-                priv_key = None
-                key_path = self.config.lti.key_path
-                if key_path:
-                    try:
-                        with open(key_path, 'r') as f:
-                            priv_key = f.read()
-                    except Exception as e:
-                        self.log.error(f"Failed to read LTI private key from {key_path}: {e}")
-                        raise ConfigurationError(
-                            f"Failed to read LTI private key from {key_path}: {e}"
-                        ) from e
-                lti_cfg = LTIConfig(
-                    client_id=self.config.lti.client_id,
-                    platform_url=self.config.lti.lms_url,
-                    token_url=self.config.lti.token_url,
-                    private_key=priv_key,
-                    platform=self.config.lti.platform,
-                    lms_lti_url=self.config.lti.lti_url,
-                    nrps_url=self.config.lti.nrps_url,
-                    timeout=30,
-                )
-                self.lti_client = LTIClient(lti_cfg)
-            except Exception as e:
-                logging.error(f"Failed to initialize LTI client: {e}")
-                self.lti_client = None
-        else:
-            self.lti_client = None
-
-        self.autograde_service = AutogradingService(self.config, self.db_mgr, self.lti_client)
+        # migrate=False when the schema was already upgraded, e.g. before forking server processes
+        if migrate and self.config.database.auto_migrate:
+            upgrade_database(self.db_mgr)
+        elif not is_up_to_date(self.db_mgr):
+            raise ConfigurationError("Database schema is out of date. Run 'bytegrader db upgrade' first.")
+
+        self.lti_client = create_lti_client(self.config)
+        self.hub_client = AsyncHubApiClient()
+        user_ttl = self.config.cache.user_ttl
+        if self.config.autograde.queue == "database":
+            # The LTI sync in 'bytegrader grader' and any other server process change enrollments
+            # without reaching this cache; bounded staleness instead of invalidation
+            user_ttl = min(user_ttl, self.config.cache.user_shared_ttl)
+        self.user_cache = UserCache(maxsize=self.config.cache.user_maxsize, ttl=user_ttl)
+        blob_cache.resize(self.config.cache.blob_maxsize)
+        self.render_cache = RenderCache(maxsize=self.config.cache.render_maxsize,
+                                        spill_path=self.config.cache.render_spill_path)
+
+        # With the database queue, grading runs in 'bytegrader grader' and this process only enqueues
+        self.autograde_service = AutogradingService(self.config, self.db_mgr, self.lti_client,
+                                                    run_workers=self.config.autograde.queue == "memory")
 
     def start_services(self):
         self.autograde_service.log.info("Starting autograding service...")
@@ -86,7 +113,7 @@ class BYTEGraderHubApp:
         self.log = logging.getLogger(__name__)
         self.scheduler = None
 
-    def create_tornado_app(self, prefix: str = "") -> WebApplication:
+    def create_tornado_app(self, prefix: str = "", migrate: bool = True) -> WebApplication:
         self.log.debug("Creating Tornado app with prefix %s", prefix)
         routes = [
             (f"{prefix.rstrip('/')}{pattern}", handler)
@@ -102,23 +129,13 @@ class BYTEGraderHubApp:
             'compress_response': True,
         }
 
-        app = BYTEGraderApplication(routes, db_uri=self.config.database.uri, config=self.config, **settings)
+        app = BYTEGraderApplication(routes, db_uri=self.config.database.uri, config=self.config, migrate=migrate,
+                                    **settings)
 
         loop = asyncio.get_event_loop()
 
-        self.scheduler = TaskScheduler(self.config)
-
-        if self.config.lti.enabled and self.config.lti.sync_task.enabled:
-            lti_sync = LTISyncTask(self.config, app.db_mgr)
-            loop.run_until_complete(lti_sync.sync())
-            self.scheduler.add_job(
-                func=lti_sync.sync,
-                job_id="lti_sync",
-                interval=self.config.lti.sync_task.interval,
-            )
-            self.log.info("LTI sync task is enabled.")
-
-        self.scheduler.start()
+        if self.config.autograde.queue == "memory":
+            self.start_tasks(app.db_mgr, user_cache=app.user_cache)
 
         loop.call_soon(app.start_services)
 
@@ -132,3 +149,31 @@ class BYTEGraderHubApp:
                 self.log.debug(f"Asset directory already exists at {asset_path}")
 
         return app
+
+    def start_tasks(self, db_mgr: DatabaseManager, user_cache: UserCache = None):
+        # Periodic tasks run once per deployment: in the serving process, or with the database
+        # queue in 'bytegrader grader'
+        loop = asyncio.get_event_loop()
+
+        self.scheduler = TaskScheduler(self.config)
+
+        if self.config.lti.enabled and self.config.lti.sync_task.enabled:
+            lti_sync = LTISyncTask(self.config, db_mgr, user_cache=user_cache)
+            loop.run_until_complete(lti_sync.sync())
+            self.scheduler.add_job(
+                func=lti_sync.sync,
+                job_id="lti_sync",
+                interval=self.config.lti.sync_task.interval,
+            )
+            self.log.info("LTI sync task is enabled.")
+
+        if self.config.archive.enabled:
+            archive_task = SubmissionArchiveTask(self.config, db_mgr)
+            self.scheduler.add_job(
+                func=archive_task.run,
+                job_id="submission_archive",
+                interval=self.config.archive.interval,
+            )
+            self.log.info("Submission archive task is enabled.")
+
+        self.scheduler.start()
@@ -9,5 +9,5 @@ class AssignmentAssetRepository(BaseRepository[AssignmentAssetModel]):
         super().__init__(AssignmentAssetModel, db_manager)
 
     def list_by_assignment(self, assignment_id: str) -> List[AssignmentAssetModel]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             return session.query(self.model).filter_by(assignment_id=assignment_id).all()
\ No newline at end of file
@@ -1,9 +1,14 @@
-from typing import List
-from sqlalchemy.orm import selectinload
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload, joinedload, load_only
 
+from ..core.database.blobs import load_texts
 from ..core.exceptions import DatabaseError
 from ..core.models.course import Assignment as AssignmentModel
 from ..core.models.notebook import Notebook
+from ..core.utils.pagination import keyset_page
 from .base import BaseRepository
 
 
@@ -12,7 +17,7 @@ class AssignmentRepository(BaseRepository[AssignmentModel]):
         super().__init__(AssignmentModel, db_manager)
 
     def get_by_course_and_name(self, course_id: str, name: str) -> AssignmentModel:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 return session.query(self.model) \
                     .filter_by(course_id=course_id, name=name) \
@@ -21,7 +26,7 @@ class AssignmentRepository(BaseRepository[AssignmentModel]):
                 raise DatabaseError(f"Failed to retrieve assignment '{name}' for course '{course_id}': {e}") from e
 
     def get_by_course(self, course_id: str) -> List[AssignmentModel]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 return (
                     session.query(self.model)
@@ -35,3 +40,62 @@ class AssignmentRepository(BaseRepository[AssignmentModel]):
                 )
             except Exception as e:
                 raise DatabaseError(f"Failed to retrieve assignments for course '{course_id}': {e}") from e
+
+    async def get_by_course_async(self, course_id: str) -> List[AssignmentModel]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                result = await session.execute(
+                    select(self.model)
+                    .options(
+                        selectinload(AssignmentModel.course),
+                        selectinload(AssignmentModel.notebooks)
+                    )
+                    .filter_by(course_id=course_id)
+                )
+                return list(result.scalars().all())
+            except Exception as e:
+                raise DatabaseError(f"Failed to retrieve assignments for course '{course_id}': {e}") from e
+
+    async def list_for_listing_async(self, course_id: str, after: Optional[Tuple[datetime, str]] = None,
+                                     limit: Optional[int] = None) -> List[AssignmentModel]:
+        # Listing read model: course joined in, notebooks reduced to the columns the listing
+        # shows. Cells are never loaded, so the cost does not depend on notebook size.
+        # Ordered by (created_at, id); with a limit, up to limit + 1 rows after the key.
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                query = select(self.model) \
+                    .options(
+                        joinedload(AssignmentModel.course),
+                        selectinload(AssignmentModel.notebooks).load_only(
+                            Notebook.id, Notebook.assignment_id, Notebook.name, Notebook.idx, Notebook.max_score
+                        )
+                    ) \
+                    .filter_by(course_id=course_id)
+                order = (AssignmentModel.created_at, AssignmentModel.id)
+                if limit is None:
+                    query = query.order_by(*order)
+                else:
+                    query = keyset_page(query, order, after, limit)
+                result = await session.execute(query)
+                return list(result.scalars().all())
+            except Exception as e:
+                raise DatabaseError(f"Failed to retrieve assignments for course '{course_id}': {e}") from e
+
+    async def get_with_notebooks_async(self, assignment_id: str,
+                                       with_sources: bool = False) -> Optional[AssignmentModel]:
+        options = (
+            selectinload(AssignmentModel.course),
+            selectinload(AssignmentModel.notebooks).selectinload(Notebook.cells),
+        )
+        if not with_sources:
+            return await self.get_async(assignment_id, options=options)
+
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                assignment = await session.get(self.model, assignment_id, options=options)
+                if assignment:
+                    cells = [cell for notebook in assignment.notebooks for cell in notebook.cells]
+                    await session.run_sync(load_texts, cells)
+                return assignment
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve assignment with id {assignment_id}: {str(e)}") from e
@@ -1,4 +1,5 @@
-from typing import TypeVar, Generic, Optional, List, Type
+from typing import TypeVar, Generic, Optional, List, Type, Iterator
+from sqlalchemy import select, inspect, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..core.database.connection import DatabaseManager
@@ -35,21 +36,48 @@ class BaseRepository(Generic[T]):
                 raise DatabaseError(f"Failed to persist instance of {self.model.__name__}: {str(e)}") from e
 
     def get(self, id: str) -> Optional[T]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 instance = session.query(self.model).get(id)
                 return instance
             except SQLAlchemyError as e:
                 raise DatabaseError(f"Failed to retrieve {self.model.__name__} with id {id}: {str(e)}") from e
 
+    async def get_async(self, id: str, options: tuple = ()) -> Optional[T]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                return await session.get(self.model, id, options=options)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve {self.model.__name__} with id {id}: {str(e)}") from e
+
     def get_all(self, skip: int = 0, limit: int = 100) -> List[T]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 instances = session.query(self.model).offset(skip).limit(limit).all()
                 return instances
             except SQLAlchemyError as e:
                 raise DatabaseError(f"Failed to retrieve {self.model.__name__} records: {str(e)}") from e
 
+    def iter_all(self, batch_size: int = 500) -> Iterator[T]:
+        # Walks the whole table in primary key order, one keyset batch per session
+        mapper = inspect(self.model)
+        pk = mapper.primary_key
+        pk_attrs = [mapper.get_property_by_column(column).key for column in pk]
+        after = None
+        while True:
+            with self.db_manager.get_session(readonly=True) as session:
+                try:
+                    query = select(self.model).order_by(*pk).limit(batch_size)
+                    if after is not None:
+                        query = query.where(tuple_(*pk) > tuple_(*after))
+                    batch = list(session.execute(query).scalars().all())
+                except SQLAlchemyError as e:
+                    raise DatabaseError(f"Failed to retrieve {self.model.__name__} records: {str(e)}") from e
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = tuple(getattr(batch[-1], attr) for attr in pk_attrs)
+
     def update(self, id: str, **kwargs) -> Optional[T]:
         with self.db_manager.get_session() as session:
             try:
@@ -1,7 +1,12 @@
-from typing import List
+from typing import List, Dict, Optional, Tuple
 
-from ..core.models import Submission
+from sqlalchemy import select, func, distinct, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core.exceptions import DatabaseError
+from ..core.models import Submission, Assignment, Enrollment
 from ..core.models.course import Course as CourseModel
+from ..core.utils.pagination import keyset_page
 from .base import BaseRepository
 
 
@@ -9,37 +14,83 @@ class CourseRepository(BaseRepository[CourseModel]):
     def __init__(self, db_manager):
         super().__init__(CourseModel, db_manager)
 
-    def list_all(self, skip: int = 0, limit: int = 100) -> List[CourseModel]:
-        return self.get_all(skip=skip, limit=limit)
+    def list_all(self) -> List[CourseModel]:
+        return list(self.iter_all())
 
     def get_by_lti_id(self, lti_id: str) -> CourseModel:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             course = session.query(self.model).filter_by(lti_id=lti_id).first()
             if not course:
                 raise ValueError(f"Course with LTI ID {lti_id} not found.")
             return course
 
     def get_progress_by_user_and_course(self, user_id: str, course_id: str) -> float:
-        with self.db_manager.get_session() as session:
-            course = session.query(self.model).filter_by(label=course_id).first()
-            if not course:
+        with self.db_manager.get_session(readonly=True) as session:
+            if not session.get(self.model, course_id):
                 raise ValueError(f"Course with ID {course_id} not found.")
 
-            if not course.assignments:
+            total_assignments = session.query(func.count(Assignment.id)) \
+                .filter(Assignment.course_id == course_id) \
+                .scalar()
+            if not total_assignments:
                 return 100.0
 
-            completed_count = 0
-            total_assignments = len(course.assignments)
-
-            for assignment in course.assignments:
-                submission = session.query(Submission).filter_by(
-                    assignment_id=assignment.id,
-                    user_id=user_id
-                ).first()
-
-                if submission:
-                    if submission.total_score >= assignment.max_score or not assignment.allow_resubmission:
-                        completed_count += 1
+            completed_count = session.query(func.count(distinct(Submission.assignment_id))) \
+                .join(Assignment, Assignment.id == Submission.assignment_id) \
+                .filter(
+                    Assignment.course_id == course_id,
+                    Submission.user_id == user_id,
+                    or_(Submission.total_score >= Assignment.max_score, Assignment.allow_resubmission == False)
+                ) \
+                .scalar()
 
             progress = (completed_count / total_assignments) * 100.0
             return progress
+
+    async def list_for_user_async(self, user_id: str, is_admin: bool = False,
+                                  after: Optional[Tuple[str]] = None, limit: Optional[int] = None) -> List[CourseModel]:
+        # With a limit, returns up to limit + 1 courses after the given label so callers can
+        # tell whether another page follows
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                query = select(self.model)
+                if not is_admin:
+                    query = query.join(Enrollment, Enrollment.course_id == self.model.label) \
+                        .where(Enrollment.user_id == user_id)
+                if limit is None:
+                    query = query.order_by(self.model.label)
+                else:
+                    query = keyset_page(query, (self.model.label,), after, limit)
+                result = await session.execute(query)
+                return list(result.scalars().all())
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve courses for user {user_id}: {str(e)}") from e
+
+    async def get_progress_by_user_async(self, user_id: str, course_ids: List[str]) -> Dict[str, float]:
+        if not course_ids:
+            return {}
+
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                totals = dict((await session.execute(
+                    select(Assignment.course_id, func.count(Assignment.id))
+                    .where(Assignment.course_id.in_(course_ids))
+                    .group_by(Assignment.course_id)
+                )).all())
+                completed = dict((await session.execute(
+                    select(Assignment.course_id, func.count(distinct(Submission.assignment_id)))
+                    .join(Assignment, Assignment.id == Submission.assignment_id)
+                    .where(
+                        Assignment.course_id.in_(course_ids),
+                        Submission.user_id == user_id,
+                        or_(Submission.total_score >= Assignment.max_score, Assignment.allow_resubmission == False)
+                    )
+                    .group_by(Assignment.course_id)
+                )).all())
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to compute progress for user {user_id}: {str(e)}") from e
+
+        return {
+            course_id: (completed.get(course_id, 0) / totals[course_id]) * 100.0 if totals.get(course_id) else 100.0
+            for course_id in course_ids
+        }
@@ -1,8 +1,15 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload
 
-from ..core.models import Submission as SubmissionModel, NotebookSubmission
+from ..core.database.archive import archive_submission_trees, restore_submission_tree
+from ..core.database.blobs import prune_blobs
+from ..core.database.bulk import BULK_BATCH_SIZE
+from ..core.exceptions import DatabaseError
+from ..core.models import Submission as SubmissionModel
 from ..core.models.enum import SubmissionStatus
 from .base import BaseRepository
 
@@ -12,14 +19,11 @@ class SubmissionRepository(BaseRepository[SubmissionModel]):
         super().__init__(SubmissionModel, db_manager)
 
     def list_for_user_and_assignments(self, user_id: str, assignment_ids: list[str], include_archived: bool = False):
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             query = (
                 session.query(SubmissionModel)
                 .options(
                     joinedload(SubmissionModel.assignment),
-                    joinedload(SubmissionModel.notebook_submissions).joinedload(
-                        NotebookSubmission.grades
-                    ),
                 )
                 .filter(
                     SubmissionModel.user_id == user_id,
@@ -31,3 +35,79 @@ class SubmissionRepository(BaseRepository[SubmissionModel]):
                 query = query.filter(SubmissionModel.status != SubmissionStatus.ARCHIVED)
             
             return query.all()
+
+    async def list_for_user_and_assignments_async(self, user_id: str, assignment_ids: list[str],
+                                                  include_archived: bool = False) -> List[SubmissionModel]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            query = (
+                select(SubmissionModel)
+                .options(
+                    selectinload(SubmissionModel.assignment),
+                )
+                .filter(
+                    SubmissionModel.user_id == user_id,
+                    SubmissionModel.assignment_id.in_(assignment_ids)
+                )
+            )
+
+            if not include_archived:
+                query = query.filter(SubmissionModel.status != SubmissionStatus.ARCHIVED)
+
+            result = await session.execute(query)
+            return list(result.scalars().all())
+
+    async def list_latest_for_user_async(self, user_id: str, assignment_ids: list[str]) -> List[SubmissionModel]:
+        # All of the user's submissions (archived included), newest first, with the assignment
+        # joined in for is_late. Feeds both the listing and the permission evaluator.
+        if not assignment_ids:
+            return []
+
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            result = await session.execute(
+                select(SubmissionModel)
+                .options(joinedload(SubmissionModel.assignment))
+                .filter(
+                    SubmissionModel.user_id == user_id,
+                    SubmissionModel.assignment_id.in_(assignment_ids)
+                )
+                .order_by(SubmissionModel.created_at.desc())
+            )
+            return list(result.scalars().all())
+
+    def archive_to_cold_storage(self, older_than: datetime, limit: int = 200, codec: str = "zlib") -> int:
+        # Moves up to limit ARCHIVED submissions, archived before older_than, with their trees
+        # into archived_submissions. Returns the number moved; 0 once nothing is left.
+        with self.db_manager.get_session() as session:
+            try:
+                ids = list(session.scalars(
+                    select(SubmissionModel.id)
+                    .where(
+                        SubmissionModel.status == SubmissionStatus.ARCHIVED,
+                        SubmissionModel.updated_at < older_than
+                    )
+                    .order_by(SubmissionModel.id)
+                    .limit(limit)
+                ))
+                return archive_submission_trees(session, ids, codec)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to move archived submissions to cold storage: {str(e)}") from e
+
+    def prune_source_blobs(self, created_before: datetime, limit: int = BULK_BATCH_SIZE) -> int:
+        # Deletes up to limit source blobs no cell or cell submission references any more, such
+        # as those of submissions moved to cold storage. Returns the number deleted.
+        with self.db_manager.get_session() as session:
+            try:
+                return prune_blobs(session, created_before, limit)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to prune source blobs: {str(e)}") from e
+
+    def restore_from_cold_storage(self, submission_id: str) -> Optional[SubmissionModel]:
+        # Moves a submission tree back into the hot tables, it keeps its ARCHIVED status
+        with self.db_manager.get_session() as session:
+            try:
+                if not restore_submission_tree(session, submission_id):
+                    return None
+                session.flush()
+                return session.get(SubmissionModel, submission_id)
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to restore submission {submission_id}: {str(e)}") from e
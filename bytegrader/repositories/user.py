@@ -1,8 +1,9 @@
-from typing import Optional
+from typing import Optional, Dict, List
+from sqlalchemy import select, func
 from sqlalchemy.exc import SQLAlchemyError
 from ..core.exceptions import DatabaseError
 from ..core.models import User, Enrollment
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from .base import BaseRepository
 from ..core.database.connection import DatabaseManager
 from ..core.models.enum import UserRole
@@ -13,7 +14,7 @@ class UserRepository(BaseRepository[User]):
         super().__init__(User, db_mgr)
 
     def get_by_lms_user_id(self, lms_user_id: str) -> Optional[User]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 user = (
                     session.query(self.model)
@@ -25,13 +26,26 @@ class UserRepository(BaseRepository[User]):
             except SQLAlchemyError as e:
                 raise DatabaseError(f"Failed to retrieve User with lms_user_id {lms_user_id}: {str(e)}") from e
 
+    async def get_by_lms_user_id_async(self, lms_user_id: str) -> Optional[User]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                result = await session.execute(
+                    select(self.model)
+                    .options(selectinload(self.model.enrollments))
+                    .filter_by(lms_user_id=lms_user_id)
+                    .limit(1)
+                )
+                return result.scalars().first()
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve User with lms_user_id {lms_user_id}: {str(e)}") from e
+
 
 class EnrollmentRepository(BaseRepository[Enrollment]):
     def __init__(self, db_mgr: DatabaseManager):
         super().__init__(Enrollment, db_mgr)
 
     def get_by_user_and_course(self, user_id: str, course_id: str) -> Optional[Enrollment]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 enrollment = session.query(self.model).filter_by(
                     user_id=user_id,
@@ -43,8 +57,21 @@ class EnrollmentRepository(BaseRepository[Enrollment]):
                 raise DatabaseError(
                     f"Failed to retrieve Enrollment for user {user_id} in course {course_id}: {str(e)}") from e
 
+    async def get_by_user_and_course_async(self, user_id: str, course_id: str,
+                                           include_inactive: bool = False) -> Optional[Enrollment]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                query = select(self.model).filter_by(user_id=user_id, course_id=course_id)
+                if not include_inactive:
+                    query = query.filter_by(active=True)
+                result = await session.execute(query.limit(1))
+                return result.scalars().first()
+            except SQLAlchemyError as e:
+                raise DatabaseError(
+                    f"Failed to retrieve Enrollment for user {user_id} in course {course_id}: {str(e)}") from e
+
     def get_by_course(self, course_id: str) -> list[Enrollment]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 enrollments = session.query(self.model).filter_by(
                     course_id=course_id,
@@ -54,8 +81,18 @@ class EnrollmentRepository(BaseRepository[Enrollment]):
             except SQLAlchemyError as e:
                 raise DatabaseError(f"Failed to retrieve Enrollments for course {course_id}: {str(e)}") from e
 
+    async def get_by_course_async(self, course_id: str) -> list[Enrollment]:
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                result = await session.execute(
+                    select(self.model).filter_by(course_id=course_id, active=True)
+                )
+                return list(result.scalars().all())
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve Enrollments for course {course_id}: {str(e)}") from e
+
     def list_instructors_by_course(self, course_id: str) -> list[User]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 instructors = (
                     session.query(User)
@@ -69,7 +106,7 @@ class EnrollmentRepository(BaseRepository[Enrollment]):
                 raise DatabaseError(f"Failed to retrieve Instructors for course {course_id}: {str(e)}") from e
 
     def list_students_by_course(self, course_id: str) -> list[User]:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 students = (
                     session.query(User)
@@ -82,7 +119,7 @@ class EnrollmentRepository(BaseRepository[Enrollment]):
                 raise DatabaseError(f"Failed to retrieve Students for course {course_id}: {str(e)}") from e
 
     def get_student_count_by_course(self, course_id: str) -> int:
-        with self.db_manager.get_session() as session:
+        with self.db_manager.get_session(readonly=True) as session:
             try:
                 count = (
                     session.query(User)
@@ -93,3 +130,40 @@ class EnrollmentRepository(BaseRepository[Enrollment]):
                 return count
             except SQLAlchemyError as e:
                 raise DatabaseError(f"Failed to count Students for course {course_id}: {str(e)}") from e
+
+    async def list_instructor_names_by_courses_async(self, course_ids: List[str]) -> Dict[str, List[str]]:
+        if not course_ids:
+            return {}
+
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                result = await session.execute(
+                    select(Enrollment.course_id, User)
+                    .join(User, User.id == Enrollment.user_id)
+                    .where(Enrollment.course_id.in_(course_ids), Enrollment.role == UserRole.INSTRUCTOR,
+                           Enrollment.active == True)
+                    .order_by(Enrollment.course_id, User.id)
+                )
+                names: Dict[str, List[str]] = {course_id: [] for course_id in course_ids}
+                for course_id, user in result.all():
+                    names[course_id].append(user.full_name)
+                return names
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to retrieve Instructors for courses: {str(e)}") from e
+
+    async def count_students_by_courses_async(self, course_ids: List[str]) -> Dict[str, int]:
+        if not course_ids:
+            return {}
+
+        async with self.db_manager.get_async_session(readonly=True) as session:
+            try:
+                result = await session.execute(
+                    select(Enrollment.course_id, func.count(Enrollment.id))
+                    .where(Enrollment.course_id.in_(course_ids), Enrollment.role == UserRole.STUDENT,
+                           Enrollment.active == True)
+                    .group_by(Enrollment.course_id)
+                )
+                counts = dict(result.all())
+                return {course_id: counts.get(course_id, 0) for course_id in course_ids}
+            except SQLAlchemyError as e:
+                raise DatabaseError(f"Failed to count Students for courses: {str(e)}") from e
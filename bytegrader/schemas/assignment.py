@@ -1,10 +1,11 @@
 from typing import Optional, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 
 from .base import PermissionsSchema
 from ..core.models.enum import ShowSolutionsOption
+from ..core.utils.datetime import parse_duration
 
 
 class AssignmentSchema(BaseModel):
@@ -29,6 +30,14 @@ class AssignmentCreateRequest(BaseModel):
     allow_late_submission: bool
     show_solutions: ShowSolutionsOption
     lti_sync: bool
+    # Overrides AutogradeConfig.cooldown_period, e.g. '30m'
+    cooldown_period: Optional[str] = None
+
+    @field_validator('cooldown_period')
+    def check_cooldown_period(cls, v):
+        if v is not None:
+            parse_duration(v)
+        return v
 
 
 class NotebookSchema(BaseModel):
@@ -72,3 +81,18 @@ class AssignmentListItemSchema(BaseModel):
 class AssignmentListResponse(BaseModel):
     assignments: list[AssignmentListItemSchema]
     permissions: PermissionsSchema
+    next_cursor: Optional[str] = None
+
+
+class RegradeStatusSchema(BaseModel):
+    assignment_id: str
+    total: int
+    enqueued: int
+    completed: int
+    failed: int
+    done: bool
+    eta_seconds: Optional[float]
+    started_at: datetime
+    finished_at: Optional[datetime]
+
+    model_config = {"from_attributes": True}
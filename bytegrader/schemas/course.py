@@ -40,6 +40,7 @@ class CreateCourseResponse(BaseModel):
 class CourseListResponse(BaseModel):
     courses: List[CourseSchema]
     permissions: PermissionsSchema
+    next_cursor: Optional[str] = None
 
 
 class UpdateCourseRequest(BaseModel):
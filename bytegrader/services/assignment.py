@@ -4,16 +4,23 @@ import os.path
 from datetime import datetime, timezone
 
 import nbformat
-from tornado.httputil import HTTPFile
 
 from bytegrader.repositories.submission import SubmissionRepository
 from ..core.auth.decorators import permission_manager
+from ..core.auth.permissions import PermissionEvaluator
 from ..core.database.connection import DatabaseManager
+from ..core.database.blobs import store_texts, store_options
+from ..core.database.bulk import bulk_insert
+from ..core.database.scores import refresh_max_scores
 from ..core.exceptions import DatabaseError
 from ..core.models import AssignmentAsset
 from ..core.models.base import new_uuid
-from ..core.models.enum import CellType
+from ..core.utils.pagination import split_page
+from ..core.models.enum import CellType, SubmissionStatus
+from ..core.utils.datetime import parse_duration
 from ..core.utils.lti import LTIClient
+from ..core.utils.multipart import UploadedFile
+from ..core.utils.notebook import read_notebook
 from ..preprocessors.factory import ProcessorFactory
 from ..repositories.asset import AssignmentAssetRepository
 from ..repositories.assignment import AssignmentRepository
@@ -43,8 +50,8 @@ class AssignmentService:
             self,
             req_model: AssignmentCreateRequest,
             course_id: str,
-            notebooks: list[HTTPFile],
-            assets: list[HTTPFile] = None
+            notebooks: list[UploadedFile],
+            assets: list[UploadedFile] = None
     ) -> AssignmentModel:
         existing = self.repo.get_by_course_and_name(course_id, req_model.name)
         if existing:
@@ -61,6 +68,8 @@ class AssignmentService:
             allow_resubmission=req_model.allow_resubmission,
             allow_late_submission=req_model.allow_late_submission,
             show_solutions=req_model.show_solutions,
+            submission_cooldown=round(parse_duration(req_model.cooldown_period))
+            if req_model.cooldown_period is not None else None,
             created_at=datetime.now().replace(tzinfo=timezone.utc)
         )
 
@@ -70,10 +79,8 @@ class AssignmentService:
 
         # Deconstruct notebooks
         for nb_idx, notebook in enumerate(notebooks):
-            content = notebook.body.decode("utf-8")
             try:
-                nb = nbformat.reads(content, nbformat.current_nbformat)
-                nbformat.validate(nb)
+                nb = read_notebook(notebook.body)
             except Exception as e:
                 raise ValueError(f"Invalid notebook file: {e}")
 
@@ -88,14 +95,14 @@ class AssignmentService:
             except Exception as e:
                 raise ValueError(f"Failed to process notebook: {e}")
 
-            nb_model = Notebook(
-                id=new_uuid(),
-                assignment_id=assignment.id,
-                name=notebook.filename,
-                idx=nb_idx,
-                kernelspec=json.dumps(kernelspec),
-                created_at=datetime.now().replace(tzinfo=timezone.utc),
-            )
+            nb_model = {
+                "id": new_uuid(),
+                "assignment_id": assignment.id,
+                "name": notebook.filename,
+                "idx": nb_idx,
+                "kernelspec": json.dumps(kernelspec),
+                "created_at": datetime.now().replace(tzinfo=timezone.utc),
+            }
 
             for cell_idx, nb_cell in enumerate(nb.cells):
                 student_cell = student_nb['cells'][cell_idx] if cell_idx < len(student_nb['cells']) else None
@@ -138,22 +145,22 @@ class AssignmentService:
                     else:
                         student_src = student_src_raw or ""
 
-                cell = Cell(
-                    id=cell_id,
-                    notebook_id=nb_model.id,
-                    name=cell_name,
-                    idx=cell_idx,
-                    cell_type=cell_type,
-                    source=cell_src,
-                    source_student=student_src,
-                    is_grade=is_grade,
-                    is_solution=is_solution,
-                    is_locked=is_locked,
-                    is_task=is_task,
-                    max_score=max_score,
-                    created_at=datetime.now().replace(tzinfo=timezone.utc),
-                    meta=json.dumps(cell_meta),
-                )
+                cell = {
+                    "id": cell_id,
+                    "notebook_id": nb_model["id"],
+                    "name": cell_name,
+                    "idx": cell_idx,
+                    "cell_type": cell_type,
+                    "source": cell_src,
+                    "source_student": student_src,
+                    "is_grade": is_grade,
+                    "is_solution": is_solution,
+                    "is_locked": is_locked,
+                    "is_task": is_task,
+                    "max_score": max_score,
+                    "created_at": datetime.now().replace(tzinfo=timezone.utc),
+                    "meta": json.dumps(cell_meta),
+                }
 
                 cell_models.append(cell)
             notebook_models.append(nb_model)
@@ -167,15 +174,16 @@ class AssignmentService:
                 file_pth = os.path.join(base_asset_path, file_uuid)
 
                 with open(file_pth, 'wb') as f:
-                    f.write(asset.body)
-
-                asset_model = AssignmentAsset(
-                    id=file_uuid,
-                    assignment_id=assignment.id,
-                    path=asset.filename,
-                    size=len(asset.body),
-                    created_at=datetime.now().replace(tzinfo=timezone.utc),
-                )
+                    for chunk in asset.chunks():
+                        f.write(chunk)
+
+                asset_model = {
+                    "id": file_uuid,
+                    "assignment_id": assignment.id,
+                    "path": asset.filename,
+                    "size": asset.size,
+                    "created_at": datetime.now().replace(tzinfo=timezone.utc),
+                }
 
                 asset_models.append(asset_model)
 
@@ -186,7 +194,7 @@ class AssignmentService:
                 if not course:
                     raise ValueError(f"Course with id '{course_id}' not found.")
 
-            score_maximum = sum(cell.max_score for cell in cell_models if cell.is_grade)
+            score_maximum = sum(cell["max_score"] for cell in cell_models if cell["is_grade"])
 
             lti_assignment = self.lti_client.create_assignment(
                 course.lti_id,
@@ -198,9 +206,16 @@ class AssignmentService:
 
         with self.db_mgr.get_session() as sess:
             sess.add(assignment)
-            sess.add_all(notebook_models)
-            sess.add_all(cell_models)
-            sess.add_all(asset_models)
+            sess.flush()
+            bulk_insert(sess, Notebook, notebook_models)
+            options = store_options(self.db_mgr.config)
+            for key in ("source", "source_student"):
+                digests = store_texts(sess, [cell.pop(key) for cell in cell_models], **options)
+                for cell, digest in zip(cell_models, digests):
+                    cell[f"{key}_hash"] = digest
+            bulk_insert(sess, Cell, cell_models)
+            bulk_insert(sess, AssignmentAsset, asset_models)
+            refresh_max_scores(sess, [assignment.id])
 
             sess.commit()
 
@@ -262,25 +277,28 @@ class AssignmentService:
 
         return notebooks, assets
 
-    def list_assignments(self, course_id: str, user: User):
-        assignments = self.repo.get_by_course(course_id)
-
-        visible_assignments = []
-        enrollment = next((e for e in user.enrollments if e.course_id == course_id), None)
-
-        for assignment in assignments:
-            ctx = {
-                'assignment': assignment,
-                'course': assignment.course,
-                'enrollment': enrollment
-            }
-
-            if permission_manager.check(user, 'assignment:view', ctx):
-                visible_assignments.append(assignment)
-
-        ids = [a.id for a in visible_assignments]
-        subs = self.sub_repo.list_for_user_and_assignments(user.id, ids)
-        sub_map = {s.assignment_id: s for s in subs}
+    async def list_assignments(self, course_id: str, user: User, evaluator: PermissionEvaluator = None,
+                               after=None, limit: int = None):
+        # Returns the listing items, the visible assignments (reused by callers for permissions)
+        # and the cursor of the next page. Three queries: assignments, notebooks and submissions.
+        # Pages are cut before the visibility check, so a page may hold fewer than limit items.
+        assignments = await self.repo.list_for_listing_async(course_id, after=after, limit=limit)
+        next_cursor = None
+        if limit is not None:
+            assignments, next_cursor = split_page(assignments, limit, lambda a: (a.created_at, a.id))
+        evaluator = evaluator or PermissionEvaluator(permission_manager, user)
+
+        visible_assignments = [a for a in assignments if evaluator.check('assignment:view', a)]
+
+        missing = evaluator.missing_submissions(visible_assignments)
+        if missing:
+            evaluator.add_submissions(missing, await self.sub_repo.list_latest_for_user_async(user.id, missing))
+        sub_map = {
+            a.id: evaluator.submissions[a.id]
+            for a in visible_assignments
+            if evaluator.submissions.get(a.id) is not None
+            and evaluator.submissions[a.id].status != SubmissionStatus.ARCHIVED
+        }
 
         res = []
         for a in visible_assignments:
@@ -325,7 +343,7 @@ class AssignmentService:
             )
             res.append(item)
 
-        return res
+        return res, visible_assignments, next_cursor
 
     def delete_assignment(self, assignment_id: str, course_id: str):
         existing = self.repo.get(assignment_id)
@@ -1,11 +1,12 @@
 import logging
-from typing import List
+from typing import List, Optional, Tuple
 
 from ..core.models.enum import UserRole
 from ..repositories import EnrollmentRepository
 from ..repositories.course import CourseRepository
 from ..core.auth.decorators import permission_manager
 from ..core.models.course import Course as CourseModel
+from ..core.utils.pagination import split_page
 from ..schemas.course import CreateCourseRequest, UpdateCourseRequest
 from ..core.exceptions.database import DatabaseError
 
@@ -16,45 +17,53 @@ class CourseService:
         self.enrollment_repo = enrollment_repo
         self.log = logging.getLogger(__name__)
 
-    def list_courses(self, user) -> List[CourseModel]:
-        all_courses = self.repo.list_all()
-        visible_courses: List[CourseModel] = []
-        for course in all_courses:
-            context = {
+    async def list_courses(self, user, after: Optional[Tuple[str]] = None,
+                           limit: Optional[int] = None) -> Tuple[List[CourseModel], Optional[str]]:
+        user_enrollments = {e.course_id: e for e in user.enrollments}
+        courses = await self.repo.list_for_user_async(
+            user.id, is_admin=getattr(user, 'is_admin', False), after=after, limit=limit
+        )
+        next_cursor = None
+        if limit is not None:
+            courses, next_cursor = split_page(courses, limit, lambda c: (c.label,))
+
+        visible_courses: List[CourseModel] = [
+            course for course in courses
+            if permission_manager.check(user, 'course:view', {
                 'course': course,
-                'enrollment': next((e for e in user.enrollments if e.course_id == course.label), None)
-            }
-            if permission_manager.check(user, 'course:view', context):
-                try:
-                    progress = self.repo.get_progress_by_user_and_course(
-                        user_id=user.id,
-                        course_id=course.label
-                    )
-                    setattr(course, 'progress', progress)
-                except Exception:
-                    setattr(course, 'progress', None)
+                'enrollment': user_enrollments.get(course.label)
+            })
+        ]
+        course_ids = [course.label for course in visible_courses]
+        instructor_course_ids = [
+            course_id for course_id in course_ids
+            if user_enrollments.get(course_id) and user_enrollments[course_id].role == UserRole.INSTRUCTOR
+        ]
+
+        try:
+            progress = await self.repo.get_progress_by_user_async(user.id, course_ids)
+        except Exception as e:
+            self.log.warning(f"Failed to compute course progress for user {user.id}: {e}")
+            progress = {}
 
-                try:
-                    instructors = self.enrollment_repo.list_instructors_by_course(course.label)
-                    instructor_names = [instructor.full_name for instructor in instructors]
-                    setattr(course, 'instructors', instructor_names)
-                except Exception:
-                    setattr(course, 'instructors', None)
+        try:
+            instructors = await self.enrollment_repo.list_instructor_names_by_courses_async(course_ids)
+        except Exception as e:
+            self.log.warning(f"Failed to list course instructors: {e}")
+            instructors = {}
 
-                user_enrollment = context['enrollment']
-                is_instructor = user_enrollment and user_enrollment.role == UserRole.INSTRUCTOR
+        try:
+            student_counts = await self.enrollment_repo.count_students_by_courses_async(instructor_course_ids)
+        except Exception as e:
+            self.log.warning(f"Failed to count course students: {e}")
+            student_counts = {}
 
-                if is_instructor:
-                    try:
-                        student_count = self.enrollment_repo.get_student_count_by_course(course.label)
-                        setattr(course, 'student_count', student_count)
-                    except Exception as e:
-                        setattr(course, 'student_count', None)
-                else:
-                    setattr(course, 'student_count', None)
+        for course in visible_courses:
+            setattr(course, 'progress', progress.get(course.label))
+            setattr(course, 'instructors', instructors.get(course.label))
+            setattr(course, 'student_count', student_counts.get(course.label))
 
-                visible_courses.append(course)
-        return visible_courses
+        return visible_courses, next_cursor
 
     def create_course(self, request_model: 'CreateCourseRequest') -> CourseModel:
         existing = self.repo.get(request_model.label)
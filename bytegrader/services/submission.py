@@ -1,49 +1,82 @@
+import logging
+import math
 from datetime import datetime, timezone
 
-import nbformat
 import sqlalchemy
-from tornado.httputil import HTTPFile
+from sqlalchemy import update
 
 from bytegrader.autograde.service import AutogradingService
+from bytegrader.core.database.blobs import existing_hashes, store_texts, store_options
+from bytegrader.core.database.bulk import bulk_insert
+from bytegrader.core.database.rate_limit import Bucket, refund_tokens, take_tokens
+from bytegrader.core.database.scores import refresh_submission_scores
 from bytegrader.core.models import Assignment, Submission, User, NotebookSubmission, CellSubmission
 from bytegrader.core.models.base import new_uuid
 from bytegrader.core.models.enum import SubmissionStatus
+from bytegrader.core.exceptions.rate_limit import RateLimitError
+from bytegrader.core.exceptions.upload import UnknownSourceError
 from bytegrader.repositories.submission import SubmissionRepository
 from bytegrader.core.observability import capture_exception, set_span_attributes
+from bytegrader.core.utils.datetime import parse_duration
+from bytegrader.core.utils.multipart import UploadedFile
+from bytegrader.core.utils.notebook import read_notebook, is_submitted
 
 
 class SubmissionService:
     def __init__(self, repo: 'SubmissionRepository', autograde_service: 'AutogradingService'):
         self.repo = repo
         self.autograde_service = autograde_service
+        self.log = logging.getLogger(__name__)
 
     async def submit_assignment(self, assignment: 'Assignment', user: 'User',
-                                notebooks: list[HTTPFile]) -> 'Submission':
+                                notebooks: list[UploadedFile] = (), cells: dict = None) -> 'Submission':
+        # The cooldown and rate limits are charged up front and refunded if the submission fails,
+        # e.g. for the full upload the lab retries with after a rejected compact one
+        buckets = self._submission_buckets(assignment, user)
+        with self.repo.db_manager.get_session() as session:
+            retry_after = take_tokens(session, buckets)
+        if retry_after:
+            set_span_attributes({"submission.rate_limited": True})
+            raise RateLimitError(f"Too many submissions, retry in {math.ceil(retry_after)}s", retry_after)
+
+        try:
+            return await self._submit(assignment, user, notebooks, cells)
+        except Exception:
+            with self.repo.db_manager.get_session() as session:
+                refund_tokens(session, buckets)
+            raise
+
+    def _submission_buckets(self, assignment: 'Assignment', user: 'User') -> list[Bucket]:
+        config = self.repo.db_manager.config
+        if config is None:
+            return []
+        cooldown = assignment.submission_cooldown
+        if cooldown is None:
+            cooldown = parse_duration(config.autograde.cooldown_period)
+        limits = config.rate_limit
+        return [
+            Bucket(f"submit:{assignment.id}:{user.id}", 1, cooldown),
+            Bucket(f"submit:user:{user.id}", limits.user_limit, parse_duration(limits.user_period)),
+            Bucket(f"submit:course:{assignment.course_id}", limits.course_limit, parse_duration(limits.course_period)),
+        ]
+
+    async def _submit(self, assignment: 'Assignment', user: 'User',
+                      notebooks: list[UploadedFile], cells: dict) -> 'Submission':
+        # Either whole notebooks or the compact form of core/utils/submission_delta.py:
+        # {notebook name: {cell id: {"source": ...} or {"sha256": ...}}}
+        if cells is None:
+            names = {notebook.name for notebook in assignment.notebooks}
+            cells = {nb.filename: self._notebook_cells(nb) for nb in notebooks if nb.filename in names}
 
         set_span_attributes(
             {
                 "component": "submission_service",
                 "submission.assignment_id": assignment.id,
                 "submission.user_id": user.id,
-                "submission.notebook_count": len(notebooks),
+                "submission.notebook_count": len(cells),
             }
         )
 
-        # Archive any existing submissions for this assignment and user
-        existing_submissions = self.repo.list_for_user_and_assignments(
-            user_id=user.id, 
-            assignment_ids=[assignment.id],
-            include_archived=False
-        )
-        
-        # Archive existing submissions
-        with self.repo.db_manager.get_session() as session:
-            for existing_submission in existing_submissions:
-                session.query(Submission).filter(
-                    Submission.id == existing_submission.id
-                ).update({Submission.status: SubmissionStatus.ARCHIVED})
-            session.commit()
-
         submission = Submission(
             id=new_uuid(),
             assignment_id=assignment.id,
@@ -58,118 +91,144 @@ class SubmissionService:
         should be submitted as well?
         """
 
-        notebook_files = {nb.filename: nb for nb in notebooks}
         notebook_submissions = []
         cell_submissions = []
+        # Rows whose source was sent, and rows referencing a source by hash
+        sourced_rows, cell_sources = [], []
+        hashed_rows = []
 
         for assignment_notebook in assignment.notebooks:
-            if assignment_notebook.name not in notebook_files:
+            submitted = cells.get(assignment_notebook.name)
+            if submitted is None:
                 continue
-            notebook_file = notebook_files[assignment_notebook.name]
 
-            # Notebook deconstruction
-            try:
-                body = notebook_file.body.decode('utf-8')
-                nb = nbformat.reads(body, nbformat.current_nbformat)
-                nbformat.validate(nb)
-            except Exception as e:
-                raise ValueError(f"Invalid notebook file {assignment_notebook.name}: {e}")
-
-            notebook_submission = NotebookSubmission(
-                id=new_uuid(),
-                submission_id=submission.id,
-                notebook_id=assignment_notebook.id,
-            )
-            notebook_submissions.append(notebook_submission)
+            notebook_submission_id = new_uuid()
+            notebook_submissions.append({
+                "id": notebook_submission_id,
+                "submission_id": submission.id,
+                "notebook_id": assignment_notebook.id,
+            })
 
             cell_map = {cell.id: cell for cell in assignment_notebook.cells}
 
-            for nb_cell in nb.cells:
-                cell_id = getattr(nb_cell, 'id', None)
-                if not cell_id or cell_id not in cell_map:
+            for cell_id, entry in submitted.items():
+                orig_cell = cell_map.get(cell_id)
+                if orig_cell is None:
                     # raise ValueError(f"Cell ID {cell_id} not found in notebook {assignment_notebook.filename}")
                     continue
 
-                orig_cell = cell_map[cell_id]
-
-                is_grade = orig_cell.is_grade
-                is_solution = orig_cell.is_solution
-                is_locked = orig_cell.is_locked
-
-                if not ((is_grade and not is_solution) or (is_locked and not is_grade and not is_solution)):
-                    cell_src = nb_cell.source
-                    if isinstance(cell_src, list):
-                        cell_src = "".join(cell_src)
-
-                    cell_submission = CellSubmission(
-                        id=new_uuid(),
-                        notebook_submission_id=notebook_submission.id,
-                        cell_id=cell_id,
-                        submitted_source=cell_src,
-                    )
-                    cell_submissions.append(cell_submission)
-
-        # ! Delete/Archive previous submissions
+                if is_submitted(orig_cell.is_grade, orig_cell.is_solution, orig_cell.is_locked):
+                    row = {
+                        "id": new_uuid(),
+                        "notebook_submission_id": notebook_submission_id,
+                        "cell_id": cell_id,
+                    }
+                    cell_submissions.append(row)
+                    if "sha256" in entry:
+                        hashed_rows.append((row, entry["sha256"]))
+                    else:
+                        sourced_rows.append(row)
+                        cell_sources.append(entry["source"])
+
+        referenced = {digest for _, digest in hashed_rows}
         with self.repo.db_manager.get_session() as session:
-            try:
-                session.add(submission)
-                session.add_all(notebook_submissions)
-                session.add_all(cell_submissions)
-                session.commit()
-
-                submission_id = submission.id
-                loaded_submission = session.query(Submission).filter(
-                    Submission.id == submission_id
-                ).options(
-                    sqlalchemy.orm.joinedload(Submission.assignment),
-                    sqlalchemy.orm.joinedload(Submission.notebook_submissions).joinedload(
-                        NotebookSubmission.grades
-                    ),
-                    sqlalchemy.orm.joinedload(Submission.notebook_submissions).joinedload(
-                        NotebookSubmission.cell_submissions
-                    )
-                ).one()
-
-                session.expunge_all()
-
-                # Submit for autograding
-                if self.autograde_service.running:
-                    try:
-                        job_id = await self.autograde_service.submit_for_grading(assignment, loaded_submission)
-                        set_span_attributes(
-                            {
-                                "submission.autograde.job_id": job_id,
-                            }
+            # Checked in the writing transaction, so a concurrent prune_blobs waits for it or the
+            # insert fails on the foreign key (see prune_blobs)
+            missing = referenced - existing_hashes(session, referenced)
+            if not missing:
+                try:
+                    # Previous submissions are archived in the same transaction, with one statement
+                    session.execute(
+                        update(Submission)
+                        .where(
+                            Submission.user_id == user.id,
+                            Submission.assignment_id == assignment.id,
+                            Submission.status != SubmissionStatus.ARCHIVED,
                         )
-                    except Exception as e:
-                        session.rollback()
-                        capture_exception(
-                            e,
-                            tags={
-                                "component": "submission_service",
-                                "stage": "submit_for_grading",
-                            },
-                            extra={
-                                "assignment_id": assignment.id,
-                                "submission_id": loaded_submission.id,
-                                "user_id": user.id,
-                            }
+                        .values(status=SubmissionStatus.ARCHIVED),
+                        execution_options={"synchronize_session": False},
+                    )
+                    session.add(submission)
+                    session.flush()
+                    bulk_insert(session, NotebookSubmission, notebook_submissions)
+                    # Unchanged cells resolve to blobs that already exist and only add a reference
+                    digests = store_texts(session, cell_sources, **store_options(self.repo.db_manager.config))
+                    for row, digest in zip(sourced_rows, digests):
+                        row["submitted_source_hash"] = digest
+                    for row, digest in hashed_rows:
+                        row["submitted_source_hash"] = digest
+                    bulk_insert(session, CellSubmission, cell_submissions)
+                    refresh_submission_scores(session, [submission.id])
+                    session.commit()
+
+                    submission_id = submission.id
+                    loaded_submission = session.query(Submission).filter(
+                        Submission.id == submission_id
+                    ).options(
+                        sqlalchemy.orm.joinedload(Submission.assignment),
+                        sqlalchemy.orm.selectinload(Submission.notebook_submissions).selectinload(
+                            NotebookSubmission.cell_submissions
                         )
-                        raise ValueError(f"Failed to submit for autograding: {e}")
-
-                return loaded_submission
-
+                    ).populate_existing().one()
+
+                    session.expunge_all()
+
+                except Exception as e:
+                    session.rollback()
+                    capture_exception(
+                        e,
+                        tags={
+                            "component": "submission_service",
+                            "stage": "persist_submission",
+                        },
+                        extra={
+                            "assignment_id": assignment.id,
+                            "user_id": user.id,
+                        }
+                    )
+                    raise ValueError(f"Failed to submit assignment: {e}")
+        if missing:
+            raise UnknownSourceError(f"Unknown cell source hashes: {', '.join(sorted(missing)[:5])}")
+
+        # Enqueue outside of the session so the (single) writer connection is not held while awaiting.
+        # The submission is stored at this point, so a failure to enqueue it is not the student's:
+        # the grading process queues submissions left without a job (AutogradeConfig.requeue_interval).
+        if self.autograde_service.running:
+            try:
+                job_id = await self.autograde_service.submit_for_grading(assignment, loaded_submission)
+                set_span_attributes(
+                    {
+                        "submission.autograde.job_id": job_id,
+                    }
+                )
             except Exception as e:
-                session.rollback()
                 capture_exception(
                     e,
                     tags={
                         "component": "submission_service",
-                        "stage": "persist_submission",
+                        "stage": "submit_for_grading",
                     },
                     extra={
                         "assignment_id": assignment.id,
+                        "submission_id": loaded_submission.id,
                         "user_id": user.id,
                     }
                 )
-                raise ValueError(f"Failed to submit assignment: {e}")
+                self.log.error(f"Failed to enqueue submission {loaded_submission.id}: {e}")
+                set_span_attributes({"submission.autograde.enqueue_failed": True})
+
+        return loaded_submission
+
+    @staticmethod
+    def _notebook_cells(notebook_file: UploadedFile) -> dict:
+        # Notebook deconstruction
+        try:
+            nb = read_notebook(notebook_file.body)
+        except Exception as e:
+            raise ValueError(f"Invalid notebook file {notebook_file.filename}: {e}")
+        cells = {}
+        for nb_cell in nb.cells:
+            cell_id = getattr(nb_cell, 'id', None)
+            if cell_id:
+                cells[cell_id] = {"source": nb_cell.source}
+        return cells
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from ..config.config import BYTEGraderConfig
+from ..core.database.bulk import BULK_BATCH_SIZE
+from ..core.database.connection import DatabaseManager
+from ..core.observability import capture_exception, set_span_attributes
+from ..core.utils import utc_now
+from ..repositories.submission import SubmissionRepository
+
+
+class SubmissionArchiveTask:
+
+    def __init__(self, config: BYTEGraderConfig, db_mgr: DatabaseManager):
+        self.config = config
+        self.db_mgr = db_mgr
+        self.log = logging.getLogger("SubmissionArchiveTask")
+        self.submission_repo = SubmissionRepository(self.db_mgr)
+
+    async def run(self) -> int:
+        archive_cfg = self.config.archive
+        # Timestamps are stored naive in UTC
+        older_than = (utc_now() - timedelta(days=archive_cfg.min_age_days)).replace(tzinfo=None)
+
+        moved = 0
+        pruned = 0
+        try:
+            while True:
+                batch = self.submission_repo.archive_to_cold_storage(
+                    older_than, limit=archive_cfg.batch_size, codec=archive_cfg.codec
+                )
+                moved += batch
+                if batch < archive_cfg.batch_size:
+                    break
+                # One transaction per batch; let other requests in between
+                await asyncio.sleep(0)
+
+            # Blobs older than the same cutoff that nothing references, such as the sources of the
+            # trees moved above, are deleted as well
+            while True:
+                batch = self.submission_repo.prune_source_blobs(older_than)
+                pruned += batch
+                if batch < BULK_BATCH_SIZE:
+                    break
+                await asyncio.sleep(0)
+        except Exception as e:
+            self.log.error(f"Failed to move archived submissions to cold storage: {e}")
+            capture_exception(
+                e,
+                tags={
+                    "component": "submission_archive_task",
+                    "stage": "archive",
+                },
+                extra={"moved": moved, "pruned": pruned}
+            )
+            raise
+        finally:
+            set_span_attributes(
+                {
+                    "component": "submission_archive_task",
+                    "archive.moved_count": moved,
+                    "archive.pruned_blob_count": pruned,
+                }
+            )
+
+        if moved:
+            self.log.info(f"Moved {moved} archived submissions to cold storage")
+        if pruned:
+            self.log.info(f"Deleted {pruned} unreferenced source blobs")
+        return moved
@@ -2,6 +2,7 @@ import logging
 from typing import Optional
 
 from ..config.config import BYTEGraderConfig
+from ..core.cache import UserCache
 from ..core.database.connection import DatabaseManager
 from ..core.exceptions.config import ConfigurationError
 from ..core.models import User, Course
@@ -19,6 +20,7 @@ class LTISyncTask:
         config: BYTEGraderConfig,
         db_mgr: DatabaseManager,
         client: Optional[LTIClient] = None,
+        user_cache: Optional[UserCache] = None,
     ):
         self.config = config
         self.db_mgr = db_mgr
@@ -27,6 +29,7 @@ class LTISyncTask:
         self.enrollment_repo = EnrollmentRepository(self.db_mgr)
         self.user_repo = UserRepository(self.db_mgr)
         self.course_repo = CourseRepository(self.db_mgr)
+        self.user_cache = user_cache
 
         self.client = client
         if self.client is None and self.config.lti.enabled and self.config.lti.sync_task.enabled:
@@ -53,6 +56,10 @@ class LTISyncTask:
             extra=extra or {}
         )
 
+    def _invalidate_user(self, *user_ids: str):
+        if self.user_cache is not None:
+            self.user_cache.invalidate(*user_ids)
+
     def _create_client(self) -> LTIClient:
         priv_key = None
         key_path = self.config.lti.key_path
@@ -101,8 +108,7 @@ class LTISyncTask:
             }
         )
         try:
-            courses = self.course_repo.get_all()
-            active_courses = [c for c in courses if c.active]
+            active_courses = [c for c in self.course_repo.iter_all() if c.active]
 
             set_span_attributes(
                 {
@@ -207,6 +213,7 @@ class LTISyncTask:
             if not student:
                 self.log.warning(f"Student {member.user_id} not found and auto-creation is disabled")
                 return
+            self._invalidate_user(student.id, member.user_id)
 
             course = self.course_repo.get_by_lti_id(lti_course_id)
             if not course:
@@ -283,6 +290,7 @@ class LTISyncTask:
 
                     if not student_in_lms:
                         success = self.enrollment_repo.update(enrollment.id, active=False)
+                        self._invalidate_user(student.id)
                         if success:
                             deactivated_count += 1
                             self.log.info(f"Deactivated enrollment for student {student.id} in course {course.label}")
@@ -320,6 +328,7 @@ class LTISyncTask:
 
             for enrollment in active_enrollments:
                 success = self.enrollment_repo.update(enrollment.id, active=False)
+                self._invalidate_user(enrollment.user_id)
                 if success:
                     deactivated_count += 1
 
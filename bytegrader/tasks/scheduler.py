@@ -7,6 +7,7 @@ from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 
 from ..config.config import BYTEGraderConfig
+from ..core.database.connection import DatabaseManager
 from ..core.observability import capture_exception, set_span_attributes
 
 
@@ -37,6 +38,8 @@ class TaskScheduler:
 
             @functools.wraps(func)
             async def async_wrapper(*args: Any, **kwargs: Any):
+                # Each run starts on the replica, whatever the context it was scheduled from wrote
+                DatabaseManager.reset_primary_pin()
                 try:
                     set_span_attributes(
                         {
@@ -62,6 +65,7 @@ class TaskScheduler:
 
         @functools.wraps(func)
         def sync_wrapper(*args: Any, **kwargs: Any):
+            DatabaseManager.reset_primary_pin()
             try:
                 set_span_attributes(
                     {
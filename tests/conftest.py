@@ -0,0 +1,13 @@
+import pytest
+
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import upgrade_database
+
+
+@pytest.fixture
+def db_mgr(tmp_path):
+    # A file database migrated to head; in-memory SQLite cannot be shared with the async engine
+    db_mgr = DatabaseManager(f"sqlite:///{tmp_path / 'bytegrader.db'}")
+    upgrade_database(db_mgr)
+    yield db_mgr
+    db_mgr.close()
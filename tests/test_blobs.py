@@ -0,0 +1,126 @@
+import threading
+from datetime import timedelta
+
+import pytest
+
+from bytegrader.core.database.archive import archive_submission_trees, restore_submission_tree
+from bytegrader.core.database.blobs import blob_cache, blob_hash, fetch_texts, prune_blobs, store_texts
+from bytegrader.core.database.bulk import bulk_insert
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.exceptions import DatabaseError
+from bytegrader.core.models import (Assignment, Blob, Cell, CellSubmission, Course, Notebook, NotebookSubmission,
+                                    Submission, User)
+from bytegrader.core.models.enum import CellType, SubmissionStatus
+from bytegrader.core.utils import utc_now
+
+pytestmark = [pytest.mark.database, pytest.mark.unit]
+
+
+def later():
+    # Prune cutoff after every blob written by the test
+    return (utc_now() + timedelta(minutes=1)).replace(tzinfo=None)
+
+
+def blob_count(db_mgr) -> int:
+    with db_mgr.get_session(readonly=True) as session:
+        return session.query(Blob).count()
+
+
+@pytest.fixture
+def submission(db_mgr):
+    with db_mgr.get_session() as session:
+        session.add(Course(label="C1", title="Course 1"))
+        session.add(User(id="u1"))
+        session.add(Assignment(id="A1", course_id="C1", name="A1"))
+        session.add(Notebook(id="N1", assignment_id="A1", name="nb.ipynb", idx=0))
+        session.flush()
+        source, = store_texts(session, ["# stub"])
+        bulk_insert(session, Cell, [
+            {"id": "cell-1", "notebook_id": "N1", "idx": 0, "cell_type": CellType.CODE, "source_hash": source},
+        ])
+        session.add(Submission(id="S1", assignment_id="A1", user_id="u1", status=SubmissionStatus.ARCHIVED))
+        session.add(NotebookSubmission(id="NS1", submission_id="S1", notebook_id="N1"))
+        submitted, = store_texts(session, ["print('answer')"])
+        session.add(CellSubmission(id="CS1", notebook_submission_id="NS1", cell_id="cell-1",
+                                   submitted_source_hash=submitted))
+    return "S1"
+
+
+def test_referenced_blobs_are_kept(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        store_texts(session, ["orphan"])
+
+    with db_mgr.get_session() as session:
+        assert prune_blobs(session, later()) == 1
+    with db_mgr.get_session(readonly=True) as session:
+        assert {blob.hash for blob in session.query(Blob)} == {blob_hash("# stub"), blob_hash("print('answer')")}
+
+
+def test_recent_blobs_are_kept(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        store_texts(session, ["orphan"])
+
+    with db_mgr.get_session() as session:
+        assert prune_blobs(session, (utc_now() - timedelta(minutes=1)).replace(tzinfo=None)) == 0
+    assert blob_count(db_mgr) == 3
+
+
+def test_archived_trees_do_not_keep_blobs(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        assert archive_submission_trees(session, [submission]) == 1
+    with db_mgr.get_session() as session:
+        assert prune_blobs(session, later()) == 1
+    assert blob_count(db_mgr) == 1
+
+    blob_cache.clear()
+    with db_mgr.get_session() as session:
+        assert restore_submission_tree(session, submission)
+    with db_mgr.get_session(readonly=True) as session:
+        restored = session.get(CellSubmission, "CS1")
+        assert restored.submitted_source_hash == blob_hash("print('answer')")
+        assert fetch_texts(session, [restored.submitted_source_hash]) == {
+            restored.submitted_source_hash: "print('answer')"
+        }
+
+
+@pytest.fixture
+def other_process(db_mgr):
+    # A second manager on the same file, as used by the grader or 'bytegrader db'
+    other = DatabaseManager(db_mgr.uri)
+    yield other
+    other.close()
+
+
+def test_prune_waits_for_a_writer_that_found_the_blob(db_mgr, submission, other_process):
+    with db_mgr.get_session() as session:
+        session.add(Cell(id="cell-2", notebook_id="N1", idx=1, cell_type=CellType.CODE))
+        digest, = store_texts(session, ["resubmitted"])
+
+    pruned = []
+    with db_mgr.get_session() as session:
+        assert store_texts(session, ["resubmitted"]) == [digest]
+
+        def prune():
+            with other_process.get_session() as other:
+                pruned.append(prune_blobs(other, later()))
+
+        pruner = threading.Thread(target=prune)
+        pruner.start()
+        pruner.join(0.5)
+        # Blocked by the writer's transaction
+        assert pruner.is_alive()
+        session.add(CellSubmission(id="CS2", notebook_submission_id="NS1", cell_id="cell-2",
+                                   submitted_source_hash=digest))
+    pruner.join()
+
+    assert pruned == [0]
+    with db_mgr.get_session(readonly=True) as session:
+        assert fetch_texts(session, [digest]) == {digest: "resubmitted"}
+
+
+def test_references_to_missing_blobs_are_rejected(db_mgr, submission):
+    with pytest.raises(DatabaseError, match="FOREIGN KEY"):
+        with db_mgr.get_session() as session:
+            session.add(Cell(id="cell-2", notebook_id="N1", idx=1, cell_type=CellType.CODE))
+            session.add(CellSubmission(id="CS2", notebook_submission_id="NS1", cell_id="cell-2",
+                                       submitted_source_hash=blob_hash("never stored")))
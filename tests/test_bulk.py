@@ -0,0 +1,65 @@
+import pytest
+
+from bytegrader.core.database.bulk import bulk_insert
+from bytegrader.core.models import Assignment, Course, Notebook, NotebookSubmission, Submission, User
+from bytegrader.core.models.enum import SubmissionStatus
+
+pytestmark = [pytest.mark.database, pytest.mark.unit]
+
+
+@pytest.fixture
+def submission(db_mgr):
+    with db_mgr.get_session() as session:
+        session.add(Course(label="C1", title="Course 1"))
+        session.add(User(id="u1"))
+        session.add(Assignment(id="A1", course_id="C1", name="A1"))
+        session.add_all([Notebook(id=f"N{i}", assignment_id="A1", name=f"nb{i}.ipynb", idx=i) for i in range(5)])
+        session.add(Submission(id="S1", assignment_id="A1", user_id="u1", status=SubmissionStatus.SUBMITTED))
+    return "S1"
+
+
+def test_rows_get_column_defaults(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        bulk_insert(session, NotebookSubmission, [
+            {"submission_id": submission, "notebook_id": f"N{i}"} for i in range(5)
+        ])
+
+    with db_mgr.get_session(readonly=True) as session:
+        rows = session.query(NotebookSubmission).order_by(NotebookSubmission.notebook_id).all()
+
+    assert [row.notebook_id for row in rows] == [f"N{i}" for i in range(5)]
+    # Callable defaults are evaluated per row
+    assert len({row.id for row in rows}) == 5
+    assert all(len(row.id) == 32 for row in rows)
+    assert all(row.created_at is not None and row.updated_at is not None for row in rows)
+    # Scalar defaults
+    assert all(row.total_score == 0.0 and row.auto_score == 0.0 and row.manual_score == 0.0 for row in rows)
+    assert all(row.needs_manual_grading is True for row in rows)
+
+
+def test_explicit_values_win_over_defaults(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        bulk_insert(session, NotebookSubmission, [
+            {"id": "NS1", "submission_id": submission, "notebook_id": "N0", "needs_manual_grading": False},
+        ])
+
+    with db_mgr.get_session(readonly=True) as session:
+        row = session.get(NotebookSubmission, "NS1")
+    assert row.needs_manual_grading is False
+    assert row.total_score == 0.0
+
+
+def test_rows_are_written_in_batches(db_mgr, submission):
+    with db_mgr.get_session() as session:
+        bulk_insert(session, NotebookSubmission, [
+            {"submission_id": submission, "notebook_id": f"N{i}"} for i in range(5)
+        ], batch_size=2)
+
+    with db_mgr.get_session(readonly=True) as session:
+        assert session.query(NotebookSubmission).count() == 5
+
+
+def test_no_rows(db_mgr):
+    with db_mgr.get_session() as session:
+        bulk_insert(session, NotebookSubmission, [])
+        assert session.query(NotebookSubmission).count() == 0
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import event, select
+
+from bytegrader.autograde.queue import DatabaseJobQueue
+from bytegrader.core.models import Grade
+from bytegrader.repositories.submission import SubmissionRepository
+from bytegrader.repositories.user import EnrollmentRepository, UserRepository
+
+pytestmark = [pytest.mark.database, pytest.mark.integration]
+
+
+def captured(db_mgr, table, call):
+    # Statements (with their parameters) the call sends to the database that read from `table`
+    statements = []
+
+    def record(_conn, _cursor, statement, parameters, _context, _executemany):
+        if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+            statements.append((statement, parameters))
+
+    engines = {db_mgr.engine, db_mgr.read_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        call()
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+    assert statements, f"no query on {table} was executed"
+    return statements
+
+
+def query_plan(db_mgr, statement, parameters=()) -> str:
+    with db_mgr.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_uses_index(plan: str, table: str, index: str):
+    searches = [line for line in plan.splitlines() if line.split()[1:2] == [table]]
+    assert searches, plan
+    assert all(f"USING INDEX {index}" in line or f"USING COVERING INDEX {index}" in line for line in searches), plan
+
+
+def test_user_by_lms_user_id(db_mgr):
+    statements = captured(db_mgr, "users", lambda: UserRepository(db_mgr).get_by_lms_user_id("lms-1"))
+    assert_uses_index(query_plan(db_mgr, *statements[0]), "users", "ix_users_lms_user_id")
+
+
+def test_submissions_by_user_and_assignment(db_mgr):
+    repo = SubmissionRepository(db_mgr)
+    statements = captured(db_mgr, "submissions", lambda: repo.list_for_user_and_assignments("u1", ["a1", "a2"]))
+    assert_uses_index(query_plan(db_mgr, *statements[0]), "submissions", "ix_submissions_user_assignment_status")
+
+
+def test_enrollments_by_course_role_and_active(db_mgr):
+    repo = EnrollmentRepository(db_mgr)
+    statements = captured(db_mgr, "users", lambda: repo.list_students_by_course("c1"))
+    assert_uses_index(query_plan(db_mgr, *statements[0]), "enrollments", "ix_enrollments_course_role_active")
+
+
+def test_grades_by_notebook_submission(db_mgr):
+    # As loaded by AutogradingService._save_results; covered by uq_grade_cell_submission
+    statement = select(Grade).where(Grade.notebook_submission_id.in_(["ns1", "ns2"]))
+    sql = str(statement.compile(db_mgr.engine, compile_kwargs={"literal_binds": True}))
+    plan = query_plan(db_mgr, sql)
+    assert "SCAN grades" not in plan, plan
+    assert "SEARCH grades USING INDEX sqlite_autoindex_grades" in plan, plan
+
+
+def test_grading_job_claim(db_mgr):
+    queue = DatabaseJobQueue(db_mgr)
+    statements = captured(db_mgr, "grading_jobs", lambda: queue._claim(4))
+    plan = query_plan(db_mgr, *statements[0])
+    # Both branches of the OR are index lookups: queued jobs and expired claims
+    assert "SCAN grading_jobs" not in plan, plan
+    assert plan.count("USING INDEX ix_grading_jobs_status_priority") == 2, plan
+
+
+def test_regrade_progress_by_assignment(db_mgr):
+    queue = DatabaseJobQueue(db_mgr)
+    statements = captured(db_mgr, "grading_jobs", lambda: queue._regrade_progress("a1"))
+    assert_uses_index(query_plan(db_mgr, *statements[0]), "grading_jobs", "ix_grading_jobs_assignment_batch")
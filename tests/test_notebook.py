@@ -0,0 +1,117 @@
+import base64
+import json
+
+import nbformat
+import pytest
+from nbformat import ValidationError
+
+from bytegrader.core.utils import notebook as notebook_utils
+from bytegrader.core.utils.notebook import read_notebook
+
+pytestmark = pytest.mark.unit
+
+
+def make_notebook(minor: int = 5) -> nbformat.NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    nb.metadata.kernelspec = {"name": "python3", "display_name": "Python 3", "language": "python"}
+    nb.metadata.signature = "sha256:transient"
+    code = nbformat.v4.new_code_cell("def f(x):\n    # YOUR CODE HERE\n    raise NotImplementedError()",
+                                     execution_count=1)
+    code.metadata.nbgrader = {"schema_version": 3, "grade": False, "solution": True, "locked": False,
+                              "task": False, "grade_id": "f"}
+    code.metadata.trusted = True
+    code.outputs = [
+        nbformat.v4.new_output("stream", name="stdout", text="line 1\nline 2\n"),
+        nbformat.v4.new_output("display_data", data={"image/png": base64.b64encode(b"png").decode(),
+                                                     "text/plain": "<Figure>"}),
+    ]
+    markdown = nbformat.v4.new_markdown_cell("## Task\nÜbung mit Umlauten")
+    raw = nbformat.v4.new_raw_cell("")
+    nb.cells = [code, markdown, raw]
+    for idx, cell in enumerate(nb.cells):
+        cell.id = f"cell-{idx}"
+    if minor < 5:
+        nb.nbformat_minor = minor
+        for cell in nb.cells:
+            del cell["id"]
+    return nb
+
+
+def as_bytes(nb) -> bytes:
+    # As saved by Jupyter, with sources split into lines
+    return nbformat.writes(nb).encode("utf-8")
+
+
+def cells(nb):
+    return [(cell.cell_type, cell.get("id"), cell.source, cell.metadata) for cell in nb.cells]
+
+
+def reference(data: bytes) -> nbformat.NotebookNode:
+    return nbformat.reads(data.decode("utf-8"), nbformat.current_nbformat)
+
+
+@pytest.fixture
+def no_fallback(monkeypatch):
+    def fail(_text):
+        raise AssertionError("fell back to nbformat")
+    monkeypatch.setattr(notebook_utils, "_read_validated", fail)
+
+
+@pytest.mark.parametrize("parser", ["orjson", "json"])
+@pytest.mark.parametrize("minor", [4, 5])
+def test_matches_nbformat(minor, parser, no_fallback, monkeypatch):
+    if parser == "json":
+        monkeypatch.setattr(notebook_utils, "orjson", None)
+    elif notebook_utils.orjson is None:
+        pytest.skip("orjson is not installed")
+    data = as_bytes(make_notebook(minor))
+    nb, expected = read_notebook(data), reference(data)
+
+    assert cells(nb) == cells(expected)
+    assert nb.metadata == expected.metadata
+    assert (nb.nbformat, nb.nbformat_minor) == (expected.nbformat, expected.nbformat_minor)
+    assert [len(cell.get("outputs", [])) for cell in nb.cells] == [len(cell.get("outputs", [])) for cell in expected.cells]
+
+
+def test_attribute_access(no_fallback):
+    nb = read_notebook(as_bytes(make_notebook()))
+    assert nb.metadata.kernelspec.name == "python3"
+    assert nb.cells[0].metadata.nbgrader.solution is True
+    assert nb.cells[0].source.startswith("def f(x):\n")
+
+
+def test_transient_metadata_is_stripped(no_fallback):
+    nb = read_notebook(as_bytes(make_notebook()))
+    assert "signature" not in nb.metadata
+    assert "trusted" not in nb.cells[0].metadata
+
+
+def test_duplicate_ids_are_repaired_like_nbformat():
+    nb = make_notebook()
+    nb.cells[1].id = nb.cells[0].id
+    with pytest.warns(Warning):
+        ids = [cell.id for cell in read_notebook(as_bytes(nb)).cells]
+    assert ids[0] == "cell-0" and ids[2] == "cell-2"
+    assert len(set(ids)) == 3
+
+
+def test_missing_ids_are_added_like_nbformat():
+    nb = json.loads(as_bytes(make_notebook()))
+    del nb["cells"][1]["id"]
+    with pytest.warns(Warning):
+        ids = [cell.id for cell in read_notebook(json.dumps(nb).encode()).cells]
+    assert ids[0] == "cell-0" and ids[2] == "cell-2"
+    assert ids[1]
+
+
+def test_invalid_id_is_rejected():
+    nb = make_notebook()
+    nb.cells[0].id = "not a valid id!"
+    with pytest.raises(ValidationError):
+        read_notebook(as_bytes(nb))
+
+
+@pytest.mark.parametrize("data", [b"", b"{", b"[]", b'{"nbformat": 4}'])
+def test_invalid_documents_are_rejected(data):
+    with pytest.raises(Exception):
+        read_notebook(data)
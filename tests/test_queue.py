@@ -0,0 +1,61 @@
+import pytest
+
+from bytegrader.autograde.queue import DatabaseJobQueue
+from bytegrader.autograde.worker import JobPriority
+from bytegrader.core.models import Assignment, Course, GradingJob, Submission, User
+from bytegrader.core.models.enum import GradingJobStatus, SubmissionStatus
+
+pytestmark = [pytest.mark.database, pytest.mark.integration, pytest.mark.asyncio]
+
+
+@pytest.fixture
+def queue(db_mgr):
+    with db_mgr.get_session() as session:
+        session.add(Course(label="C1", title="Course 1"))
+        session.add(User(id="u1"))
+        session.add(Assignment(id="A1", course_id="C1", name="A1"))
+        session.add(Submission(id="S1", assignment_id="A1", user_id="u1", status=SubmissionStatus.SUBMITTED))
+    return DatabaseJobQueue(db_mgr, poll_interval=0.01, max_attempts=2)
+
+
+def job_row(db_mgr):
+    with db_mgr.get_session(readonly=True) as session:
+        return session.query(GradingJob).one()
+
+
+async def test_failed_job_is_queued_again_until_max_attempts(db_mgr, queue):
+    await queue.add_batch("A1", ["S1"], JobPriority.BACKGROUND)
+
+    job = await queue.get_job()
+    await queue.task_done(job, RuntimeError("kernel died"))
+    row = job_row(db_mgr)
+    assert (row.status, row.attempts, row.claimed_by) == (GradingJobStatus.QUEUED, 1, None)
+    assert row.error == "kernel died"
+    assert await queue.qsize() == 1
+
+    job = await queue.get_job()
+    await queue.task_done(job, RuntimeError("kernel died again"))
+    row = job_row(db_mgr)
+    assert (row.status, row.attempts) == (GradingJobStatus.FAILED, 2)
+    assert row.error == "kernel died again"
+    assert row.finished_at is not None
+    assert await queue.qsize() == 0
+
+
+async def test_interrupted_job_does_not_count_as_attempt(db_mgr, queue):
+    await queue.add_batch("A1", ["S1"], JobPriority.BACKGROUND)
+
+    await queue.get_job()
+    await queue.close()
+    row = job_row(db_mgr)
+    assert (row.status, row.attempts, row.claimed_by) == (GradingJobStatus.QUEUED, 0, None)
+
+
+async def test_regrade_progress_counts_finished_jobs(db_mgr, queue):
+    await queue.add_batch("A1", ["S1"], JobPriority.BACKGROUND)
+
+    job = await queue.get_job()
+    await queue.task_done(job)
+    progress = await queue.regrade_progress("A1")
+    assert (progress.total, progress.completed, progress.failed) == (1, 1, 0)
+    assert job_row(db_mgr).status == GradingJobStatus.DONE
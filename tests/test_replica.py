@@ -0,0 +1,88 @@
+import asyncio
+import shutil
+
+import pytest
+from sqlalchemy import update
+
+from bytegrader.config.config import BYTEGraderConfig
+from bytegrader.core.database.connection import DatabaseManager
+from bytegrader.core.database.migrations import upgrade_database
+from bytegrader.core.models import Course
+from bytegrader.tasks.scheduler import TaskScheduler
+
+pytestmark = [pytest.mark.database, pytest.mark.integration]
+
+
+@pytest.fixture
+def replicated(tmp_path):
+    # The replica is a copy of the primary whose course title tells which one answered
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    config = BYTEGraderConfig()
+    config.database.uri = f"sqlite:///{primary}"
+    db_mgr = DatabaseManager(config.database.uri, config)
+    upgrade_database(db_mgr)
+    with db_mgr.get_session() as session:
+        session.add(Course(label="C1", title="primary"))
+    db_mgr.close()
+    shutil.copy(primary, replica)
+    with DatabaseManager(f"sqlite:///{replica}").get_session() as session:
+        session.execute(update(Course).values(title="replica"))
+
+    config.database.replica_uri = f"sqlite:///{replica}"
+    db_mgr = DatabaseManager(config.database.uri, config)
+    db_mgr.reset_primary_pin()
+    yield db_mgr
+    if db_mgr.engine:
+        db_mgr.close()
+
+
+def read_title(db_mgr) -> str:
+    with db_mgr.get_session(readonly=True) as session:
+        return session.get(Course, "C1").title
+
+
+def wait_for_probe(db_mgr):
+    with db_mgr._replica_probing:
+        pass
+
+
+def test_lag_is_probed_in_the_background(replicated):
+    # The first read does not wait for the probe and goes to the primary
+    assert read_title(replicated) == "primary"
+    wait_for_probe(replicated)
+    assert replicated.replica_lag == 0.0
+    assert read_title(replicated) == "replica"
+
+
+def test_unreachable_replica_falls_back_to_the_primary(replicated, tmp_path):
+    replicated.config.database.replica_uri = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    db_mgr = DatabaseManager(replicated.uri, replicated.config)
+    try:
+        read_title(db_mgr)
+        wait_for_probe(db_mgr)
+        assert db_mgr.replica_lag is None
+        assert read_title(db_mgr) == "primary"
+    finally:
+        db_mgr.close()
+
+
+def test_writes_pin_reads_to_the_primary(replicated):
+    read_title(replicated)
+    wait_for_probe(replicated)
+    with replicated.get_session() as session:
+        session.add(Course(label="C2", title="new"))
+    assert read_title(replicated) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_scheduled_runs_start_unpinned(replicated):
+    read_title(replicated)
+    await asyncio.to_thread(wait_for_probe, replicated)
+    replicated.pin_primary()
+    assert read_title(replicated) == "primary"
+
+    async def task():
+        return read_title(replicated)
+
+    scheduler = TaskScheduler(BYTEGraderConfig())
+    assert await scheduler._wrap_job(task, "test")() == "replica"